@@ -15,6 +15,7 @@ from urllib import request
 from warnings import warn
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pytest
 from modflow_devtools.misc import is_in_ci
 
@@ -66,6 +67,43 @@ def example_shapefiles(example_data_path) -> List[Path]:
     return [f.resolve() for f in (example_data_path / "prj_test").glob("*")]
 
 
+# forcing fixtures
+
+
+@pytest.fixture
+def forcing():
+    """
+    Factory for reproducible random inflow and potential
+    evapotranspiration rates with a shape of (nsteps,) or (nsteps,
+    ncells). Inflow rates are uniform between zero and inflow_rate, or
+    exponential with a mean of inflow_rate, and a dry_fraction of the
+    inflow rates are set to zero. Potential evapotranspiration rates
+    are uniform between zero and pet_rate.
+    """
+
+    def make_forcing(
+        nsteps=100,
+        ncells=None,
+        seed=0,
+        inflow_rate=0.05,
+        pet_rate=0.005,
+        dry_fraction=0.0,
+        distribution="uniform",
+    ):
+        rng = np.random.default_rng(seed)
+        shape = (nsteps,) if ncells is None else (nsteps, ncells)
+        if distribution == "uniform":
+            inflow = rng.uniform(0.0, inflow_rate, shape)
+        else:
+            inflow = rng.exponential(inflow_rate, shape)
+        if dry_fraction > 0.0:
+            inflow[rng.uniform(size=shape) < dry_fraction] = 0.0
+        pet = rng.uniform(0.0, pet_rate, shape)
+        return inflow, pet
+
+    return make_forcing
+
+
 # fixture to automatically close any plots (or optionally show them)
 
 
@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.utils import GreenAmpt
+
+PARAMETERS = {
+    "thickness": 3.0,
+    "max_vertical_rate": 0.05,
+    "horizontal_vertical_ratio": 1.0,
+    "theta0": 0.1,
+    "theta_wp": 0.01,
+    "theta_fc": 0.1,
+    "theta_sat": 0.2,
+}
+
+
+@pytest.fixture
+def weekly_forcing(forcing):
+    # weekly rainfall with a large storm in week 10
+    def make_forcing(nweeks=52):
+        inflow, pet = forcing(
+            nweeks,
+            seed=19,
+            inflow_rate=0.004,
+            pet_rate=0.004,
+            dry_fraction=0.3,
+            distribution="exponential",
+        )
+        inflow[10] = 0.05
+        return inflow, pet
+
+    return make_forcing
+
+
+@pytest.mark.parametrize("infiltration", ["constant", "green-ampt"])
+def test_adaptive_reduces_time_step_error(weekly_forcing, infiltration):
+    inflow, pet = weekly_forcing()
+    reference = ControlVolume(
+        infiltration_method=infiltration, soil="loam", **PARAMETERS
+    )
+    reference.run(np.repeat(inflow, 7 * 24), np.repeat(pet, 7 * 24), 1 / 24)
+    expected = np.asarray(reference.output_dict["theta"])[7 * 24 - 1 :: 168]
+
+    errors = []
+    for adaptive in (False, True):
+        volume = ControlVolume(
+            infiltration_method=infiltration,
+            soil="loam",
+            adaptive=adaptive,
+            **PARAMETERS,
+        )
+        volume.run(inflow, pet, delta_t=7.0)
+        theta = np.asarray(volume.output_dict["theta"])
+        errors.append(np.abs(theta - expected).max())
+    assert errors[1] < 0.5 * errors[0]
+    assert errors[1] < 5e-3
+
+
+def test_adaptive_fluxes_are_interval_averages(weekly_forcing):
+    inflow, pet = weekly_forcing()
+    volume = ControlVolume(adaptive=True, **PARAMETERS)
+    for inflow_rate, pet_rate in zip(inflow.tolist(), pet.tolist()):
+        volume0 = volume.volume
+        volume.update(inflow_rate=inflow_rate, pet_rate=pet_rate, delta_t=7.0)
+        assert volume.delta_t == 7.0
+        assert volume.volume0 == pytest.approx(volume0, rel=1e-12)
+        assert volume.storage_volume_change == pytest.approx(
+            (volume0 - volume.volume) / 7.0, rel=1e-9, abs=1e-12
+        )
+    total_time = np.asarray(volume.output_dict["total time"])
+    assert np.allclose(total_time, 7.0 * np.arange(1, inflow.shape[0] + 1))
+    # the interval fluxes balance
+    residual = sum(
+        np.asarray(volume.output_dict[name])
+        for name in (
+            "inflow_L3/T",
+            "aet_L3/T",
+            "lateral_L3/T",
+            "recharge_L3/T",
+            "surface_L3/T",
+            "storage_change_L3/T",
+        )
+    )
+    assert np.abs(residual).max() < 1e-5
+
+
+def test_adaptive_recovers_from_nonconvergence():
+    parameters = dict(PARAMETERS, theta0=0.02, max_iterations=2)
+    volumes = [
+        ControlVolume(adaptive=adaptive, **parameters)
+        for adaptive in (False, True)
+    ]
+    for volume in volumes:
+        volume.update(inflow_rate=0.2, pet_rate=0.0, delta_t=7.0)
+    assert not volumes[0].converged
+    assert volumes[1].converged
+    assert volumes[1].nsubsteps > 1
+
+
+def test_adaptive_keeps_untruncated_step():
+    # quiet sub-steps of 1 and 2 days are doubled, and the 4 day step is
+    # cut to end at the end of the interval. The step used for the next
+    # interval is the 4 day step, not the shortened (or doubled
+    # shortened) step, and does not depend on the remainder
+    steps = []
+    for delta_t in (3.01, 3.5):
+        volume = ControlVolume(adaptive=True, **PARAMETERS)
+        volume._substep_delta_t = 1.0
+        volume.update(inflow_rate=0.0, pet_rate=0.001, delta_t=delta_t)
+        assert volume.nsubsteps == 3
+        steps.append(volume._substep_delta_t)
+    assert steps == [4.0, 4.0]
+
+    # the last sub-step that ends at the end of the interval is kept
+    volume = ControlVolume(adaptive=True, **PARAMETERS)
+    volume._substep_delta_t = 1.0
+    volume.update(inflow_rate=0.0, pet_rate=0.001, delta_t=3.0)
+    assert volume.nsubsteps == 2
+    assert volume._substep_delta_t == 2.0
+
+
+def test_adaptive_array_matches_scalar(weekly_forcing):
+    inflow, pet = weekly_forcing(nweeks=20)
+    array = ControlVolumeArray(adaptive=True, ncells=2, **PARAMETERS)
+    array.run(inflow, pet, delta_t=7.0)
+    scalar = ControlVolume(adaptive=True, **PARAMETERS)
+    scalar.run(inflow, pet, delta_t=7.0)
+    theta = array.get_array("theta")
+    assert np.allclose(theta[:, 0], theta[:, 1], rtol=0.0, atol=0.0)
+    assert np.allclose(
+        theta[:, 0], scalar.output_dict["theta"], rtol=0.0, atol=1e-9
+    )
+
+
+def test_infiltration_state():
+    method = GreenAmpt(0.2, 0.05, "m", soil="loam")
+    method.set_infiltration_time(1.0)
+    f = method.infiltration(0.1, 0.1, 0.1)
+    state = method.get_state()
+    method.set_infiltration_time(2.0)
+    method.infiltration(0.1, 0.12, 0.12)
+    assert method.F_t != state["F_t"]
+    method.set_state(state)
+    assert method.infiltration_time == 1.0
+    assert method.F_t == state["F_t"]
+    assert method.infiltration(0.1, 0.1, 0.1) == f
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"max_theta_change": 0.0},
+        {"theta_tolerance": -1.0},
+        {"min_delta_t": 0.0},
+    ],
+)
+def test_invalid_adaptive_parameters(kwargs):
+    with pytest.raises(ValueError):
+        ControlVolume(adaptive=True, **kwargs)
@@ -0,0 +1,207 @@
+"""
+Benchmarks for the solver hot paths.
+
+The benchmarks run once as regular tests. To time them and save the
+results as JSON in autotest/.benchmarks (compare saved runs with
+pytest-benchmark compare):
+
+    pytest test_benchmark.py --benchmark-enable --benchmark-only
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume
+from simple_soil.io import INCHES_TO_LENGTH_UNITS, iterate_prms_csv
+from simple_soil.utils import (
+    HAS_NUMBA,
+    GreenAmpt,
+    aet_volumetric_rate,
+    flow_factor,
+    groundwater_recharge_fraction,
+    infiltration_volumetric_rate,
+    lateral_discharge_fraction,
+    lateral_volumetric_rate,
+    newton_raphson,
+    pet_fraction,
+    quadratic_smoother,
+    recharge_volumetric_rate,
+    saturation_fraction,
+    surface_discharge_fraction,
+    surface_infiltration_fraction,
+    surface_volumetric_rate,
+    volume_change_rate,
+)
+
+DATA_PATH = Path(__file__).parent.parent / "notebooks" / "data" / "hru_1"
+
+# control volume used for the hru_1 notebooks
+HRU_PARAMETERS = {
+    "area": 2715.617356 * 4046.86,
+    "thickness": 3.0,
+    "max_vertical_rate": 0.05,
+    "horizontal_vertical_ratio": 1.0,
+    "theta0": 0.1,
+    "theta_wp": 0.01,
+    "theta_fc": 0.1,
+    "theta_sat": 0.2,
+}
+THETA_SAT = 0.2
+THETA_FC = 0.1
+THETA_WP = 0.01
+THETA_PET_MAX = THETA_WP + (THETA_SAT - THETA_WP) * 0.15
+THETA_DISCHARGE = THETA_SAT * (3.0 - 0.1) / 3.0
+
+
+def water_contents(size):
+    if size is None:
+        return 0.13
+    return np.linspace(0.0, 1.1 * THETA_SAT, size)
+
+
+@pytest.fixture(scope="module")
+def hru_forcing():
+    factor = INCHES_TO_LENGTH_UNITS["m"]
+    forcing = []
+    for name in ("hru_rain.csv", "potet.csv"):
+        chunks = [
+            values
+            for _, values in iterate_prms_csv(
+                DATA_PATH / name, factor=factor, chunksize=5000
+            )
+        ]
+        forcing.append(np.concatenate(chunks)[:, 0])
+    return forcing[0], 0.5 * forcing[1]
+
+
+@pytest.mark.benchmark(group="smoother")
+@pytest.mark.parametrize("size", [None, 100, 10_000, 1_000_000])
+def test_quadratic_smoother(benchmark, size):
+    saturation = 0.23 if size is None else np.linspace(-0.1, 1.1, size)
+    benchmark(quadratic_smoother, saturation, 1e-6)
+
+
+@pytest.mark.benchmark(group="fraction")
+@pytest.mark.parametrize("size", [None, 10_000])
+@pytest.mark.parametrize(
+    "function, args",
+    [
+        (saturation_fraction, (THETA_SAT,)),
+        (groundwater_recharge_fraction, (THETA_SAT, THETA_FC)),
+        (surface_discharge_fraction, (THETA_SAT, THETA_DISCHARGE)),
+        (surface_infiltration_fraction, (THETA_SAT, THETA_DISCHARGE)),
+        (lateral_discharge_fraction, (THETA_SAT, THETA_FC)),
+        (pet_fraction, (THETA_PET_MAX, THETA_WP)),
+    ],
+    ids=lambda value: getattr(value, "__name__", ""),
+)
+def test_fraction_function(benchmark, function, args, size):
+    benchmark(function, water_contents(size), *args)
+
+
+@pytest.mark.benchmark(group="flow")
+@pytest.mark.parametrize("size", [None, 10_000])
+@pytest.mark.parametrize(
+    "function, args",
+    [
+        (flow_factor, (1e-3, THETA_SAT, THETA_WP)),
+        (aet_volumetric_rate, (0.005, THETA_PET_MAX, THETA_WP, 1.0)),
+        (
+            recharge_volumetric_rate,
+            (THETA_SAT, THETA_FC, THETA_WP, 1.0, 3.0, 1e-3),
+        ),
+        (surface_volumetric_rate, (THETA_SAT, THETA_DISCHARGE, 1.0, 1e-3)),
+        (
+            lateral_volumetric_rate,
+            (THETA_SAT, THETA_FC, THETA_WP, 1.0, 3.0, 1e-2),
+        ),
+        (volume_change_rate, (0.1, THETA_SAT, 1.0, 3.0, 1.0)),
+    ],
+    ids=lambda value: getattr(value, "__name__", ""),
+)
+def test_flow_function(benchmark, function, args, size):
+    benchmark(function, water_contents(size), *args)
+
+
+@pytest.mark.benchmark(group="flow")
+@pytest.mark.parametrize("infiltration", ["constant", "green-ampt"])
+def test_infiltration_volumetric_rate(benchmark, infiltration):
+    volume = ControlVolume(
+        infiltration_method=infiltration, soil="loam", **HRU_PARAMETERS
+    )
+    method = volume.infiltration_method
+    method.set_infiltration_time(10.0)
+    benchmark(
+        infiltration_volumetric_rate,
+        0.13,
+        0.1,
+        0.02,
+        THETA_SAT,
+        THETA_DISCHARGE,
+        1.0,
+        method,
+    )
+
+
+@pytest.mark.benchmark(group="solver")
+def test_newton_raphson(benchmark):
+    volume = ControlVolume(**HRU_PARAMETERS)
+    volume.advance(inflow_rate=0.02, pet_rate=0.002)
+    iterations, _, _, converged = benchmark(
+        newton_raphson, volume.residual_and_derivative, None, volume.theta
+    )
+    assert converged and iterations > 0
+
+
+@pytest.mark.benchmark(group="solver")
+@pytest.mark.parametrize("solver", ["newton", "explicit"])
+def test_green_ampt_infiltration(benchmark, solver):
+    method = GreenAmpt(THETA_SAT, 0.05, "m", soil="loam", solver=solver)
+    method.set_infiltration_time(10.0)
+
+    def infiltration():
+        # the rate is cached for each time step
+        method.clear_cache()
+        return method.infiltration(0.1, 0.1, 0.1)
+
+    assert benchmark(infiltration) > 0.0
+
+
+@pytest.mark.benchmark(group="solver")
+@pytest.mark.parametrize("infiltration", ["constant", "green-ampt"])
+def test_control_volume_update(benchmark, infiltration):
+    volume = ControlVolume(
+        infiltration_method=infiltration, soil="loam", **HRU_PARAMETERS
+    )
+    benchmark(volume.update, inflow_rate=0.02, pet_rate=0.002)
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark(group="hru_1")
+@pytest.mark.parametrize(
+    "infiltration, use_numba",
+    [("constant", False), ("constant", True), ("green-ampt", False)],
+)
+def test_hru_run(benchmark, hru_forcing, infiltration, use_numba):
+    if use_numba and not HAS_NUMBA:
+        pytest.skip("requires numba")
+    inflow, pet = hru_forcing
+    assert inflow.shape[0] > 15_000 - 100
+
+    def setup():
+        volume = ControlVolume(
+            infiltration_method=infiltration,
+            soil="loam",
+            nsteps=inflow.shape[0],
+            **HRU_PARAMETERS,
+        )
+        return (volume,), {}
+
+    def run(volume):
+        volume.run(inflow, pet, use_numba=use_numba)
+        return volume
+
+    volume = benchmark.pedantic(run, setup=setup, rounds=3, warmup_rounds=1)
+    assert len(volume.output_dict["theta"]) == inflow.shape[0]
@@ -0,0 +1,151 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.utils import (
+    newton_bisection,
+    newton_bisection_array,
+    newton_raphson,
+)
+
+PARAMETERS = {
+    "thickness": 3.0,
+    "max_vertical_rate": 0.05,
+    "horizontal_vertical_ratio": 1.0,
+    "theta0": 0.1,
+    "theta_wp": 0.01,
+    "theta_fc": 0.1,
+    "theta_sat": 0.2,
+}
+
+
+def steep(x):
+    # decreasing function with a root at 0.1 where Newton-Raphson
+    # overshoots from starting values far from the root
+    return -np.arctan(50.0 * (x - 0.1))
+
+
+def steep_derivative(x):
+    return -50.0 / (1.0 + (50.0 * (x - 0.1)) ** 2)
+
+
+@pytest.fixture
+def storm_forcing(forcing):
+    # intermittent rainfall with large storms that are difficult for
+    # newton-raphson
+    def make_forcing(nsteps=1000):
+        inflow, pet = forcing(
+            nsteps,
+            seed=20,
+            inflow_rate=0.005,
+            dry_fraction=0.6,
+            distribution="exponential",
+        )
+        inflow[::97] = 0.2
+        return inflow, pet
+
+    return make_forcing
+
+
+def test_newton_bisection_converges_where_newton_diverges():
+    with np.errstate(all="ignore"):
+        _, x, _, _ = newton_raphson(steep, steep_derivative, 0.19, max_iter=20)
+    assert not x == pytest.approx(0.1, abs=1e-7)
+
+    iterations, x, residual, converged = newton_bisection(
+        steep, steep_derivative, 0.19, 0.0, 0.2, max_iter=20, increasing=False
+    )
+    assert converged
+    assert x == pytest.approx(0.1, abs=1e-7)
+    assert abs(residual) <= 1e-6
+    assert iterations <= 20
+
+
+def test_newton_bisection_combined_derivative():
+    def f(x):
+        return steep(x), steep_derivative(x)
+
+    expected = newton_bisection(
+        steep, steep_derivative, 0.19, 0.0, 0.2, increasing=False
+    )
+    assert newton_bisection(f, None, 0.19, 0.0, 0.2, increasing=False) == (
+        expected
+    )
+
+
+@pytest.mark.parametrize("subset", [False, True])
+def test_newton_bisection_array(subset):
+    shift = np.array([0.0, 0.02, -0.05, 0.08])
+
+    def f(x, index=slice(None)):
+        return steep(x - shift[index])
+
+    def df(x, index=slice(None)):
+        return steep_derivative(x - shift[index])
+
+    x0 = np.array([0.19, 0.0, 0.3, 0.18])
+    iterations, x, residual, converged = newton_bisection_array(
+        f, df, x0, 0.0, 0.2, increasing=False, subset=subset
+    )
+    assert np.all(converged)
+    assert np.allclose(x, 0.1 + shift, atol=1e-7)
+    for idx in range(x0.shape[0]):
+        expected = newton_bisection(
+            lambda value: f(value, idx),
+            lambda value: df(value, idx),
+            x0[idx],
+            0.0,
+            0.2,
+            increasing=False,
+        )
+        assert iterations[idx] == expected[0]
+        assert x[idx] == expected[1]
+
+
+@pytest.mark.parametrize("infiltration", ["constant", "green-ampt"])
+def test_bracketed_solver_matches_newton(storm_forcing, infiltration):
+    inflow, pet = storm_forcing()
+    volumes = {}
+    for solver in ("newton", "bracketed"):
+        volume = ControlVolume(
+            infiltration_method=infiltration,
+            soil="loam",
+            solver=solver,
+            **PARAMETERS,
+        )
+        volume.run(inflow, pet, use_numba=False)
+        volumes[solver] = volume
+
+    output = volumes["bracketed"].output_dict
+    assert np.all(np.abs(output["residual_L3/T"]) <= 1e-6)
+    theta = np.asarray(output["theta"])
+    assert np.all((theta >= 0.0) & (theta <= PARAMETERS["theta_sat"]))
+    assert np.allclose(
+        theta, volumes["newton"].output_dict["theta"], rtol=0.0, atol=1e-6
+    )
+
+
+def test_bracketed_solver_array_matches_scalar(storm_forcing):
+    theta_sat = np.array([0.2, 0.3, 0.45])
+    inflow, pet = storm_forcing(nsteps=300)
+    volume = ControlVolumeArray(
+        solver="bracketed", **dict(PARAMETERS, theta_sat=theta_sat)
+    )
+    volume.run(inflow, pet)
+    assert not volume.kernel_supported
+    for idx, value in enumerate(theta_sat):
+        expected = ControlVolume(
+            solver="bracketed", **dict(PARAMETERS, theta_sat=value)
+        )
+        expected.run(inflow, pet)
+        assert np.allclose(
+            volume.get_array("theta")[:, idx],
+            expected.output_dict["theta"],
+            rtol=0.0,
+            atol=1e-12,
+        )
+
+
+def test_invalid_solver():
+    with pytest.raises(ValueError):
+        ControlVolume(solver="brent")
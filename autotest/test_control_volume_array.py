@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+
+NCELLS = 5
+
+
+def cell_parameters():
+    rng = np.random.default_rng(1)
+    return {
+        "area": rng.uniform(1.0, 100.0, NCELLS),
+        "thickness": rng.uniform(1.0, 3.0, NCELLS),
+        "theta0": rng.uniform(0.02, 0.2, NCELLS),
+        "theta_sat": rng.uniform(0.3, 0.45, NCELLS),
+        "max_vertical_rate": rng.uniform(0.005, 0.05, NCELLS),
+    }
+
+
+@pytest.mark.parametrize(
+    "infiltration, solver, rtol",
+    [
+        ("constant", "newton", 1e-10),
+        ("green-ampt", "explicit", 1e-10),
+        # the scalar green-ampt newton solver uses a finite difference
+        # derivative, so the rates only agree to the solver tolerance
+        ("green-ampt", "newton", 1e-5),
+    ],
+)
+def test_array_matches_scalar_loop(forcing, infiltration, solver, rtol):
+    inflow, pet = forcing(100, ncells=NCELLS, seed=1, dry_fraction=0.3)
+    parameters = cell_parameters()
+    soils = ["sand", "loam", "clay", "silt loam", "loam"]
+    kwargs = {
+        "infiltration_method": infiltration,
+        "infiltration_solver": solver,
+    }
+    volume = ControlVolumeArray(soil=soils, **kwargs, **parameters)
+    volume.run(inflow, pet, use_numba=False)
+
+    for idx in range(NCELLS):
+        expected = ControlVolume(
+            soil=soils[idx],
+            **kwargs,
+            **{key: float(value[idx]) for key, value in parameters.items()},
+        )
+        for inflow_rate, pet_rate in zip(inflow[:, idx], pet[:, idx]):
+            expected.update(float(inflow_rate), float(pet_rate))
+        for name, values in expected.output_dict.items():
+            actual = volume.get_array(name)
+            if actual.ndim > 1:
+                actual = actual[:, idx]
+            assert np.allclose(
+                actual, values, rtol=rtol, atol=1e-12
+            ), f"cell {idx} {name}"
@@ -0,0 +1,305 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.utils import (
+    aet_volumetric_rate,
+    aet_volumetric_rate_derivative,
+    flow_factor,
+    flow_factor_derivative,
+    groundwater_recharge_fraction,
+    groundwater_recharge_fraction_derivative,
+    infiltration_volumetric_rate,
+    infiltration_volumetric_rate_derivative,
+    lateral_discharge_fraction,
+    lateral_discharge_fraction_derivative,
+    lateral_volumetric_rate,
+    lateral_volumetric_rate_derivative,
+    pet_fraction,
+    pet_fraction_derivative,
+    quadratic_smoother,
+    quadratic_smoother_derivative,
+    recharge_volumetric_rate,
+    recharge_volumetric_rate_derivative,
+    rejected_infiltration_volumetric_rate,
+    rejected_infiltration_volumetric_rate_derivative,
+    saturation_fraction,
+    saturation_fraction_derivative,
+    surface_discharge_fraction,
+    surface_discharge_fraction_derivative,
+    surface_infiltration_fraction,
+    surface_infiltration_fraction_derivative,
+    surface_volumetric_rate,
+    surface_volumetric_rate_derivative,
+    volume_change_rate,
+    volume_change_rate_derivative,
+)
+
+# smoothing widths wide enough to place finite difference points inside
+# the quadratic regions of the smoothers
+OMEGAS = (0.05, 0.25)
+STEP = 1e-7
+PARAMETERS = {
+    "theta0": 0.15,
+    "theta_wp": 0.02,
+    "theta_fc": 0.1,
+    "theta_sat": 0.3,
+    "discharge_thickness": 0.2,
+    "max_vertical_rate": 0.01,
+}
+FLUXES = [
+    (
+        aet_volumetric_rate,
+        aet_volumetric_rate_derivative,
+        ("pet_rate", "theta_pet_max", "theta_wp", "area"),
+    ),
+    (
+        infiltration_volumetric_rate,
+        infiltration_volumetric_rate_derivative,
+        (
+            "theta0",
+            "inflow_rate",
+            "theta_sat",
+            "theta_discharge",
+            "area",
+            "infiltration_method",
+        ),
+    ),
+    (
+        rejected_infiltration_volumetric_rate,
+        rejected_infiltration_volumetric_rate_derivative,
+        (
+            "theta0",
+            "inflow_rate",
+            "theta_sat",
+            "theta_discharge",
+            "area",
+            "infiltration_method",
+        ),
+    ),
+    (
+        recharge_volumetric_rate,
+        recharge_volumetric_rate_derivative,
+        (
+            "theta_sat",
+            "theta_fc",
+            "theta_wp",
+            "area",
+            "thickness",
+            "max_vertical_rate",
+        ),
+    ),
+    (
+        surface_volumetric_rate,
+        surface_volumetric_rate_derivative,
+        ("theta_sat", "theta_discharge", "area", "max_vertical_rate"),
+    ),
+    (
+        lateral_volumetric_rate,
+        lateral_volumetric_rate_derivative,
+        (
+            "theta_sat",
+            "theta_fc",
+            "theta_wp",
+            "area",
+            "thickness",
+            "max_horizontal_rate",
+        ),
+    ),
+    (
+        volume_change_rate,
+        volume_change_rate_derivative,
+        ("theta0", "theta_sat", "area", "thickness", "delta_t"),
+    ),
+]
+
+
+def interior_values(values, edges, margin=1e-4):
+    # values that are not within margin of a region edge, where the
+    # second derivative of the smoothers is discontinuous
+    edges = np.asarray(edges)
+    distance = np.abs(values[:, np.newaxis] - edges[np.newaxis, :])
+    return values[distance.min(axis=1) > margin]
+
+
+def relative_edges(lower, upper, omega):
+    return lower + (upper - lower) * np.array(
+        [0.0, omega, 0.5, 1.0 - omega, 1.0]
+    )
+
+
+def water_contents(volume):
+    # water contents below, within, and above every smoothed region of
+    # the flux curves
+    omega = volume.smoothing_omega
+    edges = [volume.theta_wp]
+    for lower, upper in (
+        (0.0, volume.theta_sat),
+        (volume.theta_fc, volume.theta_sat),
+        (volume.theta_discharge, volume.theta_sat),
+        (volume.theta_wp, volume.theta_pet_max),
+    ):
+        edges.extend(relative_edges(lower, upper, omega))
+    values = np.linspace(-0.05, 1.2 * volume.theta_sat, 1001)
+    return interior_values(values, edges)
+
+
+def finite_difference(function, values, *args, **kwargs):
+    return (
+        function(values + STEP, *args, **kwargs)
+        - function(values - STEP, *args, **kwargs)
+    ) / (2.0 * STEP)
+
+
+def assert_derivative(derivative, expected):
+    atol = 1e-6 * max(np.abs(expected).max(), 1e-12)
+    assert np.allclose(derivative, expected, rtol=1e-5, atol=atol)
+
+
+def stepped_volume(cls=ControlVolume, **kwargs):
+    volume = cls(**PARAMETERS, **kwargs)
+    volume.advance(inflow_rate=0.05, pet_rate=0.005)
+    return volume
+
+
+@pytest.mark.parametrize("omega", OMEGAS)
+def test_quadratic_smoother_derivative(omega):
+    values = interior_values(
+        np.linspace(-0.5, 1.5, 2001), relative_edges(0.0, 1.0, omega)
+    )
+    assert_derivative(
+        quadratic_smoother_derivative(values, omega=omega),
+        finite_difference(quadratic_smoother, values, omega=omega),
+    )
+
+
+@pytest.mark.parametrize("omega", OMEGAS)
+@pytest.mark.parametrize(
+    "function, derivative, limits",
+    [
+        (saturation_fraction, saturation_fraction_derivative, (0.45,)),
+        (
+            groundwater_recharge_fraction,
+            groundwater_recharge_fraction_derivative,
+            (0.45, 0.2),
+        ),
+        (
+            lateral_discharge_fraction,
+            lateral_discharge_fraction_derivative,
+            (0.45, 0.2),
+        ),
+        (
+            surface_discharge_fraction,
+            surface_discharge_fraction_derivative,
+            (0.45, 0.4),
+        ),
+        (
+            surface_infiltration_fraction,
+            surface_infiltration_fraction_derivative,
+            (0.45, 0.4),
+        ),
+        (pet_fraction, pet_fraction_derivative, (0.15, 0.05)),
+    ],
+)
+def test_fraction_derivatives(function, derivative, limits, omega):
+    theta_min = limits[-1] if len(limits) > 1 else 0.0
+    theta_max = limits[0]
+    values = interior_values(
+        np.linspace(theta_min - 0.1, theta_max + 0.1, 2001),
+        relative_edges(theta_min, theta_max, omega),
+    )
+    expected = finite_difference(
+        function, values, *limits, smoothing_omega=omega
+    )
+    assert_derivative(
+        derivative(values, *limits, smoothing_omega=omega), expected
+    )
+    # scalar derivatives
+    assert_derivative(
+        [
+            derivative(float(value), *limits, smoothing_omega=omega)
+            for value in values[::50]
+        ],
+        expected[::50],
+    )
+
+
+def test_flow_factor_derivative():
+    volume = stepped_volume()
+    values = interior_values(np.linspace(0.0, 0.4, 1001), [volume.theta_wp])
+    args = (volume.max_vertical_rate, volume.theta_sat, volume.theta_wp)
+    assert_derivative(
+        flow_factor_derivative(values, *args),
+        finite_difference(flow_factor, values, *args),
+    )
+
+
+def test_flow_factor_below_wilting_point():
+    # water contents below theta_wp do not drain (the relative water
+    # content is limited to zero), rather than returning nan for arrays
+    # and complex numbers for scalars
+    args = (0.01, 0.3, 0.02)
+    values = np.array([-0.05, 0.0, 0.01, 0.02])
+    for function in (flow_factor, flow_factor_derivative):
+        assert np.array_equal(function(values, *args), np.zeros(4))
+        for value in values:
+            result = function(float(value), *args)
+            assert isinstance(result, float) and result == 0.0
+
+    # a control volume that starts below theta_wp only loses water to
+    # evapotranspiration until it is wetted above theta_wp
+    volume = ControlVolumeArray(theta0=[0.005, 0.015], theta_wp=0.02)
+    volume.update(inflow_rate=0.0, pet_rate=0.005)
+    for name in ("lateral_L3/T", "recharge_L3/T"):
+        assert np.array_equal(volume.get_array(name)[0], [0.0, 0.0]), name
+    assert np.isfinite(volume.get_array("theta")).all()
+
+
+@pytest.mark.parametrize("omega", OMEGAS)
+@pytest.mark.parametrize("infiltration", ["constant", "green-ampt"])
+@pytest.mark.parametrize(
+    "function, derivative, names",
+    FLUXES,
+    ids=[function.__name__ for function, _, _ in FLUXES],
+)
+def test_flux_derivatives(function, derivative, names, infiltration, omega):
+    volume = stepped_volume(
+        smoothing_omega=omega, infiltration_method=infiltration
+    )
+    values = water_contents(volume)
+    args = [getattr(volume, name) for name in names]
+    assert_derivative(
+        derivative(values, *args, smoothing_omega=omega),
+        finite_difference(function, values, *args, smoothing_omega=omega),
+    )
+
+
+@pytest.mark.parametrize("omega", OMEGAS)
+@pytest.mark.parametrize("flux_method", ["exact", "table"])
+@pytest.mark.parametrize("infiltration", ["constant", "green-ampt"])
+def test_jacobian(infiltration, flux_method, omega):
+    kwargs = {
+        "smoothing_omega": omega,
+        "infiltration_method": infiltration,
+        "flux_method": flux_method,
+    }
+    volume = stepped_volume(**kwargs)
+    values = water_contents(volume)[::5]
+    jacobian = [volume.jacobian(float(value)) for value in values]
+    assert_derivative(
+        jacobian,
+        [finite_difference(volume.residual, float(value)) for value in values],
+    )
+    for value, expected in zip(values, jacobian):
+        residual, derivative = volume.residual_and_derivative(float(value))
+        assert residual == volume.residual(float(value))
+        assert derivative == expected
+
+    # the array jacobian matches the scalar jacobian for every cell, to
+    # the tolerance of the green-ampt solvers
+    volume = stepped_volume(
+        ControlVolumeArray, ncells=values.shape[0], **kwargs
+    )
+    assert np.allclose(volume.jacobian(values), jacobian, rtol=1e-6)
+    residual, derivative = volume.residual_and_derivative(values)
+    assert np.array_equal(derivative, volume.jacobian(values))
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+
+
+def random_water_contents(theta_sat, n=5000):
+    rng = np.random.default_rng(15)
+    return rng.uniform(0.0, theta_sat, n)
+
+
+@pytest.mark.parametrize("tolerance", [1e-6, 1e-9])
+def test_table_error_bound(tolerance):
+    volume = ControlVolume(
+        theta_sat=0.45,
+        theta_fc=0.2,
+        theta_wp=0.05,
+        flux_method="table",
+        table_tolerance=tolerance,
+    )
+    theta = random_water_contents(0.45)
+    values, _ = volume._flux_table(theta)
+    exact, _ = volume._flux_table._evaluate(theta, None)
+    scale = np.abs(volume._flux_table.values).max(axis=1)
+    error = np.abs(values - exact).max(axis=1)
+    assert np.all(error <= tolerance * scale)
+
+
+def test_table_outside_range_is_exact():
+    volume = ControlVolume(flux_method="table")
+    theta = np.array([-0.01, 0.25, 0.5])
+    values, derivatives = volume._flux_table(theta)
+    exact, exact_derivatives = volume._flux_table._evaluate(theta, None)
+    assert np.array_equal(values, exact)
+    assert np.array_equal(derivatives, exact_derivatives)
+
+
+def test_table_array_matches_scalar():
+    theta_sat = np.array([0.3, 0.4, 0.45])
+    array = ControlVolumeArray(theta_sat=theta_sat, flux_method="table")
+    for cell, value in enumerate(theta_sat):
+        scalar = ControlVolume(theta_sat=value, flux_method="table")
+        theta = random_water_contents(value, n=200)
+        expected, expected_derivatives = scalar._flux_table(theta)
+        values, derivatives = array._flux_table(
+            theta, np.full(theta.shape, cell)
+        )
+        assert np.allclose(values, expected, rtol=0.0, atol=1e-12)
+        assert np.allclose(
+            derivatives, expected_derivatives, rtol=1e-9, atol=1e-9
+        )
+
+
+@pytest.mark.parametrize("cls", [ControlVolume, ControlVolumeArray])
+def test_table_matches_exact(forcing, cls):
+    inflow, pet = forcing(300, seed=15)
+    volumes = [
+        cls(theta0=0.05, max_vertical_rate=0.02, flux_method=flux_method)
+        for flux_method in ("exact", "table")
+    ]
+    for inflow_rate, pet_rate in zip(inflow, pet):
+        for volume in volumes:
+            volume.update(inflow_rate=inflow_rate, pet_rate=pet_rate)
+    exact, table = [
+        np.asarray(volume.output_dict["theta"]) for volume in volumes
+    ]
+    assert np.allclose(table, exact, rtol=0.0, atol=1e-6)
+
+
+def test_invalid_flux_method():
+    with pytest.raises(ValueError):
+        ControlVolume(flux_method="spline")
@@ -0,0 +1,182 @@
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, run_prms_forcing
+from simple_soil.io import (
+    ForcingStore,
+    build_forcing_store,
+    iterate_prms_csv,
+    open_forcing_store,
+)
+
+DATA_PATH = Path(__file__).parent.parent / "notebooks" / "data" / "hru_1"
+
+
+@pytest.fixture
+def forcing_path(tmp_path):
+    path = tmp_path / "forcing"
+    path.mkdir()
+    for name in ("hru_rain.csv", "snowmelt.csv", "potet.csv"):
+        shutil.copy(DATA_PATH / name, path / name)
+    return path
+
+
+def test_forcing_store_matches_csv(forcing_path, tmp_path):
+    store = build_forcing_store(forcing_path, tmp_path / "store")
+    assert store.names == ["hru_rain", "potet", "snowmelt"]
+    assert store.hrus == ["2"]
+
+    values = store.values("hru_rain")
+    assert isinstance(values, np.memmap)
+    assert not values.flags.writeable
+
+    paths = [forcing_path / "hru_rain.csv", forcing_path / "snowmelt.csv"]
+    expected = list(iterate_prms_csv(paths, factor=0.5, chunksize=4000))
+    chunks = list(
+        store.iterate(
+            ["hru_rain", "snowmelt"], hrus=[2], factor=0.5, chunksize=4000
+        )
+    )
+    assert len(chunks) == len(expected)
+    for (dates, values), (expected_dates, expected_values) in zip(
+        chunks, expected
+    ):
+        assert dates.equals(expected_dates)
+        assert np.array_equal(values, expected_values)
+
+
+def test_open_forcing_store_invalidation(forcing_path, tmp_path):
+    store_path = tmp_path / "store"
+    store = open_forcing_store(forcing_path, store_path)
+    rain = np.array(store["hru_rain"])
+    metadata = store_path / "forcing.json"
+    mtime = os.stat(metadata).st_mtime_ns
+
+    # current stores are opened without rebuilding
+    store = open_forcing_store(forcing_path, store_path)
+    assert store.is_current()
+    assert os.stat(metadata).st_mtime_ns == mtime
+
+    source = forcing_path / "hru_rain.csv"
+    lines = source.read_text().splitlines()
+    lines[1] = lines[1].split(",")[0] + ",1.5"
+    source.write_text("\n".join(lines) + "\n")
+    assert not store.is_current()
+
+    store = open_forcing_store(forcing_path, store_path)
+    assert store.is_current()
+    assert store["hru_rain"][0, 0] == 1.5
+    assert np.array_equal(store["hru_rain"][1:], rain[1:])
+
+    # a different set of source files is also rebuilt
+    store = open_forcing_store(forcing_path / "potet.csv", store_path)
+    assert store.names == ["potet"]
+    assert sorted(path.name for path in store_path.glob("*.bin")) == [
+        "dates.bin",
+        "potet.bin",
+    ]
+
+
+def test_forcing_store_invalid_variable(forcing_path, tmp_path):
+    build_forcing_store(forcing_path, tmp_path / "store")
+    store = ForcingStore(tmp_path / "store")
+    with pytest.raises(ValueError):
+        store.values("hru_snow")
+    with pytest.raises(ValueError):
+        store.values("hru_rain", hrus=[3])
+
+
+def test_run_prms_forcing_cache(forcing_path, tmp_path):
+    volumes = []
+    for cache_path in (None, tmp_path / "store", tmp_path / "store"):
+        volume = ControlVolume(max_vertical_rate=0.05, thickness=3.0)
+        dates = run_prms_forcing(
+            volume,
+            [forcing_path / "hru_rain.csv", forcing_path / "snowmelt.csv"],
+            forcing_path / "potet.csv",
+            pet_factor=0.5,
+            cache_path=cache_path,
+        )
+        volumes.append((dates, volume))
+
+    expected_dates, expected = volumes[0]
+    for dates, volume in volumes[1:]:
+        assert dates.equals(expected_dates)
+        for name, values in expected.output_dict.items():
+            assert np.array_equal(volume.output_dict[name], values), name
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+@pytest.mark.parametrize(
+    "length_units, time_units, delta_t, rate_factor",
+    [("m", "d", 1.0, 0.0254), ("cm", "hr", 24.0, 2.54 / 24.0)],
+)
+def test_run_prms_forcing_matches_run(
+    forcing_path,
+    tmp_path,
+    use_cache,
+    length_units,
+    time_units,
+    delta_t,
+    rate_factor,
+):
+    # run_prms_forcing matches running the control volume on forcing read
+    # with iterate_prms_csv and converted from inches per day
+    kwargs = {
+        "max_vertical_rate": 0.05 * rate_factor / 0.0254,
+        "thickness": 3.0 * rate_factor * delta_t / 0.0254,
+        "length_units": length_units,
+        "time_units": time_units,
+    }
+    inflow_files = [
+        forcing_path / "hru_rain.csv",
+        forcing_path / "snowmelt.csv",
+    ]
+    pet_file = forcing_path / "potet.csv"
+    volume = ControlVolume(**kwargs)
+    dates = run_prms_forcing(
+        volume,
+        inflow_files,
+        pet_file,
+        pet_factor=0.5,
+        chunksize=4000,
+        cache_path=tmp_path / "store" if use_cache else None,
+    )
+
+    expected = ControlVolume(**kwargs)
+    expected_dates = []
+    for (inflow_dates, inflow), (_, pet) in zip(
+        iterate_prms_csv(inflow_files, factor=rate_factor, chunksize=4000),
+        iterate_prms_csv(pet_file, factor=0.5 * rate_factor, chunksize=4000),
+    ):
+        expected.run(inflow[:, 0], pet[:, 0], delta_t=delta_t)
+        expected_dates.append(inflow_dates)
+    assert dates.equals(expected_dates[0].append(expected_dates[1:]))
+    assert dates.shape[0] == 14975
+    assert volume.total_time == 14975 * delta_t
+    for name, values in expected.output_dict.items():
+        assert np.array_equal(volume.output_dict[name], values), name
+
+
+def test_run_prms_forcing_unequal_dates(forcing_path):
+    # potet.csv ends on a chunk boundary so every chunk it has matches
+    source = forcing_path / "potet.csv"
+    lines = source.read_text().splitlines()
+    source.write_text("\n".join(lines[:4001]) + "\n")
+    with pytest.raises(ValueError, match="number of dates"):
+        run_prms_forcing(
+            ControlVolume(),
+            forcing_path / "hru_rain.csv",
+            source,
+            chunksize=1000,
+        )
+    with pytest.raises(ValueError, match="do not match"):
+        list(
+            iterate_prms_csv(
+                [forcing_path / "hru_rain.csv", source], chunksize=1000
+            )
+        )
@@ -0,0 +1,295 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.utils import (
+    GreenAmpt,
+    GreenAmptArray,
+    green_ampt_cumulative_infiltration,
+    infiltration_functions,
+)
+
+
+def green_ampt_residual(F, K_t, v):
+    return F - v * np.log1p(F / v) - K_t
+
+
+def test_cumulative_infiltration_residual():
+    v = 0.05
+    K_t = v * np.logspace(-12, 6, 500)
+    F = green_ampt_cumulative_infiltration(K_t, v)
+    assert np.all(F >= K_t)
+    residual = green_ampt_residual(F, K_t, v)
+    assert np.all(np.abs(residual) <= 1e-12 * np.maximum(F, v))
+
+
+def test_cumulative_infiltration_scalar():
+    v = 0.05
+    K_t = v * np.logspace(-12, 6, 200)
+    expected = green_ampt_cumulative_infiltration(K_t, v)
+    for value, expected_value in zip(K_t, expected):
+        result = green_ampt_cumulative_infiltration(float(value), v)
+        assert isinstance(result, float)
+        assert result == pytest.approx(expected_value, rel=1e-14)
+
+
+def test_cumulative_infiltration_limits():
+    assert green_ampt_cumulative_infiltration(0.0, 0.05) == 0.0
+    assert green_ampt_cumulative_infiltration(0.3, 0.0) == 0.3
+    F = green_ampt_cumulative_infiltration(
+        np.array([0.0, 0.3, 0.3]), np.array([0.05, 0.0, 0.05])
+    )
+    assert F[0] == 0.0
+    assert F[1] == 0.3
+    assert F[2] > 0.3
+
+
+@pytest.mark.parametrize("soil", ["sand", "loam", "clay"])
+def test_explicit_solver_matches_newton(soil):
+    newton = GreenAmpt(0.45, 0.02, "m", soil=soil)
+    explicit = GreenAmpt(0.45, 0.02, "m", soil=soil, solver="explicit")
+    for time in np.linspace(0.5, 365.0, 50):
+        for method in (newton, explicit):
+            method.set_infiltration_time(time)
+        f_newton = newton.infiltration(1.0, 0.1, 0.1)
+        f_explicit = explicit.infiltration(1.0, 0.1, 0.1)
+        assert explicit.iterations == 0
+        assert abs(explicit.F_t - newton.F_t) <= 1e-5
+        assert f_explicit == pytest.approx(f_newton, rel=1e-4)
+
+
+@pytest.mark.parametrize("solver", ["newton", "explicit"])
+def test_array_matches_scalar(solver):
+    theta0 = np.array([0.02, 0.1, 0.3, 0.45])
+    array = GreenAmptArray(0.45, 0.02, "m", soil="loam", solver=solver)
+    scalars = [
+        GreenAmpt(0.45, 0.02, "m", soil="loam", solver=solver) for _ in theta0
+    ]
+    for time in (1.0, 10.0, 100.0):
+        array.set_infiltration_time(time)
+        f = array.infiltration(np.full(theta0.shape, 1.0), theta0, theta0)
+        # a saturated cell infiltrates at K_sat
+        assert f[-1] == 0.02
+        for idx, scalar in enumerate(scalars[:-1]):
+            scalar.set_infiltration_time(time)
+            f_scalar = scalar.infiltration(1.0, theta0[idx], theta0[idx])
+            assert f[idx] == pytest.approx(f_scalar, rel=1e-4)
+
+
+@pytest.mark.parametrize("solver", ["newton", "explicit"])
+def test_array_matches_scalar_loop(solver, monkeypatch):
+    # dry (saturated and oversaturated) cells, cells limited by the
+    # inflow rate, and cells limited by the infiltration capacity
+    theta0 = np.array([0.02, 0.1, 0.3, 0.44, 0.45, 0.5])
+    rate = np.array([1.0, 1e-3, 1.0, 5e-3, 1.0, 1e-2])
+    dry = theta0 >= 0.45
+    guesses = []
+    newton_raphson_array = infiltration_functions.newton_raphson_array
+
+    def recorded_newton_raphson_array(f, df, x0, **kwargs):
+        guesses.append(x0.copy())
+        return newton_raphson_array(f, df, x0, **kwargs)
+
+    monkeypatch.setattr(
+        infiltration_functions,
+        "newton_raphson_array",
+        recorded_newton_raphson_array,
+    )
+    array = GreenAmptArray(0.45, 0.02, "m", soil="loam", solver=solver)
+    # the explicit scalar solution is accurate to about 1e-14 and is the
+    # reference for both array solvers
+    scalars = [
+        GreenAmpt(0.45, 0.02, "m", soil="loam", solver="explicit")
+        for _ in theta0
+    ]
+    limited = {"rate": False, "capacity": False}
+    # the infiltration time decreases in the last step (a new event), so
+    # the newton solution starts from the cumulative infiltration of the
+    # previous step, which is larger than K_sat t, instead of K_sat t
+    for time in (0.1, 1.0, 10.0, 100.0, 0.5):
+        F_t = array.F_t.copy()
+        array.set_infiltration_time(time)
+        f = array.infiltration(rate, theta0, theta0)
+        F_expected = []
+        f_expected = []
+        for idx, scalar in enumerate(scalars):
+            scalar.set_infiltration_time(time)
+            f_expected.append(
+                scalar.infiltration(rate[idx], theta0[idx], theta0[idx])
+            )
+            F_expected.append(scalar.F_t)
+        F_expected = np.array(F_expected)
+        f_expected = np.array(f_expected)
+
+        # dry cells infiltrate K_sat t at K_sat
+        assert np.all(array.F_t[dry] == 0.02 * time)
+        assert np.all(array.f_t[dry] == 0.02)
+        assert np.all(array.error[dry] == 0.0)
+        # the infiltration rate is the lesser of the rate and the
+        # infiltration capacity
+        assert np.array_equal(f, np.minimum(array.f_t, rate))
+        limited["rate"] |= np.any(array.f_t > rate)
+        limited["capacity"] |= np.any(array.f_t[~dry] < rate[~dry])
+
+        if solver == "explicit":
+            assert np.array_equal(array.F_t, F_expected)
+            assert np.array_equal(f, f_expected)
+            continue
+
+        assert np.all(guesses.pop() == np.maximum(F_t, 0.02 * time))
+        # the error in F is bounded by the newton residual tolerance
+        # (1e-6) divided by the derivative of the residual
+        assert np.all(np.abs(array.error) <= 1e-6)
+        v = np.maximum(np.abs(array.psi) * (0.45 - theta0), 0.0)
+        derivative = 1.0 - v / (v + F_expected)
+        assert np.all(
+            np.abs(array.F_t - F_expected) <= 1e-6 / derivative + 1e-15
+        )
+        assert np.allclose(f, f_expected, rtol=1e-5, atol=0.0)
+    assert limited == {"rate": True, "capacity": True}
+    # the last newton solution started from the previous solution
+    assert np.all(F_t > 0.02 * time)
+    assert guesses == []
+
+
+def test_invalid_solver():
+    with pytest.raises(ValueError):
+        GreenAmpt(0.45, 0.02, "m", solver="bisection")
+
+
+@pytest.mark.parametrize("cls", [ControlVolume, ControlVolumeArray])
+def test_control_volume_solvers_agree(forcing, cls):
+    inflow, pet = forcing(200, seed=13)
+    volumes = [
+        cls(
+            theta0=0.05,
+            infiltration_method="green-ampt",
+            infiltration_solver=solver,
+            soil="loam",
+            max_vertical_rate=0.02,
+        )
+        for solver in ("newton", "explicit")
+    ]
+    for inflow_rate, pet_rate in zip(inflow, pet):
+        for volume in volumes:
+            volume.update(inflow_rate=inflow_rate, pet_rate=pet_rate)
+    theta_newton, theta_explicit = [
+        np.asarray(volume.output_dict["theta"]) for volume in volumes
+    ]
+    assert np.allclose(theta_explicit, theta_newton, rtol=0.0, atol=1e-6)
+
+
+def test_control_volume_array_infiltration_cached(forcing, monkeypatch):
+    calls = []
+    infiltration = GreenAmptArray._infiltration
+
+    def counted_infiltration(self, *args):
+        calls.append(self.F_t.shape)
+        return infiltration(self, *args)
+
+    monkeypatch.setattr(GreenAmptArray, "_infiltration", counted_infiltration)
+    ncells = 1000
+    inflow, pet = forcing(1, ncells=ncells, seed=13)
+    volume = ControlVolumeArray(
+        ncells=ncells,
+        theta0=np.linspace(0.05, 0.18, ncells),
+        theta_sat=0.2,
+        thickness=0.1,
+        max_vertical_rate=0.02,
+        infiltration_method="green-ampt",
+    )
+    volume.update(inflow_rate=inflow[0], pet_rate=pet[0])
+    # infiltration is calculated once for every cell in a step and not
+    # for the active cells in each newton iteration
+    iterations = volume.output_dict["iterations"][0]
+    assert iterations.min() < iterations.max()
+    assert calls == [(ncells,)]
+
+
+@pytest.mark.parametrize("cls", [ControlVolume, ControlVolumeArray])
+def test_control_volume_infiltration_solved_once(forcing, monkeypatch, cls):
+    # GreenAmpt.infiltration is called in every residual evaluation, but
+    # the green-ampt equation is solved once in a step and the later
+    # calls reuse the cached infiltration rate
+    method = GreenAmpt if cls is ControlVolume else GreenAmptArray
+    calls = []
+    infiltration = method._infiltration
+
+    def counted_infiltration(self, *args):
+        calls.append(self.infiltration_time)
+        return infiltration(self, *args)
+
+    monkeypatch.setattr(method, "_infiltration", counted_infiltration)
+    inflow, pet = forcing(20, seed=13)
+    volume = cls(
+        theta0=0.05,
+        infiltration_method="green-ampt",
+        soil="loam",
+        max_vertical_rate=0.02,
+    )
+    for inflow_rate, pet_rate in zip(inflow, pet):
+        del calls[:]
+        volume.update(inflow_rate=inflow_rate, pet_rate=pet_rate)
+        assert np.all(volume.iterations >= 1)
+        assert calls == [volume.infiltration_method.infiltration_time]
+
+
+@pytest.mark.parametrize("flux_method", ["exact", "table"])
+def test_control_volume_output_solver_components(
+    forcing, monkeypatch, flux_method
+):
+    # the recorded fluxes are the flux components of the last residual
+    # evaluation of the newton solution
+    evaluations = []
+    residual_and_derivative = ControlVolume.residual_and_derivative
+
+    def recorded_residual_and_derivative(self, water_content):
+        result = residual_and_derivative(self, water_content)
+        evaluations.append((water_content, dict(self._components)))
+        return result
+
+    monkeypatch.setattr(
+        ControlVolume,
+        "residual_and_derivative",
+        recorded_residual_and_derivative,
+    )
+    inflow, pet = forcing(20, seed=13)
+    volume = ControlVolume(
+        theta0=0.05,
+        infiltration_method="green-ampt",
+        soil="loam",
+        max_vertical_rate=0.02,
+        flux_method=flux_method,
+    )
+    for inflow_rate, pet_rate in zip(inflow, pet):
+        del evaluations[:]
+        volume.update(inflow_rate=inflow_rate, pet_rate=pet_rate)
+        water_content, components = evaluations[-1]
+        assert water_content == volume.theta
+        output = volume.output_dict
+        for name, value in components.items():
+            assert output[name][-1] == value, name
+
+
+def test_control_volume_components_cached_for_step():
+    volume = ControlVolume(infiltration_method="green-ampt", soil="loam")
+    volume.update(inflow_rate=0.05, pet_rate=0.005)
+    components = volume._components
+    assert components is not None
+
+    # the cached components are used for an equal water content that is
+    # not the same object
+    theta = volume.theta
+    volume.theta = theta * 1.0
+    assert volume.theta is not theta
+    assert volume._step_components() is components
+    # and are not used for a different water content
+    volume.theta = theta + 0.01
+    assert volume._step_components() != components
+    volume.theta = theta
+
+    # the components of a step are not used in the next step, even if
+    # the water content does not change
+    volume.advance(inflow_rate=0.05, pet_rate=0.005)
+    assert volume._components is None
+    assert volume._step_components() != components
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.utils import INSTRUMENTATION_VARIABLES
+
+
+@pytest.mark.parametrize("derivative_method", ["analytic", "numerical"])
+def test_instrumentation_counters(forcing, derivative_method):
+    inflow, pet = forcing(seed=18)
+    inflow[::3] = 0.0
+    volumes = [
+        ControlVolume(
+            theta0=0.05,
+            infiltration_method="green-ampt",
+            soil="loam",
+            derivative_method=derivative_method,
+            instrument=instrument,
+        )
+        for instrument in (False, True)
+    ]
+    for volume in volumes:
+        volume.run(inflow, pet)
+    expected, volume = volumes
+    assert expected.instrumentation is None
+    # instrumentation does not change the results
+    for name, values in expected.output_dict.items():
+        assert np.array_equal(volume.output_dict[name], values), name
+
+    df = volume.instrumentation.get_dataframe()
+    assert list(df.columns) == list(INSTRUMENTATION_VARIABLES[1:])
+    assert len(df) == inflow.shape[0]
+    assert np.array_equal(df.index, expected.output_dict["total time"])
+    assert np.array_equal(
+        df["newton_iterations"], expected.output_dict["iterations"]
+    )
+    assert np.all(df["residual_calls"] == df["newton_iterations"] + 1)
+    if derivative_method == "analytic":
+        assert np.all(df["derivative_calls"] == df["residual_calls"])
+    else:
+        assert np.all(df["derivative_calls"] == df["newton_iterations"])
+    # green-ampt is only solved for steps with inflow
+    assert np.all(df["infiltration_iterations"][inflow == 0.0] == 0)
+    assert np.all(df["infiltration_iterations"][inflow > 0.0] > 0)
+    assert np.all(df[["advance_s", "solve_s", "output_s"]] >= 0.0)
+
+    summary = volume.instrumentation.summary()
+    assert list(summary.columns) == ["total", "mean", "max"]
+    assert summary.loc["residual_calls", "total"] == df["residual_calls"].sum()
+
+
+def test_instrumentation_array(forcing):
+    inflow, pet = forcing(seed=18)
+    inflow[::3] = 0.0
+    theta_sat = np.array([0.2, 0.3, 0.45])
+    volume = ControlVolumeArray(
+        theta0=0.05, theta_sat=theta_sat, instrument=True
+    )
+    assert not volume.kernel_supported
+    volume.run(inflow, pet)
+    df = volume.instrumentation.get_dataframe()
+    assert np.array_equal(
+        df["newton_iterations"], volume.get_array("iterations").sum(axis=1)
+    )
+    assert np.all(df["nonconverged"] == 0)
+
+
+def test_instrumentation_sums_infiltration_iterations(forcing):
+    # an adaptive step solves the green-ampt infiltration for every
+    # sub-step, and the iterations of all of the solves are counted
+    inflow, pet = forcing(nsteps=20, seed=18)
+    volume = ControlVolume(
+        theta0=0.05,
+        infiltration_method="green-ampt",
+        soil="loam",
+        adaptive=True,
+        instrument=True,
+    )
+    infiltration = volume.infiltration_method
+    solve = infiltration._infiltration
+    solves = []
+
+    def recorded(*args):
+        value = solve(*args)
+        solves[-1].append(infiltration.iterations)
+        return value
+
+    infiltration._infiltration = recorded
+    nsubsteps = []
+    for inflow_rate, pet_rate in zip(inflow, pet):
+        solves.append([])
+        volume.update(inflow_rate=inflow_rate, pet_rate=pet_rate, delta_t=7.0)
+        nsubsteps.append(volume.nsubsteps)
+
+    df = volume.instrumentation.get_dataframe()
+    assert max(nsubsteps) > 1
+    assert max(len(iterations) for iterations in solves) > 1
+    assert np.array_equal(
+        df["infiltration_iterations"],
+        [sum(iterations) for iterations in solves],
+    )
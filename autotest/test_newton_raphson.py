@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+
+from simple_soil.utils import newton_raphson, newton_raphson_array
+
+# entries converge after 0 (root at the initial guess) to several
+# iterations
+TARGETS = np.array([1.0, 2.0, 1e-3, 50.0, 1e4])
+
+
+def square_root_functions(targets, subset):
+    # residual and derivative of x**2 - target for each entry
+    def f(x, index=slice(None)):
+        return x * x - targets[index]
+
+    def df(x, index=slice(None)):
+        return 2.0 * x
+
+    if subset:
+        return f, df
+    return (lambda x: f(x)), (lambda x: df(x))
+
+
+@pytest.mark.parametrize("subset", [False, True])
+@pytest.mark.parametrize("combined", [False, True])
+def test_newton_raphson_array_matches_scalar(subset, combined):
+    f, df = square_root_functions(TARGETS, subset)
+    if combined:
+
+        def f_combined(x, *index):
+            return f(x, *index), df(x, *index)
+
+        iterations, x, residual, converged = newton_raphson_array(
+            f_combined, None, np.ones(TARGETS.shape), subset=subset
+        )
+    else:
+        iterations, x, residual, converged = newton_raphson_array(
+            f, df, np.ones(TARGETS.shape), subset=subset
+        )
+    assert iterations.dtype == int and converged.dtype == bool
+    assert iterations[0] == 0
+    assert len(set(iterations)) > 2
+    for idx, target in enumerate(TARGETS):
+        expected = newton_raphson(
+            lambda value: value * value - target,
+            lambda value: 2.0 * value,
+            1.0,
+        )
+        assert (iterations[idx], x[idx], residual[idx], converged[idx]) == (
+            expected
+        ), idx
+
+
+def test_newton_raphson_array_freezes_converged_entries():
+    # f is evaluated for every entry, but only the active entries are
+    # updated
+    history = []
+    f, df = square_root_functions(TARGETS, False)
+
+    def f_recorded(x):
+        history.append(x.copy())
+        return f(x)
+
+    iterations, x, _, converged = newton_raphson_array(
+        f_recorded, df, np.ones(TARGETS.shape)
+    )
+    assert converged.all()
+    assert len(history) == iterations.max() + 1
+    for idx, count in enumerate(iterations):
+        values = [values[idx] for values in history]
+        # the entry changes in each of its iterations and is frozen after
+        # it converges
+        assert np.all(np.diff(values[: count + 1]) != 0.0)
+        assert np.all(np.array(values[count:]) == x[idx])
+
+
+def test_newton_raphson_array_subset_arguments():
+    calls = []
+    f, df = square_root_functions(TARGETS, True)
+
+    def f_recorded(x, index):
+        calls.append(("f", x.copy(), index.copy()))
+        return f(x, index)
+
+    def df_recorded(x, index):
+        calls.append(("df", x.copy(), index.copy()))
+        return df(x, index)
+
+    iterations, x, _, _ = newton_raphson_array(
+        f_recorded, df_recorded, np.ones(TARGETS.shape), subset=True
+    )
+    name, values, index = calls[0]
+    assert name == "f"
+    assert np.array_equal(index, np.arange(TARGETS.shape[0]))
+    assert np.array_equal(values, np.ones(TARGETS.shape))
+
+    # each iteration evaluates df at the previous values and f at the
+    # updated values of the active entries only, as (x[index], index)
+    evaluations = [call for call in calls[1:] if call[0] == "f"]
+    assert len(evaluations) == iterations.max()
+    for iteration, (_, values, index) in enumerate(evaluations, start=1):
+        assert np.array_equal(index, np.flatnonzero(iterations >= iteration))
+        assert values.shape == index.shape
+    # the final values of each entry are the last values passed to f
+    for idx in range(TARGETS.shape[0]):
+        last = [
+            values[index == idx][0]
+            for name, values, index in calls
+            if name == "f" and idx in index
+        ][-1]
+        assert last == x[idx]
+
+
+@pytest.mark.parametrize("subset", [False, True])
+def test_newton_raphson_array_not_converged(subset):
+    # x**2 + 1 does not have a real root and the newton iterates
+    # oscillate without converging
+    targets = np.array([4.0, -1.0, 9.0])
+    f, df = square_root_functions(targets, subset)
+    iterations, x, residual, converged = newton_raphson_array(
+        f, df, np.full(targets.shape, 0.5), max_iter=25, subset=subset
+    )
+    assert np.array_equal(converged, [True, False, True])
+    assert iterations[1] == 25
+    assert iterations[0] < 25 and iterations[2] < 25
+    assert np.abs(residual[1]) > 1e-6
+    assert np.allclose(x[[0, 2]], [2.0, 3.0])
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import (
+    OUTPUT_VARIABLES,
+    ControlVolume,
+    ControlVolumeArray,
+)
+from simple_soil.utils import HAS_NUMBA
+
+requires_numba = pytest.mark.skipif(not HAS_NUMBA, reason="requires numba")
+
+
+def update_all(volume, inflow, pet, delta_t=1.0):
+    for inflow_rate, pet_rate in zip(inflow, pet):
+        if inflow.ndim == 1:
+            inflow_rate, pet_rate = float(inflow_rate), float(pet_rate)
+        volume.update(
+            inflow_rate=inflow_rate, pet_rate=pet_rate, delta_t=delta_t
+        )
+
+
+@requires_numba
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"output_interval": 7},
+        {"output_interval": 7, "output_aggregation": "sum"},
+        {"output_interval": 7, "output_aggregation": "mean"},
+    ],
+)
+def test_kernel_matches_update(forcing, kwargs):
+    inflow, pet = forcing(2500, seed=16, dry_fraction=0.5)
+    expected = ControlVolume(theta0=0.05, max_vertical_rate=0.02, **kwargs)
+    update_all(expected, inflow, pet, delta_t=0.5)
+    volume = ControlVolume(theta0=0.05, max_vertical_rate=0.02, **kwargs)
+    # runs that are split between windows and kernel blocks
+    volume.run(inflow[:10], pet[:10], delta_t=0.5, use_numba=True)
+    volume.run(inflow[10:], pet[10:], delta_t=0.5, use_numba=True)
+    for name, values in expected.output_dict.items():
+        assert np.array_equal(volume.output_dict[name], values), name
+    for key in ("theta", "theta0", "volume0", "iterations", "total_time"):
+        assert getattr(volume, key) == getattr(expected, key), key
+    assert isinstance(volume.theta, float)
+
+
+@requires_numba
+def test_kernel_array_matches_update(forcing):
+    theta_sat = np.array([0.2, 0.3, 0.45])
+    inflow, pet = forcing(500, ncells=3, seed=16, dry_fraction=0.5)
+    expected = ControlVolumeArray(theta0=0.05, theta_sat=theta_sat)
+    update_all(expected, inflow, pet)
+    volume = ControlVolumeArray(theta0=0.05, theta_sat=theta_sat)
+    volume.run(inflow, pet, use_numba=True)
+    for name in OUTPUT_VARIABLES:
+        assert np.allclose(
+            volume.get_array(name),
+            expected.get_array(name),
+            rtol=1e-9,
+            atol=1e-12,
+        ), name
+    assert volume.theta.shape == (3,)
+    assert np.allclose(volume.theta, expected.theta, rtol=1e-12)
+
+
+def test_run_without_kernel_matches_update(forcing):
+    inflow, pet = forcing(200, seed=16, dry_fraction=0.5)
+    expected = ControlVolume(infiltration_method="green-ampt", soil="loam")
+    update_all(expected, inflow, pet)
+    volume = ControlVolume(infiltration_method="green-ampt", soil="loam")
+    assert not volume.kernel_supported
+    volume.run(inflow, pet)
+    for name, values in expected.output_dict.items():
+        assert np.array_equal(volume.output_dict[name], values), name
+
+
+def test_run_unsupported_kernel():
+    volume = ControlVolume(derivative_method="numerical")
+    with pytest.raises(ValueError):
+        volume.run([0.01, 0.0], [0.001, 0.001], use_numba=True)
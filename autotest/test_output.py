@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import (
+    OUTPUT_VARIABLES,
+    ControlVolume,
+    ControlVolumeArray,
+)
+
+
+def full_output(inflow, pet, **kwargs):
+    volume = ControlVolume(**kwargs)
+    volume.run(inflow, pet, use_numba=False)
+    return volume.output_dict
+
+
+def test_output_variables(forcing):
+    inflow, pet = forcing(20)
+    expected = full_output(inflow, pet)
+    assert list(expected) == ["total time", *OUTPUT_VARIABLES[1:]]
+
+    names = ["recharge_L3/T", "theta", "total time"]
+    volume = ControlVolume(output_variables=names)
+    volume.run(inflow, pet, use_numba=False)
+    output = volume.output_dict
+    assert list(output) == ["total time", "recharge_L3/T", "theta"]
+    for name, values in output.items():
+        assert np.array_equal(values, expected[name]), name
+
+    with pytest.raises(ValueError, match="runoff"):
+        ControlVolume(output_variables=["theta", "runoff"])
+
+
+@pytest.mark.parametrize("use_numba", [False, None])
+def test_output_interval(forcing, use_numba):
+    inflow, pet = forcing(20)
+    expected = full_output(inflow, pet)
+    volume = ControlVolume(output_interval=6)
+    volume.run(inflow, pet, use_numba=use_numba)
+    output = volume.output_dict
+    assert np.array_equal(output["total time"], [6.0, 12.0, 18.0])
+    assert np.allclose(output["theta"], expected["theta"][5::6])
+
+
+@pytest.mark.parametrize("aggregation", ["sum", "mean"])
+@pytest.mark.parametrize("use_numba", [False, None])
+def test_output_aggregation(forcing, aggregation, use_numba):
+    inflow, pet = forcing(20)
+    expected = full_output(inflow, pet)
+    volume = ControlVolume(output_interval=6, output_aggregation=aggregation)
+    volume.run(inflow, pet, use_numba=use_numba)
+    output = volume.output_dict
+    assert np.array_equal(output["total time"], [6.0, 12.0, 18.0])
+    for name in ("theta", "aet_L3/T"):
+        windows = np.reshape(expected[name][:18], (3, 6))
+        values = windows.sum(axis=1)
+        if aggregation == "mean":
+            values = values / 6.0
+        assert np.allclose(output[name], values, rtol=1e-12), name
+
+
+@pytest.mark.parametrize("aggregation", ["sum", "mean"])
+def test_partial_output_window(forcing, aggregation):
+    inflow, pet = forcing(20)
+    expected = full_output(inflow, pet)
+    volume = ControlVolume(output_interval=6, output_aggregation=aggregation)
+
+    # the partial window is held between runs, so running in pieces
+    # matches a single run
+    volume.run(inflow[:8], pet[:8])
+    assert len(volume.output_dict["theta"]) == 1
+    volume.run(inflow[8:], pet[8:])
+    output = volume.output_dict
+    assert np.array_equal(output["total time"], [6.0, 12.0, 18.0])
+
+    # the last two steps are only recorded when the window is flushed
+    volume.flush_output_window()
+    output = volume.output_dict
+    assert np.array_equal(output["total time"], [6.0, 12.0, 18.0, 20.0])
+    value = expected["theta"][18:].sum()
+    if aggregation == "mean":
+        value /= 2.0
+    assert output["theta"][-1] == pytest.approx(value, rel=1e-12)
+    volume.flush_output_window()
+    assert len(volume.output_dict["theta"]) == 4
+
+    # a new window starts after the flushed window
+    volume.run(inflow[:6], pet[:6])
+    assert volume.output_dict["total time"][-1] == 26.0
+
+    # close_output also records the partial window
+    volume.run(inflow[:2], pet[:2])
+    volume.close_output()
+    assert volume.output_dict["total time"][-1] == 28.0
+
+
+def test_partial_output_window_array(forcing):
+    inflow, pet = forcing(10, ncells=2)
+    volume = ControlVolumeArray(
+        ncells=2, output_interval=4, output_aggregation="mean"
+    )
+    volume.run(inflow, pet)
+    volume.flush_output_window()
+    expected = ControlVolumeArray(ncells=2)
+    expected.run(inflow, pet)
+    theta = volume.get_array("theta")
+    assert theta.shape == (3, 2)
+    assert np.allclose(
+        theta[-1], expected.get_array("theta")[8:].mean(axis=0), rtol=1e-12
+    )
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.utils import CHUNK_SIZE, CHUNK_VALUES, OutputBuffer
+
+
+def test_output_buffer_allocates_lazily():
+    buffer = OutputBuffer(["a", "b"])
+    assert buffer.capacity == 0 and buffer.nbytes == 0
+    buffer.append([1.0, 2.0])
+    assert buffer.capacity == CHUNK_SIZE
+    assert np.array_equal(buffer.to_dict()["b"], [2.0])
+
+    # storage for a known number of steps is allocated when the buffer
+    # is created
+    buffer = OutputBuffer(["a", "b"], nsteps=10)
+    assert buffer.capacity == 10
+
+
+def test_output_buffer_growth():
+    buffer = OutputBuffer(["a"], chunk_size=4)
+    values = np.arange(100.0)
+    for value in values:
+        buffer.append([value])
+    assert np.array_equal(buffer.to_dict()["a"], values)
+    # capacity grows geometrically rather than one chunk at a time
+    assert buffer.capacity < 2 * len(values)
+
+    buffer.extend(values[np.newaxis, :])
+    assert np.array_equal(buffer.to_dict()["a"], np.tile(values, 2))
+
+
+def test_array_output_chunk_size():
+    ncells = 100_000
+    buffer = OutputBuffer(["a", "b"], ncells=ncells)
+    assert buffer.chunk_size == CHUNK_VALUES // ncells
+
+    volume = ControlVolumeArray(ncells=ncells)
+    assert volume._output.nbytes == 0
+    volume.update(0.01, 0.001)
+    nvariables = len(volume.output_variables)
+    assert volume._output.nbytes <= nvariables * CHUNK_VALUES * 8
+
+    volume = ControlVolume()
+    assert volume._output.nbytes == 0
+
+
+def test_output_buffer_preallocated_data():
+    data = np.zeros((2, 3, 4))
+    buffer = OutputBuffer(["a", "b"], ncells=4, data=data[:, :, :])
+    buffer.append([1.0, np.arange(4.0)])
+    buffer.extend(np.ones((2, 2, 4)))
+    # steps are stored in data and the buffer does not grow
+    assert np.array_equal(data[1, 0], np.arange(4.0))
+    assert np.all(data[:, 1:] == 1.0)
+    assert np.shares_memory(buffer.column("b"), data)
+    with pytest.raises(ValueError, match="full"):
+        buffer.append([2.0, 2.0])
+
+    with pytest.raises(ValueError, match="shape"):
+        OutputBuffer(["a", "b"], ncells=3, data=data)
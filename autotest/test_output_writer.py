@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.io import OutputReader, open_output_writer
+from simple_soil.io.output_writer import netCDF4
+from simple_soil.utils import CHUNK_SIZE
+
+OUTPUT_FORMATS = [
+    "binary",
+    pytest.param(
+        "netcdf",
+        marks=pytest.mark.skipif(netCDF4 is None, reason="requires netCDF4"),
+    ),
+]
+
+
+def output_path(tmp_path, output_format):
+    if output_format == "netcdf":
+        return tmp_path / "output.nc"
+    return tmp_path / "output"
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+@pytest.mark.parametrize("ncells", [None, 3])
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"output_interval": 7},
+        {"output_interval": 7, "output_aggregation": "mean"},
+        {"output_variables": ["theta", "aet_L3/T"]},
+    ],
+)
+def test_output_round_trip(tmp_path, forcing, output_format, ncells, kwargs):
+    # more steps than a chunk so the output is written in several chunks
+    inflow, pet = forcing(2 * CHUNK_SIZE + 500, ncells=ncells)
+    if ncells is None:
+        volumes = [
+            ControlVolume(output_path=path, **kwargs)
+            for path in (None, output_path(tmp_path, output_format))
+        ]
+    else:
+        volumes = [
+            ControlVolumeArray(ncells=ncells, output_path=path, **kwargs)
+            for path in (None, output_path(tmp_path, output_format))
+        ]
+    for volume in volumes:
+        volume.run(inflow[:1000], pet[:1000])
+        volume.run(inflow[1000:], pet[1000:])
+        volume.close_output()
+
+    expected = volumes[0].output_dict
+    with OutputReader(volumes[1].output_path) as reader:
+        assert reader.names == list(expected)
+        assert reader.ncells == ncells
+        assert reader.nsteps == len(expected["total time"])
+        for name, values in expected.items():
+            assert np.array_equal(reader[name], values), name
+
+        time = np.asarray(expected["total time"])
+        theta = np.asarray(expected["theta"])
+        if ncells is not None:
+            time, theta = time[:, 0], theta[:, 1]
+        df = reader.get_dataframe(cell=None if ncells is None else 1)
+        assert np.array_equal(df.index, time)
+        assert np.array_equal(df["theta"], theta)
+
+    with pytest.raises(ValueError):
+        volumes[1].output_dict
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+def test_output_readable_before_close(tmp_path, forcing, output_format):
+    inflow, pet = forcing(2 * CHUNK_SIZE + 500)
+    path = output_path(tmp_path, output_format)
+    volume = ControlVolume(output_path=path)
+    volume.run(inflow, pet)
+    expected = ControlVolume()
+    expected.run(inflow, pet)
+
+    # every complete chunk is readable although the output is not closed
+    with OutputReader(path) as reader:
+        assert reader.nsteps == 2 * CHUNK_SIZE
+        assert np.array_equal(
+            reader["theta"], expected.output_dict["theta"][: 2 * CHUNK_SIZE]
+        )
+    volume.close_output()
+    with OutputReader(path) as reader:
+        assert reader.nsteps == len(inflow)
+
+
+def test_output_writer_invalid_chunk(tmp_path):
+    with open_output_writer(tmp_path / "output", ["a", "b"]) as writer:
+        with pytest.raises(ValueError):
+            writer.write(np.zeros((3, 4)))
+        writer.write(np.zeros((2, 4)))
+    with pytest.raises(ValueError):
+        writer.write(np.zeros((2, 4)))
+    with pytest.raises(ValueError):
+        open_output_writer(tmp_path / "output", ["a"], output_format="csv")
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simple_soil.base import ControlVolumeArray, run_parallel
+from simple_soil.utils import OutputBuffer
+
+SOILS = ["sand", "loam", "clay", "silt loam", "loam", "sandy loam", "clay"]
+
+
+def serial_output(inflow, pet, parameters, **kwargs):
+    volume = ControlVolumeArray(**parameters, **kwargs)
+    volume.run(inflow, pet)
+    return {name: volume.get_array(name) for name in volume.output_variables}
+
+
+@pytest.mark.parametrize("nprocesses", [1, 2])
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"infiltration_method": "green-ampt"},
+        {
+            "infiltration_method": "green-ampt",
+            "output_interval": 5,
+            "output_aggregation": "mean",
+        },
+    ],
+)
+def test_run_parallel_matches_serial(forcing, nprocesses, kwargs):
+    ncells = len(SOILS)
+    inflow, pet = forcing(60, ncells=ncells, seed=11)
+    parameters = {
+        "theta_sat": np.linspace(0.3, 0.45, ncells),
+        "max_vertical_rate": 0.02,
+        "soil": SOILS,
+    }
+    expected = serial_output(inflow, pet, parameters, **kwargs)
+    results = run_parallel(
+        parameters,
+        inflow,
+        pet,
+        nprocesses=nprocesses,
+        npartitions=3,
+        **kwargs,
+    )
+    assert list(results) == list(expected)
+    for name, values in expected.items():
+        assert np.array_equal(results[name], values), name
+
+
+def test_run_parallel_output_in_shared_memory(forcing, monkeypatch):
+    # the partitions store each step in the shared result block instead
+    # of allocating output storage of their own
+    buffers = []
+    create = OutputBuffer.__init__
+
+    def recorded(self, *args, **kwargs):
+        create(self, *args, **kwargs)
+        buffers.append(self)
+
+    monkeypatch.setattr(OutputBuffer, "__init__", recorded)
+    ncells = len(SOILS)
+    inflow, pet = forcing(20, ncells=ncells, seed=11)
+    parameters = {"theta_sat": np.linspace(0.3, 0.45, ncells)}
+    results = run_parallel(
+        parameters, inflow, pet, nprocesses=1, npartitions=3
+    )
+    monkeypatch.undo()
+    assert len(buffers) == 6
+    for buffer in buffers:
+        assert buffer.capacity == 0 or not buffer._data.flags.owndata
+    assert sum(buffer.capacity > 0 for buffer in buffers) == 3
+
+    expected = serial_output(inflow, pet, parameters)
+    for name, values in expected.items():
+        assert np.array_equal(results[name], values), name
+        assert results[name].flags.owndata, name
+
+
+def test_run_parallel_per_cell_keyword_arguments(forcing):
+    ncells = len(SOILS)
+    inflow, pet = forcing(20, ncells=ncells, seed=11)
+    df = pd.DataFrame({"theta_sat": np.linspace(0.3, 0.45, ncells)})
+    expected = serial_output(
+        inflow,
+        pet,
+        {"theta_sat": df["theta_sat"].to_numpy(), "soil": SOILS},
+        infiltration_method="green-ampt",
+        output_variables=["theta"],
+    )
+    results = run_parallel(
+        df,
+        inflow,
+        pet,
+        nprocesses=1,
+        soil=np.array(SOILS),
+        infiltration_method="green-ampt",
+        output_variables=["theta"],
+    )
+    assert np.array_equal(results["theta"], expected["theta"])
+
+
+def test_run_parallel_invalid_parameters(forcing):
+    inflow, pet = forcing(10, ncells=3)
+    with pytest.raises(ValueError, match="K_sat"):
+        run_parallel({"K_sat": 1.0}, inflow, pet, nprocesses=1)
+    with pytest.raises(ValueError, match="soil"):
+        run_parallel({"soil": ["loam", "clay"]}, inflow, pet, nprocesses=1)
+    with pytest.raises(ValueError, match="keyword arguments"):
+        run_parallel({"soil": "loam"}, inflow, pet, nprocesses=1, soil="clay")
+    with pytest.raises(ValueError, match="ncells"):
+        run_parallel({}, inflow, pet, nprocesses=1, ncells=3)
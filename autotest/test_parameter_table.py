@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.utils import (
+    GreenAmpt,
+    GreenAmptArray,
+    green_ampt_suction_head,
+)
+
+
+def parameter_table(nrows=20):
+    rng = np.random.default_rng(23)
+    soils = np.array(["sand", "loam", "silt loam", "clay"])
+    return pd.DataFrame(
+        {
+            "hru": np.arange(1, nrows + 1),
+            "area": rng.uniform(1e3, 1e5, nrows),
+            "thickness": rng.uniform(1.0, 3.0, nrows),
+            "theta_sat": rng.uniform(0.3, 0.45, nrows),
+            "theta_fc": 0.2,
+            "theta_wp": 0.05,
+            "theta0": 0.1,
+            "soil": soils[rng.integers(0, soils.shape[0], nrows)],
+            "name": [f"hru {idx}" for idx in range(nrows)],
+        }
+    ).set_index("hru")
+
+
+def test_green_ampt_suction_head():
+    soils = ["loam", "clay", "loam", "sand"]
+    expected = [GreenAmpt(0.3, 1e-3, "cm", soil=soil).psi for soil in soils]
+    assert np.array_equal(green_ampt_suction_head(soils, "cm"), expected)
+    assert green_ampt_suction_head("loam", "cm") == expected[0]
+    with pytest.raises(ValueError, match="peat"):
+        green_ampt_suction_head(["loam", "peat"])
+    with pytest.raises(ValueError):
+        GreenAmpt(0.3, 1e-3, "m", soil=soils)
+
+
+def test_from_dataframe_matches_control_volumes(forcing):
+    df = parameter_table()
+    volume = ControlVolumeArray.from_dataframe(
+        df, infiltration_method="green-ampt", max_vertical_rate=0.05
+    )
+    assert volume.ncells == len(df)
+    assert isinstance(volume.infiltration_method, GreenAmptArray)
+    assert np.array_equal(volume.area, df["area"])
+
+    inflow, pet = forcing(30, seed=24)
+    volume.run(inflow, pet)
+    for idx, row in enumerate(df.itertuples()):
+        expected = ControlVolume(
+            area=row.area,
+            thickness=row.thickness,
+            theta_sat=row.theta_sat,
+            theta_fc=row.theta_fc,
+            theta_wp=row.theta_wp,
+            theta0=row.theta0,
+            soil=row.soil,
+            infiltration_method="green-ampt",
+            max_vertical_rate=0.05,
+        )
+        expected.run(inflow, pet)
+        assert np.allclose(
+            volume.get_array("theta")[:, idx],
+            expected.output_dict["theta"],
+            rtol=1e-9,
+        )
+
+
+def test_from_table(tmp_path):
+    df = parameter_table(nrows=5)
+    path = tmp_path / "parameters.csv"
+    df.to_csv(path)
+    volume = ControlVolumeArray.from_table(path, index_col="hru")
+    assert np.allclose(volume.theta_sat, df["theta_sat"])
+    volume = ControlVolumeArray.from_table(
+        {"area": [1.0, 2.0], "theta_sat": [0.3, 0.4]}
+    )
+    assert volume.ncells == 2
+
+
+def test_from_dataframe_reports_every_invalid_row():
+    df = parameter_table(nrows=6)
+    df["thickness"] = df["thickness"].astype(object)
+    df.loc[2, "theta_fc"] = 0.5
+    df.loc[4, "area"] = -1.0
+    df.loc[4, "soil"] = "peat"
+    df.loc[6, "thickness"] = "x"
+    with pytest.raises(ValueError) as excinfo:
+        ControlVolumeArray.from_dataframe(df, infiltration_method="green-ampt")
+    message = str(excinfo.value)
+    assert message.startswith("3 invalid row(s)")
+    assert "row 2: field capacity must be less than theta_sat" in message
+    assert "row 4: area (-1.0) must be greater than zero; soil (peat)" in (
+        message
+    )
+    assert "row 6: thickness (nan) is not a number" in message
+
+    # soil types are not used for constant infiltration
+    df.loc[[2, 4, 6], ["theta_fc", "area", "thickness"]] = [0.2, 1.0, 1.0]
+    ControlVolumeArray.from_dataframe(df)
+
+
+def test_from_dataframe_duplicate_parameter():
+    with pytest.raises(ValueError):
+        ControlVolumeArray.from_dataframe(parameter_table(), area=1.0)
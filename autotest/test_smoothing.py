@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from simple_soil.utils import (
+    groundwater_recharge_fraction,
+    groundwater_recharge_fraction_derivative,
+    lateral_discharge_fraction,
+    lateral_discharge_fraction_derivative,
+    pet_fraction,
+    pet_fraction_derivative,
+    pet_smoother,
+    quadratic_smoother,
+    quadratic_smoother_derivative,
+    saturation_fraction,
+    saturation_fraction_derivative,
+    surface_discharge_fraction,
+    surface_discharge_fraction_derivative,
+    surface_infiltration_fraction,
+    surface_infiltration_fraction_derivative,
+)
+
+OMEGAS = (1e-6, 1e-2, 0.25, 0.6)
+
+
+def saturation_values(omega: float) -> np.ndarray:
+    rng = np.random.default_rng(20231018)
+    edges = np.array(
+        [-0.5, 0.0, omega, 0.5, 1.0 - omega, 1.0, 1.5],
+    )
+    # region edges, values on either side of each edge, and random
+    # values within each region
+    values = [
+        edges,
+        np.nextafter(edges, -np.inf),
+        np.nextafter(edges, np.inf),
+        rng.uniform(-0.5, 1.5, 500),
+    ]
+    for lower, upper in zip(edges[:-1], edges[1:]):
+        if upper > lower:
+            values.append(rng.uniform(lower, upper, 50))
+    return np.concatenate(values)
+
+
+def assert_scalar_equals_array(function, values, *args, **kwargs):
+    expected = function(values, *args, **kwargs)
+    for value, expected_value in zip(values, expected):
+        result = function(float(value), *args, **kwargs)
+        assert isinstance(result, float)
+        assert result == expected_value or (
+            np.isnan(result) and np.isnan(expected_value)
+        ), f"{function.__name__}({value!r}): {result!r} != {expected_value!r}"
+
+
+@pytest.mark.parametrize("omega", OMEGAS)
+def test_quadratic_smoother_scalar(omega):
+    values = saturation_values(omega)
+    assert_scalar_equals_array(quadratic_smoother, values, omega=omega)
+
+
+@pytest.mark.parametrize("omega", OMEGAS)
+def test_quadratic_smoother_derivative_scalar(omega):
+    values = saturation_values(omega)
+    assert_scalar_equals_array(
+        quadratic_smoother_derivative, values, omega=omega
+    )
+
+
+def test_pet_smoother_scalar():
+    values = saturation_values(0.5)
+    assert_scalar_equals_array(pet_smoother, values)
+
+
+def test_smoother_scalar_nan():
+    assert np.isnan(quadratic_smoother(float("nan")))
+    assert np.isnan(pet_smoother(float("nan")))
+    assert quadratic_smoother_derivative(float("nan")) == 0.0
+
+
+@pytest.mark.parametrize("omega", OMEGAS[:3])
+@pytest.mark.parametrize(
+    "function, limits",
+    [
+        (saturation_fraction, (0.45,)),
+        (saturation_fraction_derivative, (0.45,)),
+        (groundwater_recharge_fraction, (0.45, 0.2)),
+        (groundwater_recharge_fraction_derivative, (0.45, 0.2)),
+        (lateral_discharge_fraction, (0.45, 0.2)),
+        (lateral_discharge_fraction_derivative, (0.45, 0.2)),
+        (surface_discharge_fraction, (0.45, 0.4)),
+        (surface_discharge_fraction_derivative, (0.45, 0.4)),
+        (surface_infiltration_fraction, (0.45, 0.4)),
+        (surface_infiltration_fraction_derivative, (0.45, 0.4)),
+        (pet_fraction, (0.15, 0.05)),
+        (pet_fraction_derivative, (0.15, 0.05)),
+    ],
+)
+def test_fraction_functions_scalar(function, limits, omega):
+    theta_min = limits[-1] if len(limits) > 1 else 0.0
+    theta_max = limits[0]
+    span = theta_max - theta_min
+    values = theta_min + span * saturation_values(omega)
+    assert_scalar_equals_array(
+        function, values, *limits, smoothing_omega=omega
+    )
+
+
+@pytest.mark.parametrize(
+    "value", [0, 1, 2, np.int64(1), np.float32(0.1), np.float32(1.5)]
+)
+def test_non_float_scalar_inputs(value):
+    for function, args in (
+        (quadratic_smoother, ()),
+        (quadratic_smoother_derivative, ()),
+        (pet_smoother, ()),
+        (saturation_fraction, (0.2,)),
+        (saturation_fraction_derivative, (0.2,)),
+        (pet_fraction, (0.15, 0.05)),
+    ):
+        result = function(value, *args)
+        assert isinstance(result, float)
+        assert result == function(float(value), *args)
+
+
+def test_non_float_array_inputs():
+    values = np.array([0, 1, 2])
+    expected = quadratic_smoother(values.astype(float))
+    assert np.array_equal(quadratic_smoother(values), expected)
+    assert np.array_equal(quadratic_smoother(list(values)), expected)
+    assert np.array_equal(
+        saturation_fraction(values.astype(np.float32), 2.0),
+        saturation_fraction(values.astype(float), 2.0),
+    )
+    assert quadratic_smoother(np.array(0.5)).shape == (1,)
@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.utils import HAS_NUMBA
+
+# slowly draining control volume that needs many years to spin up
+PARAMETERS = {
+    "thickness": 10.0,
+    "max_vertical_rate": 5e-4,
+    "horizontal_vertical_ratio": 0.1,
+    "theta0": 0.01,
+    "theta_wp": 0.01,
+    "theta_fc": 0.1,
+    "theta_sat": 0.2,
+}
+
+
+@pytest.fixture
+def annual_forcing(forcing):
+    # daily rainfall with a seasonal potential evapotranspiration cycle
+    inflow, _ = forcing(
+        365,
+        seed=21,
+        inflow_rate=0.004,
+        dry_fraction=0.6,
+        distribution="exponential",
+    )
+    day = np.arange(365)
+    pet = 0.0005 * (1.0 - np.cos(2.0 * np.pi * day / 365.0))
+    return inflow, pet
+
+
+def repeated_cycles(inflow, pet, ncycles=200):
+    volume = ControlVolume(**PARAMETERS)
+    for _ in range(ncycles):
+        theta = volume.theta
+        volume.run(inflow, pet)
+        if abs(volume.theta - theta) <= 1e-12:
+            break
+    return volume.theta
+
+
+def test_spin_up_matches_repeated_cycles(annual_forcing):
+    inflow, pet = annual_forcing
+    expected = repeated_cycles(inflow, pet)
+    volume = ControlVolume(**PARAMETERS)
+    cycles, converged = volume.spin_up(inflow, pet, tol=1e-9)
+    assert converged
+    assert cycles <= 10
+    assert volume.theta == pytest.approx(expected, abs=1e-8)
+    assert volume.theta0 == volume.theta
+    assert volume.total_time == 0.0
+    assert len(volume.output_dict["theta"]) == 0
+
+
+@pytest.mark.parametrize("infiltration", ["constant", "green-ampt"])
+def test_spin_up_is_periodic(annual_forcing, infiltration):
+    inflow, pet = annual_forcing
+    volume = ControlVolume(
+        infiltration_method=infiltration, soil="loam", **PARAMETERS
+    )
+    cycles, converged = volume.spin_up(inflow, pet, tol=1e-9)
+    assert converged
+    theta = volume.theta
+    volume.run(inflow, pet)
+    assert volume.theta == pytest.approx(theta, abs=1e-9)
+
+
+def test_spin_up_constant_forcing():
+    volume = ControlVolume(**PARAMETERS)
+    cycles, converged = volume.spin_up(0.001, 0.0005, tol=1e-10)
+    assert converged
+    theta = volume.theta
+    volume.update(inflow_rate=0.001, pet_rate=0.0005)
+    assert volume.theta == pytest.approx(theta, abs=1e-10)
+    assert abs(volume.storage_volume_change) < 1e-9
+
+
+@pytest.mark.skipif(not HAS_NUMBA, reason="requires numba")
+def test_spin_up_kernel_matches_update(annual_forcing):
+    inflow, pet = annual_forcing
+    expected = ControlVolume(**PARAMETERS)
+    expected.spin_up(inflow, pet, use_numba=False)
+    volume = ControlVolume(**PARAMETERS)
+    volume.spin_up(inflow, pet, use_numba=True)
+    assert volume.theta == pytest.approx(expected.theta, abs=1e-12)
+
+
+def test_spin_up_array(annual_forcing):
+    theta_sat = np.array([0.2, 0.3, 0.45])
+    inflow, pet = annual_forcing
+    volume = ControlVolumeArray(
+        infiltration_method="green-ampt",
+        soil="loam",
+        **dict(PARAMETERS, theta_sat=theta_sat),
+    )
+    cycles, converged = volume.spin_up(inflow, pet, tol=1e-9)
+    assert np.all(converged)
+    assert volume.theta.shape == (3,)
+    for idx, value in enumerate(theta_sat):
+        expected = ControlVolume(
+            infiltration_method="green-ampt",
+            soil="loam",
+            **dict(PARAMETERS, theta_sat=value),
+        )
+        expected.spin_up(inflow, pet, tol=1e-9)
+        assert volume.theta[idx] == pytest.approx(expected.theta, abs=1e-6)
+
+
+def test_spin_up_empty_forcing():
+    with pytest.raises(ValueError):
+        ControlVolume().spin_up([], [])
@@ -0,0 +1,201 @@
+import copy
+import pickle
+
+import numpy as np
+import pytest
+
+from simple_soil.base import ControlVolume, ControlVolumeArray
+from simple_soil.io import read_state_file, write_state_file
+from simple_soil.utils import OutputBuffer
+
+
+@pytest.mark.parametrize(
+    "cls, kwargs",
+    [
+        (ControlVolume, {}),
+        (ControlVolume, {"infiltration_method": "green-ampt"}),
+        (ControlVolume, {"flux_method": "table", "adaptive": True}),
+        (
+            ControlVolumeArray,
+            {
+                "infiltration_method": "green-ampt",
+                "theta_sat": np.array([0.3, 0.4, 0.45]),
+            },
+        ),
+        (
+            ControlVolumeArray,
+            {
+                "flux_method": "table",
+                "theta_sat": np.array([0.3, 0.4, 0.45]),
+                "output_interval": 3,
+                "output_aggregation": "mean",
+            },
+        ),
+    ],
+)
+def test_pickle_continues_run(forcing, cls, kwargs):
+    inflow, pet = forcing(50, seed=24)
+    volume = cls(soil="loam", max_vertical_rate=0.05, **kwargs)
+    volume.run(inflow[:20], pet[:20])
+    restored = pickle.loads(pickle.dumps(volume))
+    assert restored.theta_pet_max == pytest.approx(volume.theta_pet_max)
+    volume.run(inflow[20:], pet[20:])
+    restored.run(inflow[20:], pet[20:])
+    for name, values in volume.output_dict.items():
+        assert np.array_equal(restored.output_dict[name], values), name
+
+
+def test_get_state_set_state(forcing):
+    inflow, pet = forcing(50, seed=24)
+    volume = ControlVolume(
+        infiltration_method="green-ampt", soil="loam", max_vertical_rate=0.05
+    )
+    volume.run(inflow[:20], pet[:20])
+    state = volume.get_state()
+    assert set(state) == set(volume.state_variables) | {"infiltration"}
+    volume.run(inflow[20:], pet[20:])
+    theta = volume.theta
+
+    volume.set_state(state)
+    assert volume.total_time == 20.0
+    volume.run(inflow[20:], pet[20:])
+    assert volume.theta == theta
+
+
+def test_pickle_size(forcing):
+    # pickling every attribute of a control volume took 1123 bytes for a
+    # new control volume and 1452 bytes after a step. Only the parameter
+    # and state values, infiltration method, and output are pickled now
+    # (975 and 1179 bytes), without the attribute names
+    volume = ControlVolume()
+    assert len(pickle.dumps(volume)) < 1123
+    volume.update(0.01, 0.001)
+    assert len(pickle.dumps(volume)) < 1452
+    volume.run(*forcing(10, seed=24))
+    output_nbytes = 8 * len(volume.output_variables) * 11
+    assert len(pickle.dumps(volume)) < 1452 + output_nbytes
+    assert b"theta_sat" not in pickle.dumps(volume)
+
+    # storage for array output is allocated when it is needed
+    volume = ControlVolumeArray(ncells=100_000)
+    assert volume._output.nbytes == 0
+
+
+@pytest.mark.parametrize("cls", [ControlVolume, ControlVolumeArray])
+def test_parameter_and_state_containers(cls):
+    volume = cls(theta_sat=0.3, flux_method="table")
+    assert not hasattr(volume, "__dict__")
+    assert volume.theta_sat == volume._parameters.theta_sat
+    assert volume._flux_table is volume._parameters.flux_table
+    with pytest.raises(AttributeError):
+        volume.theta_sat = 0.4
+    with pytest.raises(AttributeError):
+        volume.unknown = 1.0
+
+    # copies share the parameters and have their own state
+    volume.update(0.01, 0.001)
+    other = copy.copy(volume)
+    assert other._parameters is volume._parameters
+    assert other._state is not volume._state
+    other.theta = 0.2
+    assert np.all(volume.theta != 0.2)
+
+
+def test_pickle_keeps_flux_table(monkeypatch):
+    volume = ControlVolume(flux_method="table")
+    volume.update(0.01, 0.001)
+
+    def fail(self):
+        raise AssertionError("the flux table is rebuilt")
+
+    monkeypatch.setattr(ControlVolume, "_create_flux_table", fail)
+    restored = pickle.loads(pickle.dumps(volume))
+    assert np.array_equal(
+        restored._flux_table.values, volume._flux_table.values
+    )
+    restored.update(0.01, 0.001)
+    volume.update(0.01, 0.001)
+    assert restored.theta == volume.theta
+
+
+def test_output_buffer_pickle(tmp_path):
+    buffer = OutputBuffer(["a", "b"], chunk_size=100)
+    buffer.extend(np.ones((2, 5)))
+    restored = pickle.loads(pickle.dumps(buffer))
+    assert restored.capacity == 5
+    restored.append([2.0, 3.0])
+    assert np.array_equal(restored.to_dict()["b"], [1.0] * 5 + [3.0])
+
+    volume = ControlVolume(output_path=tmp_path / "output.csv")
+    volume.update(0.01, 0.001)
+    with pytest.raises(TypeError):
+        pickle.dumps(volume)
+    volume.close_output()
+
+
+@pytest.mark.parametrize(
+    "cls, kwargs",
+    [
+        (ControlVolume, {}),
+        (ControlVolume, {"infiltration_method": "green-ampt"}),
+        (
+            ControlVolumeArray,
+            {
+                "infiltration_method": "green-ampt",
+                "theta_sat": np.array([0.3, 0.4, 0.45]),
+            },
+        ),
+    ],
+)
+def test_save_state_resumes_run(tmp_path, forcing, cls, kwargs):
+    path = tmp_path / "state.npz"
+    inflow, pet = forcing(50, seed=24)
+    volume = cls(soil="loam", max_vertical_rate=0.05, **kwargs)
+    volume.run(inflow[:20], pet[:20])
+    volume.save_state(path)
+    volume.run(inflow[20:], pet[20:])
+
+    # each scenario forked from the saved state matches the original run
+    for _ in range(2):
+        restored = cls(soil="loam", max_vertical_rate=0.05, **kwargs)
+        restored.load_state(path)
+        assert restored.total_time == 20.0
+        restored.run(inflow[20:], pet[20:])
+        for name, values in restored.output_dict.items():
+            assert np.array_equal(values, volume.output_dict[name][20:]), name
+
+
+def test_load_state_mismatch(tmp_path):
+    path = tmp_path / "state.npz"
+    ControlVolume(infiltration_method="green-ampt").save_state(path)
+    with pytest.raises(ValueError, match="infiltration_method"):
+        ControlVolume().load_state(path)
+    ControlVolumeArray(ncells=3).save_state(path)
+    with pytest.raises(ValueError, match="shape"):
+        ControlVolumeArray(ncells=4).load_state(path)
+
+
+def test_state_file_round_trip(tmp_path):
+    path = tmp_path / "state"
+    state = {
+        "a": 1.5,
+        "b": None,
+        "c": (np.arange(3.0), 2),
+        "d": [0.0, 1.0],
+        "e": {"f": np.array([True, False]), "g": None},
+    }
+    write_state_file(path, state, metadata={"name": "test"})
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["state"]
+    restored, metadata = read_state_file(path)
+    assert metadata == {"name": "test"}
+    assert restored.keys() == state.keys()
+    assert restored["a"] == 1.5 and isinstance(restored["a"], float)
+    assert restored["b"] is None
+    assert isinstance(restored["c"], tuple)
+    assert np.array_equal(restored["c"][0], state["c"][0])
+    assert restored["d"] == state["d"]
+    assert np.array_equal(restored["e"]["f"], state["e"]["f"])
+    assert restored["e"]["g"] is None
+
+    with pytest.raises(TypeError):
+        write_state_file(path, {"a": "text"})
@@ -8,7 +8,7 @@ simple_soil is an open-source project and any assistance is welcomed.
 __author__ = "simple_soil Team"
 
 from .version import __version__  # isort:skip
-from . import base, utils
+from . import base, io, utils
 
 # from .mbase import run_model, which
 
@@ -16,5 +16,6 @@ __all__ = [
     "__author__",
     "__version__",
     "base",
+    "io",
     "utils",
 ]
@@ -1 +1,4 @@
 from .control_volume import *
+from .control_volume_array import *
+from .parallel import *
+from .runner import *
@@ -1,18 +1,43 @@
+import copy
+from collections import namedtuple
+from operator import attrgetter
+from typing import Dict, Sequence, Tuple, Union
+
+import numpy as np
 import pandas as pd
 
+from ..io.output_writer import open_output_writer
+from ..io.prms_csv import PathLike
+from ..io.state_file import read_state_file, write_state_file
+from ..utils.array_utils import array_return
 from ..utils.flow_functions import (
     aet_volumetric_rate,
+    aet_volumetric_rate_derivative,
     flow_factor,
     infiltration_volumetric_rate,
+    infiltration_volumetric_rate_derivative,
     lateral_volumetric_rate,
+    lateral_volumetric_rate_derivative,
     recharge_volumetric_rate,
-    rejected_infiltration_volumetric_rate,
+    recharge_volumetric_rate_derivative,
     surface_volumetric_rate,
+    surface_volumetric_rate_derivative,
     volume_change_rate,
+    volume_change_rate_derivative,
+)
+from ..utils.flux_table import FluxTable
+from ..utils.fraction_functions import (
+    saturation_fraction,
+    saturation_fraction_derivative,
+    surface_infiltration_fraction,
+    surface_infiltration_fraction_derivative,
 )
-from ..utils.fraction_functions import saturation_fraction
 from ..utils.infiltration_functions import GreenAmpt, InfiltrationConstantLoss
-from ..utils.newton_raphson import newton_raphson
+from ..utils.instrumentation import SolverInstrumentation
+from ..utils.newton_raphson import newton_bisection, newton_raphson
+from ..utils.numba_kernels import HAS_NUMBA, KERNEL_OUTPUT_SIZE, run_kernel
+from ..utils.output_buffer import OutputBuffer
+from ..version import __version__
 
 LENGTH_UNITS = (
     "m",
@@ -21,9 +46,163 @@ LENGTH_UNITS = (
     "ft",
 )
 TIME_UNITS = ("d", "hr")
+DERIVATIVE_METHODS = ("analytic", "numerical")
+FLUX_METHODS = ("exact", "table")
+SOLVERS = ("newton", "bracketed")
+OUTPUT_VARIABLES = (
+    "total time",
+    "iterations",
+    "theta",
+    "volume_L3",
+    "rejected_inflow_L3/T",
+    "inflow_L3/T",
+    "surface_L3/T",
+    "aet_L3/T",
+    "lateral_L3/T",
+    "recharge_L3/T",
+    "storage_change_L3/T",
+    "residual_L3/T",
+)
+OUTPUT_AGGREGATIONS = ("sum", "mean")
+# number of steps solved in each call to the Numba kernel
+KERNEL_BLOCK_SIZE = 1024
+# newton tolerance used by the Numba kernel
+KERNEL_TOLERANCE = 1e-6
+
+
+# parameters that are set when a control volume is created
+PARAMETER_VARIABLES = (
+    "area",
+    "thickness",
+    "discharge_thickness",
+    "theta_wp",
+    "theta_fc",
+    "theta_sat",
+    "max_vertical_rate",
+    "horizontal_vertical_ratio",
+    "pet_fraction",
+    "smoothing_omega",
+    "delta_theta",
+    "max_iterations",
+    "length_units",
+    "time_units",
+    "derivative_method",
+    "flux_method",
+    "table_tolerance",
+    "output_variables",
+    "output_interval",
+    "output_aggregation",
+    "output_path",
+    "output_format",
+    "adaptive",
+    "max_theta_change",
+    "theta_tolerance",
+    "min_delta_t",
+    "solver",
+)
+# parameters calculated from the parameters when a control volume is
+# created (ControlVolume._set_derived_parameters)
+DERIVED_PARAMETERS = (
+    "theta_pet_max",
+    "volume_max",
+    "theta_discharge",
+    "max_horizontal_rate",
+    "flux_table",
+)
+# attributes that are updated as a control volume is run
+STATE_VARIABLES = (
+    "theta",
+    "theta0",
+    "volume",
+    "volume0",
+    "total_time",
+    "inflow_rate",
+    "pet_rate",
+    "delta_t",
+    "iterations",
+    "error",
+    "converged",
+    "inflow_volume",
+    "surface_volume",
+    "aet_volume",
+    "lateral_volume",
+    "recharge_volume",
+    "storage_volume_change",
+    "nsubsteps",
+    "_previous_step",
+    "_substep_delta_t",
+    "_output_count",
+    "_output_window",
+)
+
+
+class ControlVolumeParameters(
+    namedtuple(
+        "ControlVolumeParameters",
+        PARAMETER_VARIABLES + DERIVED_PARAMETERS,
+        defaults=(None,) * len(DERIVED_PARAMETERS),
+    )
+):
+    """
+    Immutable parameters and derived parameters of a control volume.
+
+    Copies of a control volume share its parameters, and the parameters
+    are pickled with the derived parameters and flux table so they are
+    not recalculated when a control volume is unpickled.
+    """
+
+    __slots__ = ()
+
+
+class ControlVolumeState:
+    """
+    Mutable state of a control volume (STATE_VARIABLES). Every control
+    volume, and every copy of a control volume, has its own state.
+    """
+
+    __slots__ = STATE_VARIABLES
+
+    def __init__(self) -> None:
+        for key in self.__slots__:
+            setattr(self, key, None)
+
+    def __copy__(self) -> "ControlVolumeState":
+        state = ControlVolumeState.__new__(ControlVolumeState)
+        state.__setstate__(self.__getstate__())
+        return state
+
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, key) for key in self.__slots__)
+
+    def __setstate__(self, values: tuple) -> None:
+        for key, value in zip(self.__slots__, values):
+            setattr(self, key, value)
 
 
 class ControlVolume:
+    # infiltration class used for green-ampt infiltration
+    _green_ampt_class = GreenAmpt
+
+    # parameters and derived parameters are stored in an immutable
+    # ControlVolumeParameters and state variables in a
+    # ControlVolumeState, both can be read as attributes of the control
+    # volume and state variables can also be set
+    __slots__ = (
+        "_parameters",
+        "_state",
+        "infiltration_method",
+        "instrumentation",
+        "_output",
+        "_table_cells",
+        "_table_storage0",
+        "_components",
+        "_components_theta",
+    )
+    parameter_variables = PARAMETER_VARIABLES
+    state_variables = STATE_VARIABLES
+    # cached attributes that are not pickled or restored with set_state
+    _cached_variables = ("_components", "_components_theta")
+
     def __init__(
         self,
         area: float = 1.0,
@@ -43,26 +222,59 @@ class ControlVolume:
         time_units: str = "d",
         infiltration_method: str = "constant",
         soil: str = None,
+        infiltration_solver: str = "newton",
+        derivative_method: str = "analytic",
+        nsteps: int = None,
+        output_variables: Sequence[str] = None,
+        output_interval: int = 1,
+        output_aggregation: str = None,
+        output_path: PathLike = None,
+        output_format: str = None,
+        flux_method: str = "exact",
+        table_tolerance: float = 1e-9,
+        instrument: bool = False,
+        adaptive: bool = False,
+        max_theta_change: float = 0.05,
+        theta_tolerance: float = 1e-3,
+        min_delta_t: float = 1e-3,
+        solver: str = "newton",
     ) -> "ControlVolume":
-        self.area = area
-        self.thickness = thickness
-        self.discharge_thickness = discharge_thickness
-        self.theta0 = theta0
-        self.theta_wp = theta_wp
-        self.theta_fc = theta_fc
-        self.theta_sat = theta_sat
-        self.max_vertical_rate = max_vertical_rate
-        self.horizontal_vertical_ratio = horizontal_vertical_ratio
-        self.pet_fraction = pet_fraction
-        self.theta_pet_max = (
-            self.theta_wp
-            + (self.theta_sat - self.theta_wp) * self.pet_fraction
+        if output_variables is None:
+            output_variables = OUTPUT_VARIABLES
+        if output_aggregation is not None:
+            output_aggregation = output_aggregation.lower()
+        self._parameters = ControlVolumeParameters(
+            area=area,
+            thickness=thickness,
+            discharge_thickness=discharge_thickness,
+            theta_wp=theta_wp,
+            theta_fc=theta_fc,
+            theta_sat=theta_sat,
+            max_vertical_rate=max_vertical_rate,
+            horizontal_vertical_ratio=horizontal_vertical_ratio,
+            pet_fraction=pet_fraction,
+            smoothing_omega=smoothing_omega,
+            delta_theta=delta_theta,
+            max_iterations=max_iterations,
+            length_units=length_units.lower(),
+            time_units=time_units.lower(),
+            derivative_method=derivative_method.lower(),
+            flux_method=flux_method.lower(),
+            table_tolerance=table_tolerance,
+            output_variables=("total time",)
+            + tuple(name for name in output_variables if name != "total time"),
+            output_interval=output_interval,
+            output_aggregation=output_aggregation,
+            output_path=output_path,
+            output_format=output_format,
+            adaptive=adaptive,
+            max_theta_change=max_theta_change,
+            theta_tolerance=theta_tolerance,
+            min_delta_t=min_delta_t,
+            solver=solver.lower(),
         )
-        self.smoothing_omega = smoothing_omega
-        self.delta_theta = delta_theta
-        self.max_iterations = max_iterations
-        self.length_units = length_units.lower()
-        self.time_units = time_units.lower()
+        self._state = ControlVolumeState()
+        self.theta0 = theta0
 
         self._validate()
 
@@ -71,24 +283,18 @@ class ControlVolume:
                 max_vertical_rate,
             )
         elif infiltration_method == "green-ampt":
-            self.infiltration_method = GreenAmpt(
+            self.infiltration_method = self._green_ampt_class(
                 theta_sat,
                 max_vertical_rate,
                 self.length_units,
                 soil=soil,
                 delta_F=delta_theta,
+                solver=infiltration_solver,
             )
 
-        self.volume_max = theta_sat * area * thickness
         self.volume0 = theta0 * area * thickness
         self.theta = theta0
         self.volume = theta0 * area * thickness
-        self.theta_discharge = (
-            theta_sat * (thickness - discharge_thickness) / thickness
-        )
-        self.max_horizontal_rate = (
-            max_vertical_rate * horizontal_vertical_ratio
-        )
 
         # time step data
         self.inflow_rate = None
@@ -99,6 +305,12 @@ class ControlVolume:
         self.iterations = None
         self.error = None
         self.converged = False
+        # water content at the start and length of the last step
+        self._previous_step = None
+
+        # adaptive sub-step data
+        self.nsubsteps = None
+        self._substep_delta_t = None
 
         # output data
         self.total_time = 0.0
@@ -109,93 +321,228 @@ class ControlVolume:
         self.recharge_volume = None
         self.storage_volume_change = None
 
-        self.output_dict = {
-            "total time": [],
-            "iterations": [],
-            "theta": [],
-            "volume_L3": [],
-            "rejected_inflow_L3/T": [],
-            "inflow_L3/T": [],
-            "surface_L3/T": [],
-            "aet_L3/T": [],
-            "lateral_L3/T": [],
-            "recharge_L3/T": [],
-            "storage_change_L3/T": [],
-            "residual_L3/T": [],
+        # flux components from the last residual evaluation
+        for key in self._cached_variables:
+            setattr(self, key, None)
+
+        self._output = self._create_output(nsteps)
+        self._output_count = 0
+        self._output_window = None
+
+        # optional solver counters and timings
+        self.instrumentation = SolverInstrumentation() if instrument else None
+
+        self._table_cells = None
+        self._table_storage0 = None
+        self._set_derived_parameters()
+
+    def _set_derived_parameters(self) -> None:
+        theta_wp = self.theta_wp
+        theta_sat = self.theta_sat
+        thickness = self.thickness
+        self._parameters = self._parameters._replace(
+            theta_pet_max=theta_wp
+            + (theta_sat - theta_wp) * self.pet_fraction,
+            volume_max=theta_sat * self.area * thickness,
+            theta_discharge=theta_sat
+            * (thickness - self.discharge_thickness)
+            / thickness,
+            max_horizontal_rate=self.max_vertical_rate
+            * self.horizontal_vertical_ratio,
+        )
+
+        # tabulated flux curves
+        if self.flux_method == "table":
+            self._parameters = self._parameters._replace(
+                flux_table=self._create_flux_table()
+            )
+
+    def __getstate__(self) -> tuple:
+        # only the parameters (with the derived parameters and flux
+        # table), state, infiltration method, solver counters, and
+        # output are pickled
+        return (
+            self._parameters,
+            self._state,
+            self.infiltration_method,
+            self.instrumentation,
+            self._output,
+        )
+
+    def __setstate__(self, state: tuple) -> None:
+        (
+            self._parameters,
+            self._state,
+            self.infiltration_method,
+            self.instrumentation,
+            self._output,
+        ) = state
+        for key in self._cached_variables:
+            setattr(self, key, None)
+        self._table_cells = None
+        self._table_storage0 = None
+        if self._flux_table is not None and self.delta_t is not None:
+            self._set_table_storage()
+
+    def __copy__(self) -> "ControlVolume":
+        # shallow copies (used for subsets of cells) share the parameters
+        # and have their own copy of the state
+        volume = type(self).__new__(type(self))
+        for cls in type(self).__mro__[:-1]:
+            for key in vars(cls).get("__slots__", ()):
+                setattr(volume, key, getattr(self, key))
+        volume._state = copy.copy(self._state)
+        for key in self._cached_variables:
+            setattr(volume, key, None)
+        return volume
+
+    def get_state(self) -> Dict[str, object]:
+        """
+        Get a copy of the state variables (state_variables) and the
+        infiltration state of the control volume. Output is not part
+        of the state.
+        """
+        state = {
+            key: copy.copy(getattr(self._state, key))
+            for key in self.state_variables
         }
+        state["infiltration"] = self.infiltration_method.get_state()
+        return state
+
+    def set_state(self, state: Dict[str, object]) -> None:
+        """
+        Restore the state variables and infiltration state returned by
+        get_state.
+        """
+        for key, value in state.items():
+            if key == "infiltration":
+                self.infiltration_method.set_state(value)
+            else:
+                setattr(self._state, key, copy.copy(value))
+        for key in self._cached_variables:
+            setattr(self, key, None)
+
+    def _state_metadata(self) -> Dict[str, object]:
+        # identifies the control volumes a state file can be loaded into
+        return {
+            "class": type(self).__name__,
+            "infiltration_method": type(self.infiltration_method).__name__,
+            "shape": list(np.shape(self.theta)),
+        }
+
+    def save_state(self, path: PathLike) -> None:
+        """
+        Save the state of the control volume (get_state) to a versioned
+        NPZ state file so that a run can be resumed, or several
+        scenarios started from the same state, with load_state. The
+        parameters and output of the control volume are not saved.
+
+        Parameters
+        ----------
+        path : str or PathLike
+            State file path.
+        """
+        metadata = self._state_metadata()
+        metadata["simple_soil_version"] = __version__
+        write_state_file(path, self.get_state(), metadata=metadata)
+
+    def load_state(self, path: PathLike) -> None:
+        """
+        Load a state saved with save_state. The control volume must have
+        the same class, infiltration method, and number of cells as the
+        control volume the state was saved from.
+
+        Parameters
+        ----------
+        path : str or PathLike
+            State file path.
+        """
+        state, metadata = read_state_file(path)
+        for key, value in self._state_metadata().items():
+            if metadata.get(key) != value:
+                raise ValueError(
+                    f"{key} ({metadata.get(key)}) in state file {path} "
+                    + f"does not match the control volume ({value})"
+                )
+        self.set_state(state)
 
     def __repr__(self):
+        items = dict(self._parameters._asdict())
+        for key in self.state_variables:
+            items[key] = getattr(self._state, key)
+        for key in ("infiltration_method", "instrumentation"):
+            items[key] = getattr(self, key)
         values = ""
-        for key, value in sorted(self.__dict__.items()):
+        for key, value in sorted(items.items()):
             values += f"{key}={value}\n"
         return f"{values}"
 
     def _validate(self):
-        if self.area < 0.0:
+        if np.any(self.area < 0.0):
             raise ValueError(
                 f"control volume area ({self.area}) "
                 + "must be greater than zero"
             )
-        if self.thickness < 0.0:
+        if np.any(self.thickness < 0.0):
             raise ValueError(
                 f"control volume thickness ({self.thickness}) "
                 + "must be greater than zero"
             )
-        if self.discharge_thickness < 0.0:
+        if np.any(self.discharge_thickness < 0.0):
             raise ValueError(
                 f"control volume discharge thickness"
                 + f" ({self.discharge_thickness}) must be greater than zero"
             )
-        if self.theta_wp < 0.0:
+        if np.any(self.theta_wp < 0.0):
             raise ValueError(
                 f"wilting point ({self.theta_wp}) must be greater than zero"
             )
-        if self.theta_wp > self.theta_fc:
+        if np.any(self.theta_wp > self.theta_fc):
             raise ValueError(
                 f"wilting point ({self.theta_wp}) must "
                 + f"be less than field capacity ({self.theta_fc})"
             )
-        if self.theta_fc > self.theta_sat:
+        if np.any(self.theta_fc > self.theta_sat):
             raise ValueError(
                 f"field capacity ({self.theta_fc}) must "
                 + f"be less than theta_sat ({self.theta_sat})"
             )
-        if self.theta0 < 0.0:
+        if np.any(self.theta0 < 0.0):
             raise ValueError(
                 f"initial moisture content ({self.theta0}) must "
                 + "be greater than zero"
             )
-        if self.theta0 > self.theta_sat:
+        if np.any(self.theta0 > self.theta_sat):
             raise ValueError(
                 f"initial moisture content ({self.theta_fc}) must "
                 + f"be less than theta_sat ({self.theta_sat})"
             )
-        if self.max_vertical_rate < 0.0:
+        if np.any(self.max_vertical_rate < 0.0):
             raise ValueError(
                 f"maximum vertical rate ({self.max_vertical_rate}) "
                 + "must be greater than zero"
             )
-        if self.horizontal_vertical_ratio < 0.0:
+        if np.any(self.horizontal_vertical_ratio < 0.0):
             raise ValueError(
                 "horizontal to vertical ratio "
                 + f"({self.horizontal_vertical_ratio}) "
                 + "must be greater than zero"
             )
-        if self.pet_fraction < 0.0:
+        if np.any(self.pet_fraction < 0.0):
             raise ValueError(
                 f"pet_fraction ({self.pet_fraction}) must be greater than zero"
             )
-        if self.pet_fraction > 1.0:
+        if np.any(self.pet_fraction > 1.0):
             raise ValueError(
                 f"pet_fraction ({self.pet_fraction}) must be "
                 + "less than or equal to one"
             )
-        if self.smoothing_omega < 0.0:
+        if np.any(self.smoothing_omega < 0.0):
             raise ValueError(
                 f"smoothing_omega ({self.smoothing_omega}) must "
                 + "be greater than zero"
             )
-        if self.delta_theta < 0.0:
+        if np.any(self.delta_theta < 0.0):
             raise ValueError(
                 f"delta_theta ({self.delta_theta}) must "
                 + "be greater than zero"
@@ -215,20 +562,79 @@ class ControlVolume:
                 f"Invalid time_units ({self.time_units}). "
                 + f"Valid length units are '{', '.join(TIME_UNITS)}'."
             )
+        if self.derivative_method not in DERIVATIVE_METHODS:
+            raise ValueError(
+                f"Invalid derivative_method ({self.derivative_method}). "
+                + "Valid derivative methods are "
+                + f"'{', '.join(DERIVATIVE_METHODS)}'."
+            )
+        if self.solver not in SOLVERS:
+            raise ValueError(
+                f"Invalid solver ({self.solver}). "
+                + f"Valid solvers are '{', '.join(SOLVERS)}'."
+            )
+        if self.flux_method not in FLUX_METHODS:
+            raise ValueError(
+                f"Invalid flux_method ({self.flux_method}). "
+                + f"Valid flux methods are '{', '.join(FLUX_METHODS)}'."
+            )
+        invalid = [
+            name
+            for name in self.output_variables
+            if name not in OUTPUT_VARIABLES
+        ]
+        if invalid:
+            raise ValueError(
+                f"Invalid output_variables ({', '.join(invalid)}). "
+                + "Valid output variables are "
+                + f"'{', '.join(OUTPUT_VARIABLES)}'."
+            )
+        if self.output_interval < 1:
+            raise ValueError(
+                f"output_interval ({self.output_interval}) must "
+                + "be greater than or equal to one"
+            )
+        if self.max_theta_change <= 0.0:
+            raise ValueError(
+                f"max_theta_change ({self.max_theta_change}) must be "
+                + "greater than zero"
+            )
+        if self.theta_tolerance <= 0.0:
+            raise ValueError(
+                f"theta_tolerance ({self.theta_tolerance}) must be "
+                + "greater than zero"
+            )
+        if self.min_delta_t <= 0.0:
+            raise ValueError(
+                f"min_delta_t ({self.min_delta_t}) must be greater than zero"
+            )
+        if (
+            self.output_aggregation is not None
+            and self.output_aggregation not in OUTPUT_AGGREGATIONS
+        ):
+            raise ValueError(
+                f"Invalid output_aggregation ({self.output_aggregation}). "
+                + "Valid output aggregations are "
+                + f"'{', '.join(OUTPUT_AGGREGATIONS)}'."
+            )
 
     def _calculate_volume(
         self,
         water_content: float,
     ):
+        parameters = self._parameters
         return (
-            saturation_fraction(
+            array_return(
+                saturation_fraction(
+                    water_content,
+                    parameters.theta_sat,
+                    smoothing_omega=parameters.smoothing_omega,
+                ),
                 water_content,
-                self.theta_sat,
-                smoothing_omega=self.smoothing_omega,
             )
-            * self.theta_sat
-            * self.thickness
-            * self.area
+            * parameters.theta_sat
+            * parameters.thickness
+            * parameters.area
         )
 
     def update(
@@ -237,6 +643,10 @@ class ControlVolume:
         pet_rate: float = 0.0,
         delta_t: float = 1.0,
     ):
+        if self.instrumentation is not None:
+            self.instrumentation.update(self, inflow_rate, pet_rate, delta_t)
+            return
+
         self.advance(
             inflow_rate=inflow_rate,
             pet_rate=pet_rate,
@@ -247,130 +657,705 @@ class ControlVolume:
 
         self.output()
 
-    def advance(
+    @property
+    def kernel_supported(self) -> bool:
+        """
+        True if the control volume can be run with the Numba kernel
+        (constant loss infiltration, analytic derivatives, exact fluxes,
+        the Newton-Raphson solver, no instrumentation, and no adaptive
+        sub-steps).
+        """
+        return (
+            isinstance(self.infiltration_method, InfiltrationConstantLoss)
+            and self.derivative_method == "analytic"
+            and self.flux_method == "exact"
+            and self.instrumentation is None
+            and not self.adaptive
+            and self.solver == "newton"
+        )
+
+    def run(
         self,
-        inflow_rate: float = 0.0,
-        pet_rate: float = 0.0,
+        inflow_rate: np.ndarray,
+        pet_rate: np.ndarray,
         delta_t: float = 1.0,
+        use_numba: bool = None,
     ) -> None:
-        self.theta0 = self.theta
-        self.volume0 = self._calculate_volume(self.theta)
+        """
+        Run the control volume for a series of time steps.
+
+        The results are identical to calling update for each step. If
+        Numba is installed (pip install simple_soil[fast]) and the
+        control volume is supported by the kernel (see
+        kernel_supported), all of the steps are solved in compiled
+        code. Otherwise update is called for each step.
+
+        Parameters
+        ----------
+        inflow_rate : numpy.ndarray
+            Inflow rate for each step.
+        pet_rate : numpy.ndarray
+            Potential evapotranspiration rate for each step.
+        delta_t : float (default 1.0)
+            Length of each time step.
+        use_numba : bool (default: None)
+            Run the steps with the Numba kernel. If not specified, the
+            kernel is used if Numba is installed and the control volume
+            is supported by the kernel.
+        """
+        inflow_rate, pet_rate = self._forcing_arrays(inflow_rate, pet_rate)
+        if use_numba is None:
+            use_numba = HAS_NUMBA and self.kernel_supported
+        elif use_numba:
+            if not HAS_NUMBA:
+                raise ValueError(
+                    "use_numba requires numba (pip install simple_soil[fast])"
+                )
+            if not self.kernel_supported:
+                raise ValueError(
+                    "use_numba requires constant infiltration, analytic "
+                    + "derivatives, exact fluxes, the newton solver, no "
+                    + "instrumentation, and no adaptive sub-steps"
+                )
+
+        if use_numba:
+            self._run_kernel(inflow_rate, pet_rate, delta_t)
+            return
+        if inflow_rate.ndim == 1:
+            inflow_rate = inflow_rate.tolist()
+            pet_rate = pet_rate.tolist()
+        for step_inflow, step_pet in zip(inflow_rate, pet_rate):
+            self.update(
+                inflow_rate=step_inflow,
+                pet_rate=step_pet,
+                delta_t=delta_t,
+            )
+
+    def spin_up(
+        self,
+        inflow_rate: np.ndarray,
+        pet_rate: np.ndarray,
+        delta_t: float = 1.0,
+        tol: float = 1e-6,
+        max_cycles: int = 50,
+        use_numba: bool = None,
+    ) -> Tuple[int, Union[bool, np.ndarray]]:
+        """
+        Set the water content to the periodic steady state for a
+        repeating forcing cycle.
+
+        The periodic steady state is the water content that is the same
+        at the start and end of the forcing cycle. It is found with a
+        bracketed secant method on the change in water content over a
+        cycle, which usually needs a few cycles instead of the many
+        years of repeated forcing needed to spin up the control volume
+        by calling update. A forcing cycle with a single step finds the
+        steady state for constant forcing. Each cycle starts at the
+        current total time and infiltration state, the cycles are not
+        written to the output, and only the water content and volume
+        of the control volume are changed.
+
+        Parameters
+        ----------
+        inflow_rate : numpy.ndarray
+            Inflow rate for each step in the forcing cycle.
+        pet_rate : numpy.ndarray
+            Potential evapotranspiration rate for each step in the
+            forcing cycle.
+        delta_t : float (default 1.0)
+            Length of each time step.
+        tol : float (default 1e-6)
+            Tolerance for the change in water content over a cycle.
+        max_cycles : int (default 50)
+            Maximum number of forcing cycles.
+        use_numba : bool (default: None)
+            Run the forcing cycles with the Numba kernel (see run).
+
+        Returns
+        -------
+        cycles : int
+            Number of forcing cycles run.
+        converged : bool or numpy.ndarray
+            Boolean (for each cell) indicating if the water content is
+            converged.
+        """
+        inflow_rate, pet_rate = self._forcing_arrays(inflow_rate, pet_rate)
+        if use_numba is None:
+            use_numba = HAS_NUMBA and self.kernel_supported
+        elif use_numba and not (HAS_NUMBA and self.kernel_supported):
+            raise ValueError(
+                "use_numba requires numba and a control volume supported "
+                + "by the kernel (see kernel_supported)"
+            )
+        nsteps = inflow_rate.shape[0]
+        if nsteps == 0:
+            raise ValueError("the forcing cycle must have at least one step")
+
+        # forcing cycles are run on a copy with its own infiltration
+        # state, which is restored at the start of each cycle
+        volume = copy.copy(self)
+        volume.instrumentation = None
+        volume.infiltration_method = copy.copy(self.infiltration_method)
+        infiltration_state = self.infiltration_method.get_state()
+        is_array = isinstance(self.theta, np.ndarray)
+        if use_numba:
+            inflow_rate = np.ascontiguousarray(inflow_rate.reshape(nsteps, -1))
+            pet_rate = np.ascontiguousarray(pet_rate.reshape(nsteps, -1))
+            ncells = inflow_rate.shape[1]
+            parameters = self._kernel_parameters(ncells)
+            values = np.empty((KERNEL_OUTPUT_SIZE, nsteps, ncells))
+        elif inflow_rate.ndim == 1:
+            inflow_rate = inflow_rate.tolist()
+            pet_rate = pet_rate.tolist()
+
+        def cycle(theta: np.ndarray) -> np.ndarray:
+            if use_numba:
+                theta = np.array(np.broadcast_to(theta, (ncells,)))
+                run_kernel(
+                    theta,
+                    *parameters,
+                    self.smoothing_omega,
+                    inflow_rate,
+                    pet_rate,
+                    delta_t,
+                    KERNEL_TOLERANCE,
+                    self.max_iterations,
+                    values,
+                )
+                return theta
+            volume.theta = theta.copy() if is_array else float(theta[0])
+            volume.total_time = self.total_time
+            volume.infiltration_method.set_state(infiltration_state)
+            volume._previous_step = None
+            for step_inflow, step_pet in zip(inflow_rate, pet_rate):
+                volume.advance(
+                    inflow_rate=step_inflow,
+                    pet_rate=step_pet,
+                    delta_t=delta_t,
+                )
+                volume.solve()
+            return np.array(volume.theta, dtype=float, ndmin=1)
+
+        x = np.array(self.theta, dtype=float, ndmin=1)
+        lower = np.zeros(x.shape, dtype=float)
+        upper = np.array(np.broadcast_to(self.theta_sat, x.shape), dtype=float)
+        x_previous = None
+        change_previous = None
+        cycles = 0
+        while True:
+            change = cycle(x) - x
+            cycles += 1
+            active = np.abs(change) > tol
+            if not np.any(active) or cycles >= max_cycles:
+                break
+            # the change over a cycle decreases with the starting water
+            # content, so its sign brackets the periodic steady state
+            increase = change > 0.0
+            lower = np.where(increase, x, lower)
+            upper = np.where(increase, upper, x)
+            x_new = x + change
+            if x_previous is not None:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    secant = x - change * (x - x_previous) / (
+                        change - change_previous
+                    )
+                x_new = np.where(
+                    (secant > lower) & (secant < upper), secant, x_new
+                )
+            x_new = np.clip(x_new, lower, upper)
+            x_previous, change_previous = x, change
+            x = np.where(active, x_new, x)
+
+        converged = ~active
+        theta = x if is_array else float(x[0])
+        if not is_array:
+            converged = bool(converged[0])
+        self.theta = theta
+        self.theta0 = theta
+        self.volume = self._calculate_volume(theta)
+        self.volume0 = self.volume
+        self._previous_step = None
+        return cycles, converged
+
+    def _forcing_shape(self, nsteps: int) -> Tuple[int, ...]:
+        return (nsteps,)
+
+    def _forcing_arrays(
+        self,
+        inflow_rate: np.ndarray,
+        pet_rate: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        inflow_rate = np.atleast_1d(np.asarray(inflow_rate, dtype=float))
+        pet_rate = np.atleast_1d(np.asarray(pet_rate, dtype=float))
+        nsteps = max(inflow_rate.shape[0], pet_rate.shape[0])
+        shape = self._forcing_shape(nsteps)
+        forcing = []
+        for name, value in (
+            ("inflow_rate", inflow_rate),
+            ("pet_rate", pet_rate),
+        ):
+            if len(shape) > 1 and value.ndim == 1:
+                value = value[:, np.newaxis]
+            try:
+                value = np.broadcast_to(value, shape)
+            except ValueError:
+                raise ValueError(
+                    f"{name} shape {value.shape} cannot be broadcast to "
+                    + f"the forcing shape {shape}"
+                )
+            forcing.append(value)
+        return forcing[0], forcing[1]
+
+    def _run_kernel(
+        self,
+        inflow_rate: np.ndarray,
+        pet_rate: np.ndarray,
+        delta_t: float,
+    ) -> None:
+        nsteps = inflow_rate.shape[0]
+        if nsteps == 0:
+            return
+        inflow_rate = inflow_rate.reshape(nsteps, -1)
+        pet_rate = pet_rate.reshape(nsteps, -1)
+        ncells = inflow_rate.shape[1]
+        parameters = self._kernel_parameters(ncells)
+        theta = np.array(
+            np.broadcast_to(np.asarray(self.theta, dtype=float), (ncells,))
+        )
+        tol = KERNEL_TOLERANCE
+        for start in range(0, nsteps, KERNEL_BLOCK_SIZE):
+            stop = min(start + KERNEL_BLOCK_SIZE, nsteps)
+            theta_start = theta.copy()
+            values = np.empty((len(OUTPUT_VARIABLES), stop - start, ncells))
+            run_kernel(
+                theta,
+                *parameters,
+                self.smoothing_omega,
+                np.ascontiguousarray(inflow_rate[start:stop]),
+                np.ascontiguousarray(pet_rate[start:stop]),
+                delta_t,
+                tol,
+                self.max_iterations,
+                values[1:],
+            )
+            # total time is accumulated the same way as in advance
+            total_time = np.cumsum(
+                np.append(self.total_time, np.full(stop - start, delta_t))
+            )
+            values[0] = total_time[1:, np.newaxis]
+            self.total_time = float(total_time[-1])
+            if stop - start > 1:
+                theta_start = values[2, -2]
+            self._set_kernel_state(
+                values[:, -1],
+                theta_start,
+                inflow_rate[stop - 1],
+                pet_rate[stop - 1],
+                delta_t,
+                tol,
+            )
+            if ncells == 1 and not isinstance(self.area, np.ndarray):
+                values = values[:, :, 0]
+            self._output_block(values)
 
+    def _kernel_parameters(self, ncells: int) -> list:
+        return [
+            np.ascontiguousarray(
+                np.broadcast_to(np.asarray(value, dtype=float), (ncells,))
+            )
+            for value in (
+                self.area,
+                self.thickness,
+                self.theta_wp,
+                self.theta_fc,
+                self.theta_sat,
+                self.theta_pet_max,
+                self.theta_discharge,
+                self.max_vertical_rate,
+                self.max_horizontal_rate,
+            )
+        ]
+
+    def _set_kernel_state(
+        self,
+        values: np.ndarray,
+        theta0: np.ndarray,
+        inflow_rate: np.ndarray,
+        pet_rate: np.ndarray,
+        delta_t: float,
+        tol: float,
+    ) -> None:
+        # set the state at the end of a kernel run to the state after
+        # the last update
+        state = dict(zip(OUTPUT_VARIABLES, values))
+        if not isinstance(self.area, np.ndarray):
+            state = {key: float(value[0]) for key, value in state.items()}
+            theta0 = float(theta0[0])
+            inflow_rate = float(inflow_rate[0])
+            pet_rate = float(pet_rate[0])
+            iterations = int(state["iterations"])
+        else:
+            state = {key: value.copy() for key, value in state.items()}
+            theta0 = theta0.copy()
+            iterations = state["iterations"].astype(int)
+        self.theta0 = theta0
+        self.volume0 = self._calculate_volume(theta0)
         self.inflow_rate = inflow_rate
         self.pet_rate = pet_rate
         self.delta_t = delta_t
-        self.total_time += delta_t
+        self.iterations = iterations
+        self.theta = state["theta"]
+        self.error = state["residual_L3/T"]
+        self.converged = np.logical_not(np.abs(self.error) > tol)
+        if not isinstance(self.area, np.ndarray):
+            self.converged = bool(self.converged)
+        self.volume = state["volume_L3"]
+        self.inflow_volume = state["inflow_L3/T"]
+        self.surface_volume = state["surface_L3/T"]
+        self.aet_volume = state["aet_L3/T"]
+        self.lateral_volume = state["lateral_L3/T"]
+        self.recharge_volume = state["recharge_L3/T"]
+        self.storage_volume_change = state["storage_change_L3/T"]
+        self._components = None
+        self._components_theta = None
+        self.infiltration_method.set_infiltration_time(self.total_time)
+
+    def advance(
+        self,
+        inflow_rate: float = 0.0,
+        pet_rate: float = 0.0,
+        delta_t: float = 1.0,
+    ) -> None:
+        parameters = self._parameters
+        state = self._state
+        state.theta0 = state.theta
+        state.volume0 = self._calculate_volume(state.theta)
+
+        state.inflow_rate = inflow_rate
+        state.pet_rate = pet_rate
+        state.delta_t = delta_t
+        state.total_time += delta_t
+        # flux components of the previous step
+        self._components = None
+        self._components_theta = None
+        if parameters.flux_table is not None:
+            self._set_table_storage()
+        # also clears the infiltration rate cached for the previous step
+        self.infiltration_method.set_infiltration_time(state.total_time)
 
     def solve(
         self,
     ) -> bool:
-        iterations, theta, residual, converged = newton_raphson(
-            self.residual,
-            self.derivative,
-            self.theta,
-            max_iter=self.max_iterations,
-        )
+        if self.adaptive:
+            self._solve_adaptive()
+        else:
+            self._solve_step()
+        return
+
+    def _solve_adaptive(self) -> None:
+        # solve the interval set by advance in sub-steps. Each sub-step
+        # is solved as one step and as two half steps and is repeated
+        # with half the length if a solution does not converge, theta
+        # changes by more than max_theta_change, or the solutions differ
+        # by more than theta_tolerance (a step doubling estimate of the
+        # time stepping error). The half step solution is kept, quiet
+        # sub-steps are doubled, and the last accepted sub-step length,
+        # before it is cut to the end of the interval, is reused for the
+        # next interval. Fluxes are averaged over the interval.
+        interval = self.delta_t
+        end_time = self.total_time
+        theta0 = self.theta0
+        volume0 = self.volume0
+        forcing = {"inflow_rate": self.inflow_rate, "pet_rate": self.pet_rate}
+        self.total_time -= interval
+
+        # sub-step length chosen by the step size control, the last
+        # sub-step is shortened to end at the end of the interval
+        step_delta_t = interval
+        if self._substep_delta_t is not None:
+            step_delta_t = min(self._substep_delta_t, interval)
+        accepted_delta_t = step_delta_t
+        remaining = interval
+        totals = {}
+        iterations = 0
+        converged = True
+        nsubsteps = 0
+        while remaining > 0.0:
+            last = step_delta_t >= remaining
+            delta_t = remaining if last else step_delta_t
+            theta = self.theta
+            total_time = self.total_time
+            infiltration_state = self.infiltration_method.get_state()
+
+            self.advance(delta_t=delta_t, **forcing)
+            self._solve_step()
+            theta_full = self.theta
+            substep_iterations = self.iterations
+            substep_converged = np.all(self.converged)
+            self.theta = theta
+            self.total_time = total_time
+            self.infiltration_method.set_state(infiltration_state)
+
+            half_steps = []
+            for _ in range(2):
+                self.advance(delta_t=0.5 * delta_t, **forcing)
+                self._solve_step()
+                half_steps.append((self._step_components(), self.converged))
+                substep_iterations = substep_iterations + self.iterations
+                substep_converged = substep_converged and np.all(
+                    self.converged
+                )
+            change = np.max(np.abs(self.theta - theta))
+            error = np.max(np.abs(self.theta - theta_full))
+            if (
+                not substep_converged
+                or change > self.max_theta_change
+                or error > self.theta_tolerance
+            ) and delta_t > self.min_delta_t:
+                self.theta = theta
+                self.total_time = total_time
+                self.infiltration_method.set_state(infiltration_state)
+                step_delta_t = max(0.5 * delta_t, self.min_delta_t)
+                continue
+
+            for components, step_converged in half_steps:
+                for key, value in components.items():
+                    totals[key] = totals.get(key, 0.0) + value * (
+                        0.5 * delta_t
+                    )
+                converged = converged & step_converged
+            iterations = iterations + substep_iterations
+            nsubsteps += 1
+            remaining = 0.0 if last else remaining - delta_t
+            accepted_delta_t = step_delta_t
+            if (
+                error < 0.25 * self.theta_tolerance
+                and change < 0.5 * self.max_theta_change
+            ):
+                step_delta_t *= 2.0
+        self._substep_delta_t = accepted_delta_t
+
+        # state for the whole interval
+        self.total_time = end_time
+        self.delta_t = interval
+        self.theta0 = theta0
+        self.volume0 = volume0
         self.iterations = iterations
-        self.theta = theta
-        self.error = residual
         self.converged = converged
-        self.volume = float(self._calculate_volume(theta)[0])
+        self.nsubsteps = nsubsteps
+        self._components = {
+            key: value / interval for key, value in totals.items()
+        }
+        self._components_theta = self.theta
+
+    def _solve_step(
+        self,
+    ) -> None:
+        parameters = self._parameters
+        state = self._state
+        if parameters.derivative_method == "analytic":
+            f, df = self.residual_and_derivative, None
+        else:
+            f, df = self.residual, self.derivative
+        if self.instrumentation is not None:
+            f, df = self.instrumentation.wrap(f, df)
+        if parameters.solver == "bracketed":
+            # the residual decreases with water content and has a root
+            # between zero and theta_sat
+            iterations, theta, residual, converged = newton_bisection(
+                f,
+                df,
+                self._initial_guess(),
+                0.0,
+                parameters.theta_sat,
+                max_iter=parameters.max_iterations,
+                increasing=False,
+            )
+        else:
+            iterations, theta, residual, converged = newton_raphson(
+                f,
+                df,
+                state.theta,
+                max_iter=parameters.max_iterations,
+            )
+        state._previous_step = (state.theta0, state.delta_t)
+        state.iterations = iterations
+        state.theta = theta
+        state.error = residual
+        state.converged = converged
+        state.volume = self._calculate_volume(theta)
         return
 
+    def _initial_guess(self) -> float:
+        # water content extrapolated from the last step
+        if self._previous_step is None:
+            return self.theta
+        theta0, delta_t = self._previous_step
+        return self.theta + (self.theta - theta0) * (self.delta_t / delta_t)
+
     def output(self):
-        water_content = self.theta
-        self.inflow_volume = infiltration_volumetric_rate(
-            water_content,
-            self.theta0,
-            self.inflow_rate,
-            self.theta_sat,
-            self.theta_discharge,
-            self.area,
-            self.infiltration_method,
-            smoothing_omega=self.smoothing_omega,
-        )
-        self.aet_volume = aet_volumetric_rate(
-            water_content,
-            self.pet_rate,
-            self.theta_pet_max,
-            self.theta_wp,
-            self.area,
-            smoothing_omega=self.smoothing_omega,
-        )
-        self.lateral_volume = lateral_volumetric_rate(
-            water_content,
-            self.theta_sat,
-            self.theta_fc,
-            self.theta_wp,
-            self.area,
-            self.thickness,
-            self.max_horizontal_rate,
-            smoothing_omega=self.smoothing_omega,
-        )
-        self.recharge_volume = recharge_volumetric_rate(
-            water_content,
-            self.theta_sat,
-            self.theta_fc,
-            self.theta_wp,
-            self.area,
-            self.thickness,
-            self.max_vertical_rate,
-            smoothing_omega=self.smoothing_omega,
-        )
-        self.surface_volume = surface_volumetric_rate(
-            water_content,
-            self.theta_sat,
-            self.theta_discharge,
-            self.area,
-            self.max_vertical_rate,
-            smoothing_omega=self.smoothing_omega,
-        )
-        self.storage_volume_change = volume_change_rate(
-            water_content,
-            self.theta0,
-            self.theta_sat,
-            self.area,
-            self.thickness,
-            self.delta_t,
-            smoothing_omega=self.smoothing_omega,
-        )
+        parameters = self._parameters
+        state = self._state
+        state._output_count += 1
+        record = state._output_count % parameters.output_interval == 0
+        if parameters.output_aggregation is None:
+            if record:
+                self._output.append(self._output_values())
+            return
 
-        self.output_dict["total time"].append(self.total_time)
-        self.output_dict["iterations"].append(self.iterations)
+        values = self._output_values()
+        if state._output_window is None:
+            state._output_window = [0.0 for _ in values]
+        # total time is the time at the end of the output interval
+        for idx, value in enumerate(values[1:], start=1):
+            state._output_window[idx] = state._output_window[idx] + value
+        if record:
+            values = state._output_window
+            values[0] = state.total_time
+            if parameters.output_aggregation == "mean":
+                values[1:] = [
+                    value / parameters.output_interval for value in values[1:]
+                ]
+            self._output.append(values)
+            state._output_window = None
 
-        self.output_dict["theta"].append(self.theta)
-        self.output_dict["volume_L3"].append(self.volume)
+        return
 
-        self.output_dict["inflow_L3/T"].append(self.inflow_volume)
-        self.output_dict["rejected_inflow_L3/T"].append(
-            rejected_infiltration_volumetric_rate(
-                water_content,
-                self.theta0,
-                self.inflow_rate,
-                self.theta_sat,
-                self.theta_discharge,
-                self.area,
-                self.infiltration_method,
-                smoothing_omega=self.smoothing_omega,
+    def flush_output_window(self) -> None:
+        """
+        Record the steps in a partial output_aggregation window.
+
+        Aggregated output is recorded at the end of every output_interval
+        steps. Steps after the last complete window are held (and are
+        part of the state of the control volume) so that a run can be
+        continued, for example one chunk of forcing at a time, and are
+        not recorded until the window is complete. flush_output_window
+        records the partial window at the current total time, with mean
+        values averaged over the steps in the partial window, and starts
+        a new window. close_output calls flush_output_window.
+        """
+        if self._output_window is None:
+            return
+        nsteps = self._output_count % self.output_interval
+        values = self._output_window
+        values[0] = self.total_time
+        if self.output_aggregation == "mean":
+            values[1:] = [value / nsteps for value in values[1:]]
+        self._output.append(values)
+        self._output_window = None
+        self._output_count = 0
+
+    def _output_block(self, values: np.ndarray) -> None:
+        # record a block of steps with values for every output variable
+        # with a shape of (number of variables, number of steps, ...)
+        # the same way as calling output for each step
+        values = values[
+            [OUTPUT_VARIABLES.index(name) for name in self.output_variables]
+        ]
+        nsteps = values.shape[1]
+        count = self._output_count + 1 + np.arange(nsteps)
+        self._output_count += nsteps
+        record = np.flatnonzero(count % self.output_interval == 0)
+        if self.output_aggregation is None:
+            self._output.extend(values[:, record])
+            return
+
+        # windows are summed sequentially, like output, with cumsum
+        window = self._output_window
+        start = 0
+        for stop in (record + 1).tolist() + [nsteps]:
+            if stop == start:
+                continue
+            steps = values[1:, start:stop]
+            if window is not None:
+                steps = np.concatenate(
+                    (np.asarray(window[1:])[:, np.newaxis], steps), axis=1
+                )
+            totals = np.cumsum(steps, axis=1)[:, -1]
+            window = [0.0] + list(totals)
+            if stop - 1 in record:
+                if self.output_aggregation == "mean":
+                    totals = totals / self.output_interval
+                self._output.append([values[0, stop - 1]] + list(totals))
+                window = None
+            start = stop
+        self._output_window = window
+
+    def _output_values(self) -> list:
+        parameters = self._parameters
+        state = self._state
+        values = {
+            "total time": state.total_time,
+            "iterations": state.iterations,
+            "theta": state.theta,
+            "volume_L3": state.volume,
+            "residual_L3/T": state.error,
+        }
+        # flux components are only evaluated if a flux is recorded
+        if any(name not in values for name in parameters.output_variables):
+            components = self._step_components()
+            values.update(components)
+
+            state.inflow_volume = components["inflow_L3/T"]
+            state.aet_volume = components["aet_L3/T"]
+            state.lateral_volume = components["lateral_L3/T"]
+            state.recharge_volume = components["recharge_L3/T"]
+            state.surface_volume = components["surface_L3/T"]
+            state.storage_volume_change = components["storage_change_L3/T"]
+
+        return [values[name] for name in parameters.output_variables]
+
+    def _step_components(self) -> Dict[str, float]:
+        # flux components at the solution, reusing the components from
+        # the last residual evaluation of the step (advance clears them)
+        # if it was evaluated at the solution
+        theta = self.theta
+        if self._components is not None:
+            if isinstance(theta, np.ndarray):
+                if np.array_equal(self._components_theta, theta):
+                    return self._components
+            elif self._components_theta == theta:
+                return self._components
+        return self.flux_components(theta)
+
+    def _create_output(
+        self, nsteps: int = None, ncells: int = None
+    ) -> OutputBuffer:
+        if nsteps is not None:
+            nsteps = nsteps // self.output_interval
+        writer = None
+        if self.output_path is not None:
+            writer = open_output_writer(
+                self.output_path,
+                self.output_variables,
+                ncells=ncells,
+                output_format=self.output_format,
             )
-        )
-        self.output_dict["aet_L3/T"].append(self.aet_volume)
-        self.output_dict["lateral_L3/T"].append(self.lateral_volume)
-        self.output_dict["recharge_L3/T"].append(self.recharge_volume)
-        self.output_dict["surface_L3/T"].append(self.surface_volume)
-        self.output_dict["storage_change_L3/T"].append(
-            self.storage_volume_change
+        return OutputBuffer(
+            self.output_variables, nsteps=nsteps, ncells=ncells, writer=writer
         )
 
-        self.output_dict["residual_L3/T"].append(self.error)
+    def close_output(self) -> None:
+        """
+        Record any partial output_aggregation window (see
+        flush_output_window), write any buffered output to output_path,
+        and close the output file. Output written to output_path can be
+        read with simple_soil.io.OutputReader.
+        """
+        if self._output.writer is not None and self._output.writer.closed:
+            return
+        self.flush_output_window()
+        self._output.close()
 
-        return
+    @property
+    def output_dict(self) -> Dict[str, np.ndarray]:
+        return self._output.to_dict()
 
     def get_dataframe(self, normalize=False) -> pd.DataFrame:
-        df = pd.DataFrame.from_dict(
-            self.output_dict,
-        ).set_index("total time")
+        # the DataFrame shares memory with the output buffer
+        df = self._output.get_dataframe(index="total time")
         if normalize:
+            df = df.copy()
             rename_dict = {}
             for column in df.columns:
                 if "_L3/T" in column:
@@ -381,74 +1366,385 @@ class ControlVolume:
                 df = df.rename(columns=rename_dict)
         return df
 
+    def _set_table_storage(self) -> None:
+        # storage at the start of the step used with the flux table
+        parameters = self._parameters
+        state = self._state
+        self._table_storage0 = (
+            parameters.area
+            * parameters.thickness
+            * parameters.theta_sat
+            * array_return(
+                saturation_fraction(
+                    state.theta0,
+                    parameters.theta_sat,
+                    smoothing_omega=parameters.smoothing_omega,
+                ),
+                state.theta0,
+            )
+        )
+
+    def _create_flux_table(self) -> FluxTable:
+        return FluxTable(
+            self._flux_shapes,
+            0.0,
+            self.theta_sat,
+            tolerance=self.table_tolerance,
+        )
+
+    def _flux_shapes(
+        self,
+        water_content: np.ndarray,
+        cells: np.ndarray = None,
+    ) -> Tuple[list, list]:
+        # flux curves that only depend on the water content, infiltration
+        # and aet are per unit rate and storage excludes the initial volume
+        parameters = self._parameters
+        storage_factor = (
+            -parameters.area * parameters.thickness * parameters.theta_sat
+        )
+        values = [
+            parameters.area
+            * surface_infiltration_fraction(
+                water_content,
+                parameters.theta_sat,
+                parameters.theta_discharge,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            aet_volumetric_rate(
+                water_content,
+                1.0,
+                parameters.theta_pet_max,
+                parameters.theta_wp,
+                parameters.area,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            lateral_volumetric_rate(
+                water_content,
+                parameters.theta_sat,
+                parameters.theta_fc,
+                parameters.theta_wp,
+                parameters.area,
+                parameters.thickness,
+                parameters.max_horizontal_rate,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            recharge_volumetric_rate(
+                water_content,
+                parameters.theta_sat,
+                parameters.theta_fc,
+                parameters.theta_wp,
+                parameters.area,
+                parameters.thickness,
+                parameters.max_vertical_rate,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            surface_volumetric_rate(
+                water_content,
+                parameters.theta_sat,
+                parameters.theta_discharge,
+                parameters.area,
+                parameters.max_vertical_rate,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            storage_factor
+            * saturation_fraction(
+                water_content,
+                parameters.theta_sat,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+        ]
+        derivatives = [
+            parameters.area
+            * surface_infiltration_fraction_derivative(
+                water_content,
+                parameters.theta_sat,
+                parameters.theta_discharge,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            aet_volumetric_rate_derivative(
+                water_content,
+                1.0,
+                parameters.theta_pet_max,
+                parameters.theta_wp,
+                parameters.area,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            lateral_volumetric_rate_derivative(
+                water_content,
+                parameters.theta_sat,
+                parameters.theta_fc,
+                parameters.theta_wp,
+                parameters.area,
+                parameters.thickness,
+                parameters.max_horizontal_rate,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            recharge_volumetric_rate_derivative(
+                water_content,
+                parameters.theta_sat,
+                parameters.theta_fc,
+                parameters.theta_wp,
+                parameters.area,
+                parameters.thickness,
+                parameters.max_vertical_rate,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            surface_volumetric_rate_derivative(
+                water_content,
+                parameters.theta_sat,
+                parameters.theta_discharge,
+                parameters.area,
+                parameters.max_vertical_rate,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+            storage_factor
+            * saturation_fraction_derivative(
+                water_content,
+                parameters.theta_sat,
+                smoothing_omega=parameters.smoothing_omega,
+            ),
+        ]
+        return values, derivatives
+
+    def _table_flux(
+        self,
+        water_content: float,
+    ) -> Tuple[Dict[str, float], float]:
+        parameters = self._parameters
+        state = self._state
+        values, derivatives = parameters.flux_table(
+            water_content, self._table_cells
+        )
+        if (
+            isinstance(state.inflow_rate, np.ndarray)
+            or state.inflow_rate != 0.0
+        ):
+            infiltration_rate = self.infiltration_method.infiltration(
+                state.inflow_rate,
+                water_content,
+                state.theta0,
+            )
+        else:
+            infiltration_rate = 0.0
+        if not isinstance(water_content, np.ndarray):
+            values = values.tolist()
+            derivatives = derivatives.tolist()
+
+        inflow = values[0] * infiltration_rate
+        components = {
+            "inflow_L3/T": inflow,
+            "rejected_inflow_L3/T": (
+                parameters.area * state.inflow_rate - inflow
+            ),
+            "surface_L3/T": values[4],
+            "aet_L3/T": values[1] * state.pet_rate,
+            "lateral_L3/T": values[2],
+            "recharge_L3/T": values[3],
+            "storage_change_L3/T": (values[5] + self._table_storage0)
+            / state.delta_t,
+        }
+        derivative = (
+            derivatives[0] * infiltration_rate
+            + derivatives[1] * state.pet_rate
+            + derivatives[2]
+            + derivatives[3]
+            + derivatives[4]
+            + derivatives[5] / state.delta_t
+        )
+        return components, derivative
+
+    def flux_components(self, water_content: float) -> Dict[str, float]:
+        parameters = self._parameters
+        state = self._state
+        if parameters.flux_table is not None:
+            return self._table_flux(water_content)[0]
+        inflow = infiltration_volumetric_rate(
+            water_content,
+            state.theta0,
+            state.inflow_rate,
+            parameters.theta_sat,
+            parameters.theta_discharge,
+            parameters.area,
+            self.infiltration_method,
+            smoothing_omega=parameters.smoothing_omega,
+        )
+        aet = aet_volumetric_rate(
+            water_content,
+            state.pet_rate,
+            parameters.theta_pet_max,
+            parameters.theta_wp,
+            parameters.area,
+            smoothing_omega=parameters.smoothing_omega,
+        )
+        lateral = lateral_volumetric_rate(
+            water_content,
+            parameters.theta_sat,
+            parameters.theta_fc,
+            parameters.theta_wp,
+            parameters.area,
+            parameters.thickness,
+            parameters.max_horizontal_rate,
+            smoothing_omega=parameters.smoothing_omega,
+        )
+        recharge = recharge_volumetric_rate(
+            water_content,
+            parameters.theta_sat,
+            parameters.theta_fc,
+            parameters.theta_wp,
+            parameters.area,
+            parameters.thickness,
+            parameters.max_vertical_rate,
+            smoothing_omega=parameters.smoothing_omega,
+        )
+        surface = surface_volumetric_rate(
+            water_content,
+            parameters.theta_sat,
+            parameters.theta_discharge,
+            parameters.area,
+            parameters.max_vertical_rate,
+            smoothing_omega=parameters.smoothing_omega,
+        )
+        storage_change = volume_change_rate(
+            water_content,
+            state.theta0,
+            parameters.theta_sat,
+            parameters.area,
+            parameters.thickness,
+            state.delta_t,
+            smoothing_omega=parameters.smoothing_omega,
+        )
+        rejected_inflow = parameters.area * state.inflow_rate - inflow
+        return {
+            "inflow_L3/T": inflow,
+            "rejected_inflow_L3/T": rejected_inflow,
+            "surface_L3/T": surface,
+            "aet_L3/T": aet,
+            "lateral_L3/T": lateral,
+            "recharge_L3/T": recharge,
+            "storage_change_L3/T": storage_change,
+        }
+
     def residual(self, water_content: float) -> float:
+        components = self.flux_components(water_content)
+        self._components = components
+        self._components_theta = water_content
+        return _component_residual(components)
+
+    def jacobian(self, water_content: float) -> float:
+        parameters = self._parameters
+        state = self._state
+        if parameters.flux_table is not None:
+            return self._table_flux(water_content)[1]
         return (
-            infiltration_volumetric_rate(
+            infiltration_volumetric_rate_derivative(
                 water_content,
-                self.theta0,
-                self.inflow_rate,
-                self.theta_sat,
-                self.theta_discharge,
-                self.area,
+                state.theta0,
+                state.inflow_rate,
+                parameters.theta_sat,
+                parameters.theta_discharge,
+                parameters.area,
                 self.infiltration_method,
-                smoothing_omega=self.smoothing_omega,
+                smoothing_omega=parameters.smoothing_omega,
             )
-            + aet_volumetric_rate(
+            + aet_volumetric_rate_derivative(
                 water_content,
-                self.pet_rate,
-                self.theta_pet_max,
-                self.theta_wp,
-                self.area,
-                smoothing_omega=self.smoothing_omega,
+                state.pet_rate,
+                parameters.theta_pet_max,
+                parameters.theta_wp,
+                parameters.area,
+                smoothing_omega=parameters.smoothing_omega,
             )
-            + lateral_volumetric_rate(
+            + lateral_volumetric_rate_derivative(
                 water_content,
-                self.theta_sat,
-                self.theta_fc,
-                self.theta_wp,
-                self.area,
-                self.thickness,
-                self.max_horizontal_rate,
-                smoothing_omega=self.smoothing_omega,
+                parameters.theta_sat,
+                parameters.theta_fc,
+                parameters.theta_wp,
+                parameters.area,
+                parameters.thickness,
+                parameters.max_horizontal_rate,
+                smoothing_omega=parameters.smoothing_omega,
             )
-            + recharge_volumetric_rate(
+            + recharge_volumetric_rate_derivative(
                 water_content,
-                self.theta_sat,
-                self.theta_fc,
-                self.theta_wp,
-                self.area,
-                self.thickness,
-                self.max_vertical_rate,
-                smoothing_omega=self.smoothing_omega,
+                parameters.theta_sat,
+                parameters.theta_fc,
+                parameters.theta_wp,
+                parameters.area,
+                parameters.thickness,
+                parameters.max_vertical_rate,
+                smoothing_omega=parameters.smoothing_omega,
             )
-            + surface_volumetric_rate(
+            + surface_volumetric_rate_derivative(
                 water_content,
-                self.theta_sat,
-                self.theta_discharge,
-                self.area,
-                self.max_vertical_rate,
-                smoothing_omega=self.smoothing_omega,
+                parameters.theta_sat,
+                parameters.theta_discharge,
+                parameters.area,
+                parameters.max_vertical_rate,
+                smoothing_omega=parameters.smoothing_omega,
             )
-            + volume_change_rate(
+            + volume_change_rate_derivative(
                 water_content,
-                self.theta0,
-                self.theta_sat,
-                self.area,
-                self.thickness,
-                self.delta_t,
-                smoothing_omega=self.smoothing_omega,
+                state.theta0,
+                parameters.theta_sat,
+                parameters.area,
+                parameters.thickness,
+                state.delta_t,
+                smoothing_omega=parameters.smoothing_omega,
             )
         )
 
+    def residual_and_derivative(
+        self,
+        water_content: float,
+    ) -> Tuple[float, float]:
+        if self._flux_table is not None:
+            components, derivative = self._table_flux(water_content)
+            self._components = components
+            self._components_theta = water_content
+            return _component_residual(components), derivative
+        return self.residual(water_content), self.jacobian(water_content)
+
     def derivative(
         self,
         water_content: float,
     ) -> float:
+        if self.derivative_method == "analytic":
+            return self.jacobian(water_content)
         return (
-            self.residual(
-                water_content + self.delta_theta,
-            )
-            - self.residual(
-                water_content,
+            _component_residual(
+                self.flux_components(water_content + self.delta_theta)
             )
+            - _component_residual(self.flux_components(water_content))
         ) / self.delta_theta
+
+
+def _component_residual(components: Dict[str, float]) -> float:
+    return (
+        components["inflow_L3/T"]
+        + components["aet_L3/T"]
+        + components["lateral_L3/T"]
+        + components["recharge_L3/T"]
+        + components["surface_L3/T"]
+        + components["storage_change_L3/T"]
+    )
+
+
+def _parameter_property(name: str) -> property:
+    return property(attrgetter(f"_parameters.{name}"))
+
+
+def _state_property(name: str) -> property:
+    def set_value(volume: ControlVolume, value: object) -> None:
+        setattr(volume._state, name, value)
+
+    return property(attrgetter(f"_state.{name}"), set_value)
+
+
+# parameters and state variables are attributes of the control volume,
+# only state variables can be set
+for _name in PARAMETER_VARIABLES + DERIVED_PARAMETERS[:-1]:
+    setattr(ControlVolume, _name, _parameter_property(_name))
+ControlVolume._flux_table = _parameter_property("flux_table")
+for _name in STATE_VARIABLES:
+    setattr(ControlVolume, _name, _state_property(_name))
@@ -0,0 +1,610 @@
+import copy
+import inspect
+import os
+from typing import Dict, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from ..io.prms_csv import PathLike
+from ..utils.flux_table import FluxTable
+from ..utils.infiltration_functions import (
+    GreenAmptArray,
+    green_ampt_soil_codes,
+)
+from ..utils.newton_raphson import (
+    newton_bisection_array,
+    newton_raphson_array,
+)
+from ..utils.output_buffer import OutputBuffer
+from .control_volume import ControlVolume
+
+# per-cell parameters that can be set with the columns of a parameter
+# table (see ControlVolumeArray.from_dataframe)
+TABLE_PARAMETERS = (
+    "area",
+    "thickness",
+    "discharge_thickness",
+    "theta0",
+    "theta_wp",
+    "theta_fc",
+    "theta_sat",
+    "max_vertical_rate",
+    "horizontal_vertical_ratio",
+    "pet_fraction",
+    "soil",
+)
+
+
+class ControlVolumeArray(ControlVolume):
+    """
+    A set of independent control volumes that are advanced together.
+
+    Per-cell parameters (area, thickness, water contents, rates, ...)
+    are stored as one-dimensional numpy arrays and every cell is solved
+    in a single vectorized Newton-Raphson iteration. Scalar parameter
+    values are broadcast to all cells.
+
+    Parameters
+    ----------
+    ncells : int (default: None)
+        Number of cells. If not specified, the number of cells is
+        determined by broadcasting the per-cell parameters.
+    soil : str or list of str (default: None)
+        Soil type or a soil type for each cell for Green-Ampt
+        infiltration.
+
+    All other parameters are identical to ControlVolume. Use
+    from_dataframe or from_table to create a control volume array from
+    a parameter table with a row for each cell.
+    """
+
+    _green_ampt_class = GreenAmptArray
+    __slots__ = ("_subset_index", "_subset_volume")
+    _cached_variables = ControlVolume._cached_variables + (
+        "_subset_index",
+        "_subset_volume",
+    )
+
+    def __init__(
+        self,
+        area: Union[float, np.ndarray] = 1.0,
+        thickness: Union[float, np.ndarray] = 1.0,
+        discharge_thickness: Union[float, np.ndarray] = 0.1,
+        theta0: Union[float, np.ndarray] = 0.01,
+        theta_wp: Union[float, np.ndarray] = 0.01,
+        theta_fc: Union[float, np.ndarray] = 0.1,
+        theta_sat: Union[float, np.ndarray] = 0.2,
+        max_vertical_rate: Union[float, np.ndarray] = 1e-3,
+        horizontal_vertical_ratio: Union[float, np.ndarray] = 10.0,
+        pet_fraction: Union[float, np.ndarray] = 0.15,
+        smoothing_omega: float = 1.0e-6,
+        delta_theta: float = 1.0e-4,
+        max_iterations: int = 100,
+        length_units: str = "m",
+        time_units: str = "d",
+        infiltration_method: str = "constant",
+        soil: Union[str, Sequence[str]] = None,
+        infiltration_solver: str = "newton",
+        ncells: int = None,
+        derivative_method: str = "analytic",
+        nsteps: int = None,
+        output_variables: Sequence[str] = None,
+        output_interval: int = 1,
+        output_aggregation: str = None,
+        output_path: PathLike = None,
+        output_format: str = None,
+        flux_method: str = "exact",
+        table_tolerance: float = 1e-9,
+        instrument: bool = False,
+        adaptive: bool = False,
+        max_theta_change: float = 0.05,
+        theta_tolerance: float = 1e-3,
+        min_delta_t: float = 1e-3,
+        solver: str = "newton",
+    ) -> "ControlVolumeArray":
+        values = [
+            np.asarray(value, dtype=float)
+            for value in (
+                area,
+                thickness,
+                discharge_thickness,
+                theta0,
+                theta_wp,
+                theta_fc,
+                theta_sat,
+                max_vertical_rate,
+                horizontal_vertical_ratio,
+                pet_fraction,
+            )
+        ]
+        if ncells is None:
+            shape = np.broadcast_shapes(*[value.shape for value in values])
+            if len(shape) > 1:
+                raise ValueError(
+                    "control volume array parameters must be scalars "
+                    + f"or one-dimensional arrays (shape={shape})"
+                )
+            ncells = shape[0] if len(shape) == 1 else 1
+        values = [
+            np.array(np.broadcast_to(value, (ncells,))) for value in values
+        ]
+
+        super().__init__(
+            *values,
+            smoothing_omega=smoothing_omega,
+            delta_theta=delta_theta,
+            max_iterations=max_iterations,
+            length_units=length_units,
+            time_units=time_units,
+            infiltration_method=infiltration_method,
+            soil=soil,
+            infiltration_solver=infiltration_solver,
+            derivative_method=derivative_method,
+            nsteps=nsteps,
+            output_variables=output_variables,
+            output_interval=output_interval,
+            output_aggregation=output_aggregation,
+            output_path=output_path,
+            output_format=output_format,
+            flux_method=flux_method,
+            table_tolerance=table_tolerance,
+            instrument=instrument,
+            adaptive=adaptive,
+            max_theta_change=max_theta_change,
+            theta_tolerance=theta_tolerance,
+            min_delta_t=min_delta_t,
+            solver=solver,
+        )
+        self.theta = self.theta.copy()
+
+    @classmethod
+    def from_dataframe(
+        cls,
+        df: pd.DataFrame,
+        **kwargs,
+    ) -> "ControlVolumeArray":
+        """
+        Create a control volume array with a cell for each row of a
+        parameter table.
+
+        Columns with the names of per-cell parameters (TABLE_PARAMETERS)
+        set the parameter for each cell. Per-cell parameters without a
+        column are set with keyword arguments or their default values
+        and other columns are ignored. Every row is validated before the
+        control volume array is created and a ValueError that reports
+        every invalid row is raised if any row is invalid.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            Parameter table with a row for each cell.
+        kwargs : dict
+            Other ControlVolumeArray parameters.
+
+        Returns
+        -------
+        control_volume: ControlVolumeArray
+        """
+        duplicated = [
+            name
+            for name in TABLE_PARAMETERS
+            if name in df.columns and name in kwargs
+        ]
+        if duplicated:
+            raise ValueError(
+                f"parameter(s) '{', '.join(duplicated)}' are specified as "
+                + "table columns and keyword arguments"
+            )
+        parameters = {}
+        for name in TABLE_PARAMETERS:
+            if name not in df.columns:
+                continue
+            if name == "soil":
+                parameters[name] = df[name].to_numpy(dtype=object)
+            else:
+                parameters[name] = pd.to_numeric(
+                    df[name], errors="coerce"
+                ).to_numpy(dtype=float)
+
+        defaults = inspect.signature(cls.__init__).parameters
+        values = {
+            name: parameters.get(
+                name, kwargs.get(name, defaults[name].default)
+            )
+            for name in TABLE_PARAMETERS
+        }
+        infiltration_method = kwargs.get(
+            "infiltration_method", defaults["infiltration_method"].default
+        )
+        errors = _parameter_table_errors(
+            values, len(df.index), infiltration_method == "green-ampt"
+        )
+        if errors:
+            raise ValueError(
+                f"{len(errors)} invalid row(s) in the parameter table\n"
+                + "\n".join(
+                    f"  row {df.index[row]}: {message}"
+                    for row, message in errors.items()
+                )
+            )
+        return cls(**parameters, ncells=len(df.index), **kwargs)
+
+    @classmethod
+    def from_table(
+        cls,
+        table: Union[PathLike, Mapping[str, Sequence]],
+        index_col: Union[int, str] = None,
+        **kwargs,
+    ) -> "ControlVolumeArray":
+        """
+        Create a control volume array with a cell for each row of a
+        parameter table (see from_dataframe).
+
+        Parameters
+        ----------
+        table : str, PathLike, or dict
+            Path to a CSV parameter table or a dictionary of table
+            columns.
+        index_col : int or str (default: None)
+            Column with the row labels used to report invalid rows in a
+            CSV parameter table.
+        kwargs : dict
+            Other ControlVolumeArray parameters.
+
+        Returns
+        -------
+        control_volume: ControlVolumeArray
+        """
+        if isinstance(table, (str, os.PathLike)):
+            df = pd.read_csv(table, index_col=index_col, skipinitialspace=True)
+        else:
+            df = pd.DataFrame(table)
+        return cls.from_dataframe(df, **kwargs)
+
+    @property
+    def ncells(self) -> int:
+        return self.theta.shape[0]
+
+    def advance(
+        self,
+        inflow_rate: Union[float, np.ndarray] = 0.0,
+        pet_rate: Union[float, np.ndarray] = 0.0,
+        delta_t: float = 1.0,
+    ) -> None:
+        super().advance(
+            inflow_rate=np.broadcast_to(
+                np.asarray(inflow_rate, dtype=float), (self.ncells,)
+            ),
+            pet_rate=np.broadcast_to(
+                np.asarray(pet_rate, dtype=float), (self.ncells,)
+            ),
+            delta_t=delta_t,
+        )
+
+    def _forcing_shape(self, nsteps: int) -> Tuple[int, ...]:
+        return (nsteps, self.ncells)
+
+    def _solve_step(
+        self,
+        tol: float = 1e-6,
+    ) -> None:
+        if self.derivative_method == "analytic":
+            f, df = self.residual_and_derivative, None
+        else:
+            f, df = self.residual, self.derivative
+        if self.instrumentation is not None:
+            f, df = self.instrumentation.wrap(f, df)
+        self._components = None
+        # the infiltration rate only depends on the step, so it is
+        # calculated once for every cell and the cached rates are sliced
+        # for the active cells in each iteration (see _subset)
+        self.infiltration_method.infiltration(
+            self.inflow_rate, self.theta, self.theta0
+        )
+        if self.solver == "bracketed":
+            iterations, theta, residual, converged = newton_bisection_array(
+                f,
+                df,
+                self._initial_guess(),
+                0.0,
+                self.theta_sat,
+                tol=tol,
+                max_iter=self.max_iterations,
+                increasing=False,
+                subset=True,
+            )
+        else:
+            iterations, theta, residual, converged = newton_raphson_array(
+                f,
+                df,
+                self.theta,
+                tol=tol,
+                max_iter=self.max_iterations,
+                subset=True,
+            )
+        self._previous_step = (self.theta0, self.delta_t)
+        self.iterations = iterations
+        self.theta = theta
+        self.error = residual
+        self.converged = converged
+        self.volume = self._calculate_volume(theta)
+        self._components_theta = theta
+        self._subset_index = None
+        self._subset_volume = None
+        return
+
+    def _subset(self, index: np.ndarray) -> "ControlVolumeArray":
+        if index is not self._subset_index:
+            ncells = self.ncells
+            volume = copy.copy(self)
+            _take(volume, index, ncells)
+            infiltration_method = copy.copy(self.infiltration_method)
+            _take(infiltration_method, index, ncells)
+            # _take slices the cached infiltration rates, the cache key
+            # is the sliced rates and water contents of the subset
+            if self.infiltration_method._is_cached(
+                self.inflow_rate, self.theta0
+            ):
+                infiltration_method._cache_key = (
+                    volume.inflow_rate,
+                    volume.theta0,
+                )
+            volume.infiltration_method = infiltration_method
+            volume._subset_index = None
+            volume._subset_volume = None
+            if self._table_cells is None:
+                volume._table_cells = index
+            else:
+                volume._table_cells = self._table_cells[index]
+            self._subset_index = index
+            self._subset_volume = volume
+        return self._subset_volume
+
+    def _scatter_components(self, index: np.ndarray) -> None:
+        components = self._subset_volume._components
+        if self._components is None:
+            self._components = {
+                key: np.zeros(self.ncells, dtype=float) for key in components
+            }
+        for key, value in components.items():
+            self._components[key][index] = value
+        # infiltration state of the active cells
+        infiltration_method = self._subset_volume.infiltration_method
+        for key in getattr(infiltration_method, "state_variables", ()):
+            getattr(self.infiltration_method, key)[index] = getattr(
+                infiltration_method, key
+            )
+
+    def residual(
+        self,
+        water_content: np.ndarray,
+        index: np.ndarray = None,
+    ) -> np.ndarray:
+        if index is None:
+            return super().residual(water_content)
+        residual = self._subset(index).residual(water_content)
+        self._scatter_components(index)
+        return residual
+
+    def jacobian(
+        self,
+        water_content: np.ndarray,
+        index: np.ndarray = None,
+    ) -> np.ndarray:
+        if index is None:
+            return super().jacobian(water_content)
+        return self._subset(index).jacobian(water_content)
+
+    def residual_and_derivative(
+        self,
+        water_content: np.ndarray,
+        index: np.ndarray = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if index is None:
+            return super().residual_and_derivative(water_content)
+        residual, derivative = self._subset(index).residual_and_derivative(
+            water_content
+        )
+        self._scatter_components(index)
+        return residual, derivative
+
+    def derivative(
+        self,
+        water_content: np.ndarray,
+        index: np.ndarray = None,
+    ) -> np.ndarray:
+        if index is None:
+            return super().derivative(water_content)
+        return self._subset(index).derivative(water_content)
+
+    def _create_flux_table(self) -> FluxTable:
+        return FluxTable(
+            self._flux_shapes,
+            0.0,
+            self.theta_sat,
+            ncells=self.ncells,
+            tolerance=self.table_tolerance,
+        )
+
+    def _flux_shapes(
+        self,
+        water_content: np.ndarray,
+        cells: np.ndarray = None,
+    ) -> Tuple[list, list]:
+        if cells is None:
+            return super()._flux_shapes(water_content)
+        volume = copy.copy(self)
+        _take(volume, cells, self.ncells)
+        return ControlVolume._flux_shapes(volume, water_content)
+
+    def _create_output(self, nsteps: int = None) -> OutputBuffer:
+        return super()._create_output(nsteps=nsteps, ncells=self.ncells)
+
+    def get_array(self, variable: str, normalize=False) -> np.ndarray:
+        values = self._output.column(variable)
+        if variable == "total time":
+            return values[:, 0]
+        if normalize and "_L3/T" in variable:
+            return values / self.area
+        return values
+
+    def get_dataframe(
+        self,
+        normalize=False,
+        cell: int = None,
+    ) -> pd.DataFrame:
+        index = pd.Index(self.get_array("total time"), name="total time")
+        columns = [
+            name for name in self.output_variables if name != "total time"
+        ]
+        if cell is None:
+            data = {
+                (column, idx): values
+                for column in columns
+                for idx, values in enumerate(
+                    self.get_array(column, normalize=normalize).T
+                )
+            }
+        else:
+            data = {
+                column: self.get_array(column, normalize=normalize)[:, cell]
+                for column in columns
+            }
+        df = pd.DataFrame(data, index=index)
+        if normalize:
+            df = df.rename(
+                columns=lambda column: column.replace("_L3/T", "_L/T"),
+                level=0 if cell is None else None,
+            )
+        return df
+
+
+def _take(obj: object, index: np.ndarray, ncells: int) -> None:
+    # slice the per-cell arrays of a copy of a control volume (its
+    # parameters, state, and table storage) or of an infiltration method
+    if not isinstance(obj, ControlVolume):
+        for key, value in _take_values(obj.__dict__, index, ncells).items():
+            setattr(obj, key, value)
+        return
+    obj._parameters = obj._parameters._replace(
+        **_take_values(obj._parameters._asdict(), index, ncells)
+    )
+    state = obj._state
+    values = {key: getattr(state, key) for key in obj.state_variables}
+    for key, value in _take_values(values, index, ncells).items():
+        setattr(state, key, value)
+    if obj._table_storage0 is not None:
+        obj._table_storage0 = obj._table_storage0[index]
+
+
+def _take_values(
+    values: Dict[str, object],
+    index: np.ndarray,
+    ncells: int,
+) -> Dict[str, np.ndarray]:
+    return {
+        key: value[index]
+        for key, value in values.items()
+        if isinstance(value, np.ndarray) and value.shape == (ncells,)
+    }
+
+
+def _parameter_table_errors(
+    values: Dict[str, np.ndarray],
+    nrows: int,
+    green_ampt: bool,
+) -> Dict[int, str]:
+    # vectorized version of the per-cell checks in ControlVolume._validate
+    # that returns a description of the failed checks for each invalid row
+    values = {
+        name: (
+            np.broadcast_to(np.asarray(value, dtype=object), (nrows,))
+            if name == "soil"
+            else np.broadcast_to(np.asarray(value, dtype=float), (nrows,))
+        )
+        for name, value in values.items()
+    }
+    checks = []
+    for name in TABLE_PARAMETERS:
+        if name != "soil":
+            checks.append(
+                ((name,), "is not a number", ~np.isfinite(values[name]))
+            )
+    with np.errstate(invalid="ignore"):
+        checks += [
+            (("area",), "must be greater than zero", values["area"] < 0.0),
+            (
+                ("thickness",),
+                "must be greater than zero",
+                values["thickness"] < 0.0,
+            ),
+            (
+                ("discharge_thickness",),
+                "must be greater than zero",
+                values["discharge_thickness"] < 0.0,
+            ),
+            (
+                ("theta_wp",),
+                "must be greater than zero",
+                values["theta_wp"] < 0.0,
+            ),
+            (
+                ("theta_wp", "theta_fc"),
+                "wilting point must be less than field capacity",
+                values["theta_wp"] > values["theta_fc"],
+            ),
+            (
+                ("theta_fc", "theta_sat"),
+                "field capacity must be less than theta_sat",
+                values["theta_fc"] > values["theta_sat"],
+            ),
+            (
+                ("theta0",),
+                "must be greater than zero",
+                values["theta0"] < 0.0,
+            ),
+            (
+                ("theta0", "theta_sat"),
+                "initial moisture content must be less than theta_sat",
+                values["theta0"] > values["theta_sat"],
+            ),
+            (
+                ("max_vertical_rate",),
+                "must be greater than zero",
+                values["max_vertical_rate"] < 0.0,
+            ),
+            (
+                ("horizontal_vertical_ratio",),
+                "must be greater than zero",
+                values["horizontal_vertical_ratio"] < 0.0,
+            ),
+            (
+                ("pet_fraction",),
+                "must be between zero and one",
+                (values["pet_fraction"] < 0.0)
+                | (values["pet_fraction"] > 1.0),
+            ),
+        ]
+    if green_ampt and values["soil"][0] is not None:
+        codes = green_ampt_soil_codes(values["soil"])
+        checks.append((("soil",), "is not a valid soil type", codes < 0))
+
+    invalid = np.logical_or.reduce([failed for _, _, failed in checks])
+    errors = {}
+    for row in np.flatnonzero(invalid):
+        messages = []
+        for names, description, failed in checks:
+            if not failed[row]:
+                continue
+            if len(names) == 1:
+                messages.append(
+                    f"{names[0]} ({values[names[0]][row]}) {description}"
+                )
+            else:
+                row_values = ", ".join(
+                    f"{name}={values[name][row]}" for name in names
+                )
+                messages.append(f"{description} ({row_values})")
+        errors[int(row)] = "; ".join(messages)
+    return errors
@@ -0,0 +1,274 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from typing import Dict, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..utils.output_buffer import OutputBuffer
+from .control_volume import OUTPUT_VARIABLES
+from .control_volume_array import ControlVolumeArray
+
+# per-cell ControlVolumeArray parameters that are partitioned by cell
+CELL_PARAMETERS = (
+    "area",
+    "thickness",
+    "discharge_thickness",
+    "theta0",
+    "theta_wp",
+    "theta_fc",
+    "theta_sat",
+    "max_vertical_rate",
+    "horizontal_vertical_ratio",
+    "pet_fraction",
+    "soil",
+)
+
+# (name, shape) of a shared memory block
+SharedArray = Tuple[str, Tuple[int, ...]]
+
+
+def _create_shared(
+    shape: Tuple[int, ...],
+    values: np.ndarray = None,
+) -> shared_memory.SharedMemory:
+    nbytes = max(int(np.prod(shape)) * np.dtype(float).itemsize, 1)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    if values is not None:
+        np.ndarray(shape, dtype=float, buffer=shm.buf)[...] = values
+    return shm
+
+
+def _attach_shared(
+    shared: SharedArray,
+) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    name, shape = shared
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=float, buffer=shm.buf)
+
+
+def _partition_value(
+    value: Union[float, str, np.ndarray],
+    cells: slice,
+) -> Union[float, str, np.ndarray]:
+    if isinstance(value, np.ndarray) and value.ndim > 0:
+        return value[cells]
+    return value
+
+
+def _run_partition(
+    cells: slice,
+    parameters: Dict[str, Union[float, np.ndarray]],
+    options: Dict[str, object],
+    inflow: SharedArray,
+    pet: SharedArray,
+    results: SharedArray,
+    names: Sequence[str],
+    delta_t: float,
+) -> int:
+    shms = []
+    try:
+        shm, inflow_rate = _attach_shared(inflow)
+        shms.append(shm)
+        shm, pet_rate = _attach_shared(pet)
+        shms.append(shm)
+        shm, result = _attach_shared(results)
+        shms.append(shm)
+
+        volume = ControlVolumeArray(
+            **parameters,
+            **options,
+            output_variables=names,
+        )
+        # each step is stored directly in the cells of the shared result
+        volume._output = OutputBuffer(
+            names, ncells=volume.ncells, data=result[:, :, cells]
+        )
+        volume.run(inflow_rate[:, cells], pet_rate[:, cells], delta_t=delta_t)
+        # release buffer views before closing the shared memory
+        del inflow_rate, pet_rate, result, volume
+    finally:
+        for shm in shms:
+            shm.close()
+    return cells.stop - cells.start
+
+
+def run_parallel(
+    parameters: Dict[str, Union[float, Sequence[float]]],
+    inflow_rate: np.ndarray,
+    pet_rate: np.ndarray,
+    delta_t: float = 1.0,
+    nprocesses: int = None,
+    npartitions: int = None,
+    output_variables: Sequence[str] = None,
+    **kwargs,
+) -> Dict[str, np.ndarray]:
+    """
+    Run independent control volumes in parallel using a process pool.
+
+    Cells are partitioned into contiguous blocks that are each run as a
+    ControlVolumeArray in a worker process. Forcing and results are
+    stored in shared memory so they are not pickled and sent to the
+    workers. Workers store each output step directly in the shared
+    results, which are copied once into the returned arrays.
+
+    Parameters
+    ----------
+    parameters : dict
+        Per-cell ControlVolumeArray parameters (area, thickness,
+        discharge_thickness, theta0, theta_wp, theta_fc, theta_sat,
+        max_vertical_rate, horizontal_vertical_ratio, pet_fraction,
+        soil). Values are scalars (or a soil type) or one-dimensional
+        arrays with a value for each cell. A pandas.DataFrame with a
+        column for each parameter can also be used.
+    inflow_rate : numpy.ndarray
+        Inflow rates with a shape of (number of steps, number of cells).
+    pet_rate : numpy.ndarray
+        Potential evapotranspiration rates with a shape of (number of
+        steps, number of cells).
+    delta_t : float (default 1.0)
+        Length of each time step.
+    nprocesses : int (default: None)
+        Number of worker processes. If not specified, the number of
+        CPUs is used. If nprocesses is one, the cells are run in the
+        current process.
+    npartitions : int (default: None)
+        Number of cell partitions. If not specified, four partitions
+        are used for each process to balance the load.
+    output_variables : list of str (default: None)
+        Output variables to return. If not specified, all output
+        variables are returned.
+    kwargs : dict
+        Additional ControlVolumeArray keyword arguments that are
+        identical for every cell (for example smoothing_omega,
+        length_units, output_interval, or output_aggregation). Per-cell
+        parameters can also be specified as keyword arguments.
+
+    Returns
+    -------
+    results: dict
+        Output for each variable with a shape of (number of output
+        steps, number of cells). 'total time' has a shape of (number
+        of output steps,).
+    """
+    inflow_rate = np.asarray(inflow_rate, dtype=float)
+    pet_rate = np.asarray(pet_rate, dtype=float)
+    if inflow_rate.ndim != 2 or inflow_rate.shape != pet_rate.shape:
+        raise ValueError(
+            f"inflow_rate {inflow_rate.shape} and pet_rate "
+            + f"{pet_rate.shape} must be two-dimensional arrays with the "
+            + "same shape"
+        )
+    nsteps, ncells = inflow_rate.shape
+
+    invalid = [key for key in parameters if key not in CELL_PARAMETERS]
+    if invalid:
+        raise ValueError(
+            f"Invalid parameters ({', '.join(invalid)}). Valid per-cell "
+            + f"parameters are '{', '.join(CELL_PARAMETERS)}'."
+        )
+    for key in ("nsteps", "ncells", "output_path"):
+        if key in kwargs:
+            raise ValueError(f"{key} cannot be specified for run_parallel")
+    # per-cell parameters in kwargs are partitioned with parameters
+    duplicated = [key for key in parameters if key in kwargs]
+    if duplicated:
+        raise ValueError(
+            f"parameter(s) '{', '.join(duplicated)}' are specified in "
+            + "parameters and as keyword arguments"
+        )
+    kwargs = dict(kwargs)
+    values = {key: parameters[key] for key in parameters}
+    for key in CELL_PARAMETERS:
+        if key in kwargs:
+            values[key] = kwargs.pop(key)
+    cell_parameters = {}
+    for key, value in values.items():
+        if key == "soil":
+            # soil types are strings and a single soil type (or None) is
+            # used for every cell
+            if value is None or isinstance(value, str):
+                cell_parameters[key] = value
+                continue
+            value = np.asarray(value, dtype=object)
+        else:
+            value = np.asarray(value, dtype=float)
+        if value.ndim > 0 and value.shape != (ncells,):
+            raise ValueError(
+                f"{key} shape {value.shape} does not match the number "
+                + f"of cells ({ncells})"
+            )
+        cell_parameters[key] = value
+
+    if nprocesses is None:
+        nprocesses = os.cpu_count() or 1
+    if nprocesses < 1:
+        raise ValueError(
+            f"nprocesses ({nprocesses}) must be greater than zero"
+        )
+    if npartitions is None:
+        npartitions = 4 * nprocesses
+    npartitions = max(1, min(npartitions, ncells))
+
+    if output_variables is None:
+        output_variables = OUTPUT_VARIABLES
+    names = ["total time"] + [
+        name for name in output_variables if name != "total time"
+    ]
+    output_interval = kwargs.get("output_interval", 1)
+    noutput = nsteps // output_interval if output_interval > 0 else 0
+
+    bounds = np.linspace(0, ncells, npartitions + 1).astype(int)
+    partitions = [
+        slice(int(start), int(stop))
+        for start, stop in zip(bounds[:-1], bounds[1:])
+        if stop > start
+    ]
+
+    shms = []
+    try:
+        shms.append(_create_shared(inflow_rate.shape, inflow_rate))
+        inflow_shared = (shms[-1].name, inflow_rate.shape)
+        shms.append(_create_shared(pet_rate.shape, pet_rate))
+        pet_shared = (shms[-1].name, pet_rate.shape)
+        shape = (len(names), noutput, ncells)
+        shms.append(_create_shared(shape))
+        result_shared = (shms[-1].name, shape)
+
+        tasks = [
+            (
+                cells,
+                {
+                    key: _partition_value(value, cells)
+                    for key, value in cell_parameters.items()
+                },
+                kwargs,
+                inflow_shared,
+                pet_shared,
+                result_shared,
+                names,
+                delta_t,
+            )
+            for cells in partitions
+        ]
+        if nprocesses == 1:
+            for task in tasks:
+                _run_partition(*task)
+        else:
+            with multiprocessing.get_context().Pool(nprocesses) as pool:
+                pool.starmap(_run_partition, tasks, chunksize=1)
+
+        result = np.ndarray(shape, dtype=float, buffer=shms[-1].buf)
+        results = {}
+        for idx, name in enumerate(names):
+            if name == "total time":
+                results[name] = result[idx, :, 0].copy()
+            else:
+                results[name] = result[idx].copy()
+        del result
+    finally:
+        for shm in shms:
+            shm.close()
+            shm.unlink()
+
+    return results
@@ -0,0 +1,179 @@
+import itertools
+import os
+from typing import Sequence, Union
+
+import pandas as pd
+
+from ..io.forcing_store import forcing_variable_name, open_forcing_store
+from ..io.prms_csv import INCHES_TO_LENGTH_UNITS, PathLike, iterate_prms_csv
+from .control_volume import ControlVolume
+from .control_volume_array import ControlVolumeArray
+
+# conversion factors from days to model time units
+DAYS_TO_TIME_UNITS = {
+    "d": 1.0,
+    "hr": 24.0,
+}
+
+
+def run_prms_forcing(
+    control_volume: Union[
+        ControlVolume, ControlVolumeArray, Sequence[ControlVolume]
+    ],
+    inflow_files: Union[PathLike, Sequence[PathLike]],
+    pet_files: Union[PathLike, Sequence[PathLike]],
+    hrus: Sequence[Union[int, str]] = None,
+    inflow_factor: float = 1.0,
+    pet_factor: float = 1.0,
+    input_length_units: str = "in",
+    input_time_units: str = "d",
+    chunksize: int = 1000,
+    cache_path: PathLike = None,
+) -> pd.DatetimeIndex:
+    """
+    Run control volumes using forcing streamed from PRMS CSV output files.
+
+    The forcing files are read in chunks so the memory used for forcing
+    is independent of the length of the simulation. Each row in the
+    forcing files is a single time step.
+
+    Parameters
+    ----------
+    control_volume : ControlVolume, ControlVolumeArray, or list
+        A single ControlVolume, a ControlVolumeArray with one cell per
+        HRU, or a list of ControlVolume objects with one per HRU.
+    inflow_files : str, PathLike, or list of str or PathLike
+        PRMS CSV file(s) with inflow rates (for example hru_rain.csv).
+        Values in multiple files are summed.
+    pet_files : str, PathLike, or list of str or PathLike
+        PRMS CSV file(s) with potential evapotranspiration rates (for
+        example potet.csv). Values in multiple files are summed.
+    hrus : list of int or str (default: None)
+        HRUs to run, in the same order as the control volumes. If not
+        specified, the HRUs in the first inflow file are used.
+    inflow_factor: float (default 1.0)
+        Factor applied to the inflow rates after unit conversion.
+    pet_factor: float (default 1.0)
+        Factor applied to the potential evapotranspiration rates after
+        unit conversion.
+    input_length_units: str (default "in")
+        Length units of the forcing files.
+    input_time_units: str (default "d")
+        Time units of the forcing files and the length of each row.
+    chunksize: int (default 1000)
+        Number of forcing rows read at a time.
+    cache_path: str or PathLike (default: None)
+        Forcing store directory. If specified, the forcing files are
+        converted to a memory-mapped forcing store the first time they
+        are used (or after they are modified) and later runs read the
+        forcing store instead of parsing the forcing files (see
+        open_forcing_store).
+
+    Returns
+    -------
+    dates: pandas.DatetimeIndex
+        Dates of the simulated time steps.
+    """
+    if isinstance(control_volume, ControlVolume):
+        volumes = [control_volume]
+        ncells = (
+            control_volume.ncells
+            if isinstance(control_volume, ControlVolumeArray)
+            else 1
+        )
+    else:
+        volumes = list(control_volume)
+        ncells = len(volumes)
+
+    if input_length_units not in INCHES_TO_LENGTH_UNITS:
+        raise ValueError(
+            f"Invalid input_length_units ({input_length_units}). Valid "
+            + f"length units are '{', '.join(INCHES_TO_LENGTH_UNITS)}'."
+        )
+    if input_time_units not in DAYS_TO_TIME_UNITS:
+        raise ValueError(
+            f"Invalid input_time_units ({input_time_units}). Valid "
+            + f"time units are '{', '.join(DAYS_TO_TIME_UNITS)}'."
+        )
+    length_units = {volume.length_units for volume in volumes}
+    time_units = {volume.time_units for volume in volumes}
+    if len(length_units) > 1 or len(time_units) > 1:
+        raise ValueError(
+            "all control volumes must use the same length and time units"
+        )
+    length_units = length_units.pop()
+    time_units = time_units.pop()
+
+    delta_t = (
+        DAYS_TO_TIME_UNITS[time_units] / DAYS_TO_TIME_UNITS[input_time_units]
+    )
+    rate_factor = (
+        INCHES_TO_LENGTH_UNITS[length_units]
+        / INCHES_TO_LENGTH_UNITS[input_length_units]
+        / delta_t
+    )
+
+    if cache_path is None:
+        inflow_iterator = iterate_prms_csv(
+            inflow_files,
+            hrus=hrus,
+            factor=rate_factor * inflow_factor,
+            chunksize=chunksize,
+        )
+        pet_iterator = iterate_prms_csv(
+            pet_files,
+            hrus=hrus,
+            factor=rate_factor * pet_factor,
+            chunksize=chunksize,
+        )
+    else:
+        if isinstance(inflow_files, (str, os.PathLike)):
+            inflow_files = [inflow_files]
+        if isinstance(pet_files, (str, os.PathLike)):
+            pet_files = [pet_files]
+        store = open_forcing_store(
+            list(dict.fromkeys([*inflow_files, *pet_files])), cache_path
+        )
+        inflow_iterator = store.iterate(
+            [forcing_variable_name(path) for path in inflow_files],
+            hrus=hrus,
+            factor=rate_factor * inflow_factor,
+            chunksize=chunksize,
+        )
+        pet_iterator = store.iterate(
+            [forcing_variable_name(path) for path in pet_files],
+            hrus=hrus,
+            factor=rate_factor * pet_factor,
+            chunksize=chunksize,
+        )
+
+    dates = []
+    # zip_longest so that forcing with fewer rows is not truncated
+    for inflow_chunk, pet_chunk in itertools.zip_longest(
+        inflow_iterator, pet_iterator
+    ):
+        if inflow_chunk is None or pet_chunk is None:
+            raise ValueError(
+                "inflow and pet files do not have the same number of dates"
+            )
+        inflow_dates, inflow = inflow_chunk
+        pet_dates, pet = pet_chunk
+        if not inflow_dates.equals(pet_dates):
+            raise ValueError("inflow and pet file dates do not match")
+        if inflow.shape[1] != ncells:
+            raise ValueError(
+                f"number of HRUs ({inflow.shape[1]}) does not match the "
+                + f"number of control volumes ({ncells})"
+            )
+        # control volumes are independent, so each is run for the
+        # whole chunk (using the Numba kernel if it is available)
+        if len(volumes) == 1 and ncells > 1:
+            volumes[0].run(inflow, pet, delta_t=delta_t)
+        else:
+            for idx, volume in enumerate(volumes):
+                volume.run(inflow[:, idx], pet[:, idx], delta_t=delta_t)
+        dates.append(inflow_dates)
+
+    if len(dates) == 0:
+        return pd.DatetimeIndex([])
+    return dates[0].append(dates[1:])
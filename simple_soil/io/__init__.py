@@ -0,0 +1,4 @@
+from .forcing_store import *
+from .output_writer import *
+from .prms_csv import *
+from .state_file import *
@@ -0,0 +1,388 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .prms_csv import PathLike, _hru_label
+
+# name of the metadata file in a forcing store directory
+FORCING_STORE_METADATA = "forcing.json"
+FORCING_STORE_VERSION = 1
+
+# name of the raw file with the dates (datetime64[ns] as int64)
+FORCING_STORE_DATES = "dates.bin"
+
+
+def _source_paths(
+    paths: Union[PathLike, Sequence[PathLike]],
+) -> List[Path]:
+    # a directory is expanded to the PRMS CSV files in the directory
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    sources = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            sources += sorted(path.glob("*.csv"))
+        else:
+            sources.append(path)
+    if len(sources) < 1:
+        raise ValueError("at least one PRMS CSV file must be specified")
+    return [source.resolve() for source in sources]
+
+
+def forcing_variable_name(path: PathLike) -> str:
+    """
+    Get the forcing store variable name for a PRMS CSV file (the file
+    name without the extension, for example 'hru_rain').
+    """
+    return Path(path).stem
+
+
+def _source_signature(path: Path) -> Dict[str, object]:
+    stat = os.stat(path)
+    return {
+        "source": str(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+class ForcingStore:
+    """
+    Memory-mapped binary copy of a set of PRMS CSV forcing files.
+
+    A forcing store is a directory with a raw float64 file with a shape
+    of (number of dates, number of HRUs) for each PRMS CSV file, a raw
+    file with the dates, and a JSON metadata file with the HRUs and the
+    modification time and size of each source file. Values are stored
+    in the units of the source files. Stores are created with
+    build_forcing_store or open_forcing_store.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Forcing store directory.
+    """
+
+    def __init__(self, path: PathLike) -> None:
+        self.path = Path(path)
+        with open(self.path / FORCING_STORE_METADATA) as f:
+            metadata = json.load(f)
+        if metadata.get("version") != FORCING_STORE_VERSION:
+            raise ValueError(
+                f"forcing store version ({metadata.get('version')}) in "
+                + f"{self.path} is not supported (expected "
+                + f"{FORCING_STORE_VERSION})"
+            )
+        self.hrus = metadata["hrus"]
+        self.nsteps = metadata["nsteps"]
+        self.sources = metadata["variables"]
+        self.names = list(self.sources)
+        self._hru_index = {hru: idx for idx, hru in enumerate(self.hrus)}
+
+        self._dates = self._memmap(FORCING_STORE_DATES, "<i8", (self.nsteps,))
+        self._variables = {
+            name: self._memmap(
+                source["file"],
+                metadata["dtype"],
+                (self.nsteps, len(self.hrus)),
+            )
+            for name, source in self.sources.items()
+        }
+
+    def _memmap(
+        self,
+        file_name: str,
+        dtype: str,
+        shape: Tuple[int, ...],
+    ) -> np.ndarray:
+        if self.nsteps == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(
+            self.path / file_name, dtype=dtype, mode="r", shape=shape
+        )
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._variables
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """
+        Get a read-only memory-mapped view of the values for a variable
+        with a shape of (number of dates, number of HRUs).
+        """
+        if name not in self._variables:
+            raise ValueError(
+                f"Invalid forcing variable ({name}). Valid forcing "
+                + f"variables are '{', '.join(self.names)}'."
+            )
+        return self._variables[name]
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(
+            np.asarray(self._dates).view("datetime64[ns]"), name="Date"
+        )
+
+    def is_current(self) -> bool:
+        """
+        True if every source file exists and has the modification time
+        and size it had when the store was built.
+        """
+        for source in self.sources.values():
+            path = Path(source["source"])
+            if not path.is_file():
+                return False
+            signature = _source_signature(path)
+            if (
+                signature["mtime_ns"] != source["mtime_ns"]
+                or signature["size"] != source["size"]
+            ):
+                return False
+        return True
+
+    def _columns(self, hrus: Sequence[Union[int, str]] = None) -> object:
+        # a slice keeps the values as a view of the memory-mapped file
+        if hrus is None:
+            return slice(None)
+        hrus = [_hru_label(hru) for hru in hrus]
+        missing = [hru for hru in hrus if hru not in self._hru_index]
+        if missing:
+            raise ValueError(
+                f"HRU(s) '{', '.join(missing)}' not in {self.path}. Valid "
+                + f"HRUs are '{', '.join(self.hrus)}'."
+            )
+        if hrus == self.hrus:
+            return slice(None)
+        return [self._hru_index[hru] for hru in hrus]
+
+    def _names(self, names: Union[str, Sequence[str]]) -> List[str]:
+        if isinstance(names, str):
+            names = [names]
+        names = list(names)
+        if len(names) < 1:
+            raise ValueError("at least one forcing variable must be specified")
+        missing = [name for name in names if name not in self._variables]
+        if missing:
+            raise ValueError(
+                f"Invalid forcing variable(s) ({', '.join(missing)}). Valid "
+                + f"forcing variables are '{', '.join(self.names)}'."
+            )
+        return names
+
+    def values(
+        self,
+        names: Union[str, Sequence[str]],
+        hrus: Sequence[Union[int, str]] = None,
+        start: int = 0,
+        stop: int = None,
+    ) -> np.ndarray:
+        """
+        Get the values for one or more variables.
+
+        The values of multiple variables are summed (for example
+        hru_rain and snowmelt). The values of a single variable for
+        all of the HRUs are returned as a memory-mapped view without
+        copying.
+
+        Parameters
+        ----------
+        names : str or list of str
+            Forcing variable(s).
+        hrus : list of int or str (default: None)
+            HRUs to return. If not specified all of the HRUs are
+            returned.
+        start : int (default 0)
+            First date (row) to return.
+        stop : int (default: None)
+            Date (row) after the last date to return. If not specified
+            the values through the last date are returned.
+
+        Returns
+        -------
+        values: numpy.ndarray
+            Values with a shape of (number of dates, number of HRUs).
+        """
+        names = self._names(names)
+        columns = self._columns(hrus)
+        values = self._variables[names[0]][start:stop, columns]
+        if len(names) > 1:
+            values = np.array(values, dtype=float)
+            for name in names[1:]:
+                values += self._variables[name][start:stop, columns]
+        return values
+
+    def iterate(
+        self,
+        names: Union[str, Sequence[str]],
+        hrus: Sequence[Union[int, str]] = None,
+        factor: float = 1.0,
+        chunksize: int = 1000,
+    ) -> Iterator[Tuple[pd.DatetimeIndex, np.ndarray]]:
+        """
+        Iterate over the values for one or more variables in chunks of
+        dates. Identical to iterate_prms_csv for the source files.
+
+        Parameters
+        ----------
+        names : str or list of str
+            Forcing variable(s). The values of multiple variables are
+            summed.
+        hrus : list of int or str (default: None)
+            HRUs to return. If not specified all of the HRUs are
+            returned.
+        factor: float (default 1.0)
+            Factor applied to the values (unit conversion).
+        chunksize: int (default 1000)
+            Number of dates in each chunk.
+
+        Yields
+        ------
+        dates: pandas.DatetimeIndex
+            Dates for the rows in the chunk.
+        values: numpy.ndarray
+            Values with a shape of (rows in the chunk, number of HRUs).
+        """
+        names = self._names(names)
+        self._columns(hrus)
+        dates = self.dates
+        for start in range(0, self.nsteps, chunksize):
+            stop = min(start + chunksize, self.nsteps)
+            values = np.array(
+                self.values(names, hrus=hrus, start=start, stop=stop),
+                dtype=float,
+            )
+            if factor != 1.0:
+                values *= factor
+            yield dates[start:stop], values
+
+
+def build_forcing_store(
+    paths: Union[PathLike, Sequence[PathLike]],
+    store_path: PathLike,
+) -> ForcingStore:
+    """
+    Convert PRMS CSV forcing files to a forcing store.
+
+    Parameters
+    ----------
+    paths : str, PathLike, or list of str or PathLike
+        PRMS CSV file(s) or directories with PRMS CSV files. Every file
+        must have the same dates and HRUs.
+    store_path : str or PathLike
+        Forcing store directory.
+
+    Returns
+    -------
+    store: ForcingStore
+    """
+    sources = _source_paths(paths)
+    names = [forcing_variable_name(source) for source in sources]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(
+            f"forcing variable name(s) '{', '.join(duplicates)}' are "
+            + "used by more than one PRMS CSV file"
+        )
+
+    store_path = Path(store_path)
+    store_path.mkdir(parents=True, exist_ok=True)
+    # remove the metadata first so an interrupted build is not current
+    metadata_path = store_path / FORCING_STORE_METADATA
+    previous_files = set()
+    if metadata_path.exists():
+        try:
+            with open(metadata_path) as f:
+                previous_files = {
+                    source["file"]
+                    for source in json.load(f)["variables"].values()
+                }
+        except (ValueError, KeyError, TypeError):
+            pass
+        metadata_path.unlink()
+
+    dates = None
+    hrus = None
+    variables = {}
+    for name, source in zip(names, sources):
+        signature = _source_signature(source)
+        df = pd.read_csv(source, index_col=0, parse_dates=True)
+        columns = [_hru_label(column) for column in df.columns]
+        if dates is None:
+            dates = df.index
+            hrus = columns
+        elif not df.index.equals(dates):
+            raise ValueError(
+                f"dates in {source} do not match dates in {sources[0]}"
+            )
+        elif columns != hrus:
+            raise ValueError(
+                f"HRUs in {source} do not match HRUs in {sources[0]}"
+            )
+        file_name = f"{name}.bin"
+        values = df.to_numpy(dtype="<f8")
+        np.ascontiguousarray(values).tofile(store_path / file_name)
+        variables[name] = dict(file=file_name, **signature)
+
+    np.asarray(dates.values, dtype="datetime64[ns]").view("<i8").tofile(
+        store_path / FORCING_STORE_DATES
+    )
+    metadata = {
+        "version": FORCING_STORE_VERSION,
+        "nsteps": len(dates),
+        "hrus": hrus,
+        "dtype": "<f8",
+        "variables": variables,
+    }
+    with open(metadata_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    for file_name in previous_files - {
+        source["file"] for source in variables.values()
+    }:
+        (store_path / file_name).unlink(missing_ok=True)
+    return ForcingStore(store_path)
+
+
+def open_forcing_store(
+    paths: Union[PathLike, Sequence[PathLike]],
+    store_path: PathLike,
+    rebuild: bool = False,
+) -> ForcingStore:
+    """
+    Open the forcing store for PRMS CSV forcing files.
+
+    The store is built if it does not exist, does not have the same
+    source files, or any source file has been modified since the store
+    was built. Otherwise the existing store is memory-mapped without
+    reading the source files.
+
+    Parameters
+    ----------
+    paths : str, PathLike, or list of str or PathLike
+        PRMS CSV file(s) or directories with PRMS CSV files.
+    store_path : str or PathLike
+        Forcing store directory.
+    rebuild : bool (default False)
+        Always rebuild the store.
+
+    Returns
+    -------
+    store: ForcingStore
+    """
+    sources = {str(source) for source in _source_paths(paths)}
+    if not rebuild and (Path(store_path) / FORCING_STORE_METADATA).exists():
+        try:
+            store = ForcingStore(store_path)
+        except (ValueError, KeyError, json.JSONDecodeError):
+            store = None
+        if (
+            store is not None
+            and {source["source"] for source in store.sources.values()}
+            == sources
+            and store.is_current()
+        ):
+            return store
+    return build_forcing_store(paths, store_path)
@@ -0,0 +1,372 @@
+import json
+import os
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .prms_csv import PathLike
+
+try:
+    import netCDF4
+except ImportError:  # pragma: no cover
+    netCDF4 = None
+
+OUTPUT_FORMATS = ("binary", "netcdf")
+
+# name of the metadata file in a binary output directory
+BINARY_METADATA = "metadata.json"
+
+
+def _output_format(path: PathLike, output_format: str = None) -> str:
+    if output_format is None:
+        output_format = (
+            "netcdf" if str(path).lower().endswith(".nc") else "binary"
+        )
+    output_format = output_format.lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Invalid output_format ({output_format}). Valid output "
+            + f"formats are '{', '.join(OUTPUT_FORMATS)}'."
+        )
+    return output_format
+
+
+def _require_netcdf4() -> None:
+    if netCDF4 is None:
+        raise ImportError(
+            "netCDF4 is required for NetCDF output. Install it with "
+            + "'pip install netcdf4' or 'pip install simple_soil[optional]'."
+        )
+
+
+def _variable_name(name: str) -> str:
+    # NetCDF variable names cannot contain '/'
+    return name.replace("/", "_per_").replace(" ", "_")
+
+
+class OutputWriter:
+    """
+    Base class for writers that append output to disk in chunks.
+
+    Chunks are arrays with a shape of (number of variables, number of
+    steps) or (number of variables, number of steps, number of cells)
+    and are written in the order they are received. Every chunk that
+    has been written can be read with OutputReader, even if the writer
+    is not closed (for example if a run fails).
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Output path.
+    names : list of str
+        Output variable names.
+    ncells : int (default: None)
+        Number of cells for array output.
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        names: Sequence[str],
+        ncells: int = None,
+    ) -> None:
+        self.path = path
+        self.names = list(names)
+        self.ncells = ncells
+        self.nsteps = 0
+        self.closed = False
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def write(self, data: np.ndarray) -> None:
+        """
+        Append a chunk of output.
+
+        Parameters
+        ----------
+        data : numpy.ndarray
+            Chunk of output for every variable.
+        """
+        if self.closed:
+            raise ValueError(f"output file '{self.path}' is closed")
+        if data.shape[0] != len(self.names):
+            raise ValueError(
+                f"number of variables in chunk ({data.shape[0]}) does not "
+                + f"match the number of output variables ({len(self.names)})"
+            )
+        if data.shape[1] > 0:
+            self._write(np.ascontiguousarray(data, dtype=float))
+            self.nsteps += data.shape[1]
+            self._sync()
+
+    def close(self) -> None:
+        if not self.closed:
+            self._close()
+            self.closed = True
+
+    def _write(self, data: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        raise NotImplementedError
+
+    def _sync(self) -> None:
+        # make the steps written so far readable by OutputReader if the
+        # writer is never closed (for example if a run fails)
+        pass
+
+
+class BinaryOutputWriter(OutputWriter):
+    """
+    Write output to a directory with a raw float64 file for each
+    variable and a JSON metadata file.
+
+    Raw files are appended to without rewriting earlier chunks and can
+    be memory-mapped by OutputReader.
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        names: Sequence[str],
+        ncells: int = None,
+    ) -> None:
+        super().__init__(path, names, ncells=ncells)
+        os.makedirs(path, exist_ok=True)
+        self.files = [f"{idx:03d}.bin" for idx in range(len(self.names))]
+        self._handles = [
+            open(os.path.join(path, file_name), "wb")
+            for file_name in self.files
+        ]
+        self._write_metadata()
+
+    def _write_metadata(self) -> None:
+        metadata = {
+            "names": self.names,
+            "files": self.files,
+            "ncells": self.ncells,
+            "nsteps": self.nsteps,
+            "dtype": "<f8",
+        }
+        # replace the metadata so a partially written file is never read
+        path = os.path.join(self.path, BINARY_METADATA)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def _write(self, data: np.ndarray) -> None:
+        for handle, values in zip(self._handles, data):
+            handle.write(values.astype("<f8", copy=False).tobytes())
+
+    def _sync(self) -> None:
+        # the values are flushed before the metadata is updated so the
+        # metadata never includes steps that are not in the raw files
+        for handle in self._handles:
+            handle.flush()
+        self._write_metadata()
+
+    def _close(self) -> None:
+        for handle in self._handles:
+            handle.close()
+        self._write_metadata()
+
+
+class NetCDFOutputWriter(OutputWriter):
+    """
+    Write output to a NetCDF file with an unlimited time dimension.
+
+    Requires netCDF4. Variable names are stored in the 'long_name'
+    attribute of each NetCDF variable.
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        names: Sequence[str],
+        ncells: int = None,
+    ) -> None:
+        _require_netcdf4()
+        super().__init__(path, names, ncells=ncells)
+        self._dataset = netCDF4.Dataset(path, "w")
+        self._dataset.createDimension("step", None)
+        dimensions = ("step",)
+        if ncells is not None:
+            self._dataset.createDimension("cell", ncells)
+            dimensions = ("step", "cell")
+        self._variables = []
+        for name in self.names:
+            variable = self._dataset.createVariable(
+                _variable_name(name), "f8", dimensions
+            )
+            variable.long_name = name
+            self._variables.append(variable)
+
+    def _write(self, data: np.ndarray) -> None:
+        start = self.nsteps
+        end = start + data.shape[1]
+        for variable, values in zip(self._variables, data):
+            variable[start:end] = values
+
+    def _sync(self) -> None:
+        self._dataset.sync()
+
+    def _close(self) -> None:
+        self._dataset.close()
+
+
+def open_output_writer(
+    path: PathLike,
+    names: Sequence[str],
+    ncells: int = None,
+    output_format: str = None,
+) -> OutputWriter:
+    """
+    Create an output writer.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Output path. A directory for binary output or a file for
+        NetCDF output.
+    names : list of str
+        Output variable names.
+    ncells : int (default: None)
+        Number of cells for array output.
+    output_format : str (default: None)
+        Output format ('binary' or 'netcdf'). If not specified, NetCDF
+        is used for paths ending in '.nc' and binary otherwise.
+
+    Returns
+    -------
+    writer: OutputWriter
+    """
+    output_format = _output_format(path, output_format)
+    if output_format == "netcdf":
+        return NetCDFOutputWriter(path, names, ncells=ncells)
+    return BinaryOutputWriter(path, names, ncells=ncells)
+
+
+class OutputReader:
+    """
+    Read output written by an OutputWriter.
+
+    Binary output is memory-mapped and NetCDF variables are read
+    lazily, so only the data that is accessed is loaded into memory.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Output path.
+    output_format : str (default: None)
+        Output format ('binary' or 'netcdf'). If not specified, NetCDF
+        is used for paths ending in '.nc' and binary otherwise.
+    """
+
+    def __init__(self, path: PathLike, output_format: str = None) -> None:
+        self.path = path
+        self.output_format = _output_format(path, output_format)
+        self._dataset = None
+        if self.output_format == "netcdf":
+            _require_netcdf4()
+            self._dataset = netCDF4.Dataset(path, "r")
+            self._dataset.set_auto_mask(False)
+            self._variables = {
+                variable.long_name: variable
+                for variable in self._dataset.variables.values()
+            }
+            self.names = list(self._variables)
+            self.ncells = (
+                self._dataset.dimensions["cell"].size
+                if "cell" in self._dataset.dimensions
+                else None
+            )
+            self.nsteps = self._dataset.dimensions["step"].size
+        else:
+            with open(os.path.join(path, BINARY_METADATA)) as f:
+                metadata = json.load(f)
+            self.names = metadata["names"]
+            self.ncells = metadata["ncells"]
+            self.nsteps = metadata["nsteps"]
+            shape = (self.nsteps,)
+            if self.ncells is not None:
+                shape = (self.nsteps, self.ncells)
+            self._variables = {}
+            for name, file_name in zip(self.names, metadata["files"]):
+                file_path = os.path.join(path, file_name)
+                if self.nsteps == 0:
+                    values = np.empty(shape, dtype=metadata["dtype"])
+                else:
+                    values = np.memmap(
+                        file_path,
+                        dtype=metadata["dtype"],
+                        mode="r",
+                        shape=shape,
+                    )
+                self._variables[name] = values
+
+    def __enter__(self) -> "OutputReader":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._variables
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name not in self._variables:
+            raise ValueError(
+                f"Invalid output variable ({name}). Valid output "
+                + f"variables are '{', '.join(self.names)}'."
+            )
+        variable = self._variables[name]
+        if self._dataset is not None:
+            variable = variable[:]
+        return variable
+
+    def close(self) -> None:
+        if self._dataset is not None:
+            self._dataset.close()
+            self._dataset = None
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        return {name: self[name] for name in self.names}
+
+    def get_dataframe(
+        self,
+        names: List[str] = None,
+        cell: int = None,
+    ) -> pd.DataFrame:
+        """
+        Get output as a DataFrame indexed by total time.
+
+        Parameters
+        ----------
+        names : list of str (default: None)
+            Variables to include. If not specified, all variables are
+            included.
+        cell : int (default: None)
+            Cell to return for array output. Required for array output.
+        """
+        if self.ncells is not None and cell is None:
+            raise ValueError("cell must be specified for array output")
+        if names is None:
+            names = [name for name in self.names if name != "total time"]
+        data = {}
+        for name in names:
+            values = self[name]
+            if self.ncells is not None:
+                values = values[:, cell]
+            data[name] = np.asarray(values)
+        index = None
+        if "total time" in self._variables:
+            values = self["total time"]
+            if self.ncells is not None:
+                values = values[:, 0]
+            index = pd.Index(np.asarray(values), name="total time")
+        return pd.DataFrame(data, index=index)
@@ -0,0 +1,125 @@
+import itertools
+import os
+from typing import Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+PathLike = Union[str, os.PathLike]
+
+# conversion factors from inches to model length units
+INCHES_TO_LENGTH_UNITS = {
+    "m": 2.54 / 100.0,
+    "cm": 2.54,
+    "ft": 1.0 / 12.0,
+    "in": 1.0,
+}
+
+
+def _hru_label(hru: Union[int, str]) -> str:
+    return str(hru).strip()
+
+
+def get_prms_csv_hrus(path: PathLike) -> List[str]:
+    """
+    Get the HRU labels in a PRMS CSV output file.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        Path to a PRMS CSV output file (for example hru_rain.csv).
+
+    Returns
+    -------
+    hrus: list of str
+        HRU labels in the order they are stored in the file.
+    """
+    columns = pd.read_csv(path, index_col=0, nrows=0).columns
+    return [_hru_label(column) for column in columns]
+
+
+def iterate_prms_csv(
+    paths: Union[PathLike, Sequence[PathLike]],
+    hrus: Sequence[Union[int, str]] = None,
+    factor: float = 1.0,
+    chunksize: int = 1000,
+) -> Iterator[Tuple[pd.DatetimeIndex, np.ndarray]]:
+    """
+    Stream PRMS CSV output files in chunks of rows.
+
+    If more than one file is specified the values in the files are
+    summed (for example rain and snowmelt) and the dates in every file
+    must be identical.
+
+    Parameters
+    ----------
+    paths : str, PathLike, or list of str or PathLike
+        PRMS CSV output file(s).
+    hrus : list of int or str (default: None)
+        HRUs to return. If not specified all of the HRUs in the first
+        file are returned.
+    factor: float (default 1.0)
+        Factor applied to the values (unit conversion).
+    chunksize: int (default 1000)
+        Number of rows read at a time.
+
+    Yields
+    ------
+    dates: pandas.DatetimeIndex
+        Dates for the rows in the chunk.
+    values: numpy.ndarray
+        Values with a shape of (rows in the chunk, number of HRUs).
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    if len(paths) < 1:
+        raise ValueError("at least one PRMS CSV file must be specified")
+    if hrus is None:
+        hrus = get_prms_csv_hrus(paths[0])
+    hrus = [_hru_label(hru) for hru in hrus]
+
+    readers = []
+    for path in paths:
+        available = get_prms_csv_hrus(path)
+        missing = [hru for hru in hrus if hru not in available]
+        if missing:
+            raise ValueError(
+                f"HRU(s) '{', '.join(missing)}' not in {path}. Valid HRUs "
+                + f"are '{', '.join(available)}'."
+            )
+        # only parse the date column and the requested HRU columns
+        readers.append(
+            pd.read_csv(
+                path,
+                index_col=0,
+                parse_dates=True,
+                usecols=lambda column: _hru_label(column) in hrus
+                or column.lower() == "date",
+                chunksize=chunksize,
+            )
+        )
+
+    try:
+        # zip_longest so that files with fewer rows are not truncated
+        for chunks in itertools.zip_longest(*readers):
+            dates = None if chunks[0] is None else chunks[0].index
+            values = None
+            for path, chunk in zip(paths, chunks):
+                if chunk is None or not chunk.index.equals(dates):
+                    raise ValueError(
+                        f"dates in {path} do not match dates in {paths[0]}"
+                    )
+                chunk.columns = [
+                    _hru_label(column) for column in chunk.columns
+                ]
+                chunk_values = chunk[hrus].to_numpy(dtype=float, copy=True)
+                if values is None:
+                    values = chunk_values
+                else:
+                    values += chunk_values
+            if factor != 1.0:
+                values *= factor
+            yield dates, values
+    finally:
+        for reader in readers:
+            reader.close()
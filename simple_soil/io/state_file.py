@@ -0,0 +1,167 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from .prms_csv import PathLike
+
+STATE_FILE_VERSION = 1
+
+# name of the array with the JSON metadata in a state file
+STATE_FILE_METADATA = "__metadata__"
+
+
+def _encode_value(
+    key: str,
+    value: object,
+    arrays: Dict[str, np.ndarray],
+    structure: Dict[str, object],
+) -> None:
+    if value is None:
+        structure[key] = None
+    elif isinstance(value, (tuple, list)):
+        structure[key] = {"sequence": type(value).__name__, "size": len(value)}
+        for idx, item in enumerate(value):
+            _encode_value(f"{key}/{idx}", item, arrays, structure)
+    else:
+        value = np.asarray(value)
+        if value.dtype.kind not in "biuf":
+            raise TypeError(
+                f"state variable {key} ({value.dtype}) cannot be written "
+                + "to a state file"
+            )
+        structure[key] = "array" if value.ndim > 0 else "scalar"
+        arrays[key] = value
+
+
+def _decode_value(
+    key: str,
+    arrays: Dict[str, np.ndarray],
+    scalars: Dict[str, object],
+    structure: Dict[str, object],
+) -> object:
+    kind = structure[key]
+    if kind is None:
+        return None
+    elif isinstance(kind, dict):
+        values = [
+            _decode_value(f"{key}/{idx}", arrays, scalars, structure)
+            for idx in range(kind["size"])
+        ]
+        return tuple(values) if kind["sequence"] == "tuple" else values
+    elif kind == "scalar":
+        return scalars[key]
+    return np.array(arrays[key])
+
+
+def write_state_file(
+    path: PathLike,
+    state: Dict[str, object],
+    metadata: Dict[str, object] = None,
+) -> None:
+    """
+    Write a state to an uncompressed NPZ state file.
+
+    Values in the state can be None, numeric scalars and arrays, nested
+    dictionaries (for example the infiltration state), and tuples or
+    lists of these. Each numeric array is stored as a separate array.
+    Scalars, the structure of the state, the STATE_FILE_VERSION, and
+    the metadata are stored as JSON. The file is written to a
+    temporary file that replaces path when it is complete, so an
+    interrupted write does not overwrite an existing state file.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        State file path.
+    state : dict
+        State to write.
+    metadata : dict (default: None)
+        JSON serializable metadata written with the state.
+    """
+    arrays = {}
+    structure = {}
+
+    def encode(prefix: str, values: Dict[str, object]) -> None:
+        for key, value in values.items():
+            if "/" in key:
+                raise ValueError(
+                    f"state variable names cannot contain '/' ({key})"
+                )
+            if isinstance(value, dict):
+                structure[f"{prefix}{key}"] = "dict"
+                encode(f"{prefix}{key}/", value)
+            else:
+                _encode_value(f"{prefix}{key}", value, arrays, structure)
+
+    encode("", state)
+    # scalars are stored in the header, which is smaller than storing
+    # each scalar as an array
+    scalars = {
+        key: arrays.pop(key).item()
+        for key, kind in structure.items()
+        if kind == "scalar"
+    }
+    header = {
+        "version": STATE_FILE_VERSION,
+        "structure": structure,
+        "scalars": scalars,
+        "metadata": {} if metadata is None else metadata,
+    }
+    arrays[STATE_FILE_METADATA] = np.array(json.dumps(header))
+
+    path = Path(path)
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    with open(temporary_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temporary_path, path)
+
+
+def read_state_file(
+    path: PathLike,
+) -> Tuple[Dict[str, object], Dict[str, object]]:
+    """
+    Read a state file written with write_state_file.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        State file path.
+
+    Returns
+    -------
+    state: dict
+        State with the structure it was written with.
+    metadata: dict
+        Metadata written with the state.
+    """
+    with np.load(path, allow_pickle=False) as f:
+        arrays = {key: f[key] for key in f.files}
+    if STATE_FILE_METADATA not in arrays:
+        raise ValueError(f"{path} is not a simple_soil state file")
+    header = json.loads(str(arrays.pop(STATE_FILE_METADATA)))
+    if header.get("version") != STATE_FILE_VERSION:
+        raise ValueError(
+            f"state file version ({header.get('version')}) in {path} is "
+            + f"not supported (expected {STATE_FILE_VERSION})"
+        )
+
+    structure = header["structure"]
+    state = {}
+    for key, kind in structure.items():
+        *parents, name = key.split("/")
+        # sequence items are decoded with the sequence
+        if isinstance(structure.get("/".join(parents)), dict):
+            continue
+        values = state
+        for parent in parents:
+            values = values[parent]
+        if kind == "dict":
+            values[name] = {}
+        else:
+            values[name] = _decode_value(
+                key, arrays, header["scalars"], structure
+            )
+    return state, header["metadata"]
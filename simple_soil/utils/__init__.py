@@ -1,5 +1,9 @@
 from .flow_functions import *
+from .flux_table import *
 from .fraction_functions import *
 from .infiltration_functions import *
+from .instrumentation import *
 from .newton_raphson import *
+from .numba_kernels import *
+from .output_buffer import *
 from .smoothing import *
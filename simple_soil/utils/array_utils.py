@@ -1,9 +1,28 @@
+from numbers import Real
 from typing import Union
 
 import numpy as np
 
 
+def is_scalar(value: Union[float, np.ndarray]) -> bool:
+    # python and numpy real scalars (int, float, numpy.float32, ...);
+    # the float check is first because it is the common case
+    return isinstance(value, float) or isinstance(value, Real)
+
+
 def array_check(arr: Union[float, np.ndarray]) -> np.ndarray:
-    if isinstance(arr, float):
-        arr = np.full(1, arr, dtype=float)
-    return arr
+    # float arrays are returned without copying so they can be used as
+    # out arrays
+    if is_scalar(arr):
+        return np.full(1, arr, dtype=float)
+    arr = np.asarray(arr, dtype=float)
+    return arr if arr.ndim > 0 else arr.reshape(1)
+
+
+def array_return(
+    arr: np.ndarray,
+    like: Union[float, np.ndarray],
+) -> Union[float, np.ndarray]:
+    if isinstance(like, np.ndarray) or not isinstance(arr, np.ndarray):
+        return arr
+    return float(arr[0])
@@ -1,15 +1,21 @@
-from typing import Union
+from typing import Callable, Union
 
 import numpy as np
 
-from .array_utils import array_check
+from .array_utils import array_return
 from .fraction_functions import (
     groundwater_recharge_fraction,
+    groundwater_recharge_fraction_derivative,
     lateral_discharge_fraction,
+    lateral_discharge_fraction_derivative,
     pet_fraction,
+    pet_fraction_derivative,
     saturation_fraction,
+    saturation_fraction_derivative,
     surface_discharge_fraction,
+    surface_discharge_fraction_derivative,
     surface_infiltration_fraction,
+    surface_infiltration_fraction_derivative,
 )
 from .infiltration_functions import GreenAmpt, InfiltrationConstantLoss
 
@@ -21,10 +27,12 @@ def flow_factor(
     theta_wp: float,
     bc_epsilon: float = 3.5,
 ) -> float:
-    return (
-        flow_rate
-        * ((water_content - theta_wp) / (theta_sat - theta_wp)) ** bc_epsilon
-    )
+    relative_content = (water_content - theta_wp) / (theta_sat - theta_wp)
+    if isinstance(relative_content, np.ndarray):
+        relative_content = np.maximum(relative_content, 0.0)
+    else:
+        relative_content = max(relative_content, 0.0)
+    return flow_rate * relative_content**bc_epsilon
 
 
 def aet_volumetric_rate(
@@ -35,13 +43,14 @@ def aet_volumetric_rate(
     area: float,
     smoothing_omega: float = 1e-6,
 ) -> float:
-    fraction = float(
+    fraction = array_return(
         pet_fraction(
             water_content,
             theta_pet_max,
             theta_wp,
             smoothing_omega=smoothing_omega,
-        )[0]
+        ),
+        water_content,
     )
     return -area * fraction * rate
 
@@ -56,15 +65,22 @@ def infiltration_volumetric_rate(
     infiltration_method: Union["InfiltrationConstantLoss", "GreenAmpt"],
     smoothing_omega: float = 1e-6,
 ) -> float:
-    area_fraction = float(
+    area_fraction = array_return(
         surface_infiltration_fraction(
             water_content,
             theta_sat,
             theta_discharge,
             smoothing_omega=smoothing_omega,
-        )[0]
+        ),
+        water_content,
     )
-    if rate == 0.0:
+    if isinstance(rate, np.ndarray):
+        infiltration_rate = infiltration_method.infiltration(
+            rate,
+            water_content,
+            water_content0,
+        )
+    elif rate == 0.0:
         infiltration_rate = 0.0
     else:
         infiltration_rate = infiltration_method.infiltration(
@@ -107,12 +123,13 @@ def recharge_volumetric_rate(
     max_vertical_rate: float,
     smoothing_omega: float = 1e-6,
 ) -> float:
-    gradient = thickness * float(
+    gradient = thickness * array_return(
         saturation_fraction(
             water_content,
             theta_sat,
             smoothing_omega=smoothing_omega,
-        )[0]
+        ),
+        water_content,
     )
     rate = flow_factor(
         water_content,
@@ -120,13 +137,14 @@ def recharge_volumetric_rate(
         theta_sat,
         theta_wp,
     )
-    fraction = float(
+    fraction = array_return(
         groundwater_recharge_fraction(
             water_content,
             theta_sat,
             theta_fc,
             smoothing_omega=smoothing_omega,
-        )[0]
+        ),
+        water_content,
     )
     return -area * fraction * rate * gradient
 
@@ -139,14 +157,14 @@ def surface_volumetric_rate(
     max_vertical_rate: float,
     smoothing_omega: float = 1e-6,
 ) -> float:
-    water_content = array_check(water_content)
-    fraction = float(
+    fraction = array_return(
         surface_discharge_fraction(
             water_content,
             theta_sat,
             theta_discharge,
             smoothing_omega=smoothing_omega,
-        )[0]
+        ),
+        water_content,
     )
     return -area * fraction * max_vertical_rate
 
@@ -161,12 +179,13 @@ def lateral_volumetric_rate(
     max_horizontal_rate: float,
     smoothing_omega: float = 1e-6,
 ) -> float:
-    gradient = thickness * float(
+    gradient = thickness * array_return(
         saturation_fraction(
             water_content,
             theta_sat,
             smoothing_omega=smoothing_omega,
-        )[0]
+        ),
+        water_content,
     )
     rate = flow_factor(
         water_content,
@@ -174,13 +193,14 @@ def lateral_volumetric_rate(
         theta_sat,
         theta_wp,
     )
-    fraction = float(
+    fraction = array_return(
         lateral_discharge_fraction(
             water_content,
             theta_sat,
             theta_fc,
             smoothing_omega=smoothing_omega,
-        )[0]
+        ),
+        water_content,
     )
     return -area * fraction * rate * gradient
 
@@ -194,19 +214,21 @@ def volume_change_rate(
     delta_t: float,
     smoothing_omega: float = 1e-6,
 ) -> np.ndarray:
-    sat0 = float(
+    sat0 = array_return(
         saturation_fraction(
             water_content0,
             theta_sat,
             smoothing_omega=smoothing_omega,
-        )[0]
+        ),
+        water_content0,
     )
-    sat = float(
+    sat = array_return(
         saturation_fraction(
             water_content,
             theta_sat,
             smoothing_omega=smoothing_omega,
-        )[0]
+        ),
+        water_content,
     )
 
     return area * thickness * theta_sat * (sat0 - sat) / delta_t
@@ -236,3 +258,257 @@ def volume_change_rate(
     #     * area
     # )
     # return (v0 - v1) / delta_t
+
+
+def flow_factor_derivative(
+    water_content: float,
+    flow_rate: float,
+    theta_sat: float,
+    theta_wp: float,
+    bc_epsilon: float = 3.5,
+) -> float:
+    relative_content = (water_content - theta_wp) / (theta_sat - theta_wp)
+    if isinstance(relative_content, np.ndarray):
+        relative_content = np.maximum(relative_content, 0.0)
+    else:
+        relative_content = max(relative_content, 0.0)
+    return (
+        flow_rate
+        * bc_epsilon
+        * relative_content ** (bc_epsilon - 1.0)
+        / (theta_sat - theta_wp)
+    )
+
+
+def aet_volumetric_rate_derivative(
+    water_content: float,
+    rate: float,
+    theta_pet_max: float,
+    theta_wp: float,
+    area: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    fraction_derivative = array_return(
+        pet_fraction_derivative(
+            water_content,
+            theta_pet_max,
+            theta_wp,
+            smoothing_omega=smoothing_omega,
+        ),
+        water_content,
+    )
+    return -area * fraction_derivative * rate
+
+
+def infiltration_volumetric_rate_derivative(
+    water_content: float,
+    water_content0: float,
+    rate: float,
+    theta_sat: float,
+    theta_discharge: float,
+    area: float,
+    infiltration_method: Union["InfiltrationConstantLoss", "GreenAmpt"],
+    smoothing_omega: float = 1e-6,
+) -> float:
+    # the infiltration rate only depends on the water content at the
+    # start of the time step
+    area_fraction_derivative = array_return(
+        surface_infiltration_fraction_derivative(
+            water_content,
+            theta_sat,
+            theta_discharge,
+            smoothing_omega=smoothing_omega,
+        ),
+        water_content,
+    )
+    if isinstance(rate, np.ndarray):
+        infiltration_rate = infiltration_method.infiltration(
+            rate,
+            water_content,
+            water_content0,
+        )
+    elif rate == 0.0:
+        infiltration_rate = 0.0
+    else:
+        infiltration_rate = infiltration_method.infiltration(
+            rate,
+            water_content,
+            water_content0,
+        )
+    return area * area_fraction_derivative * infiltration_rate
+
+
+def rejected_infiltration_volumetric_rate_derivative(
+    water_content: float,
+    water_content0: float,
+    rate: float,
+    theta_sat: float,
+    theta_discharge: float,
+    area: float,
+    infiltration_method: Union["InfiltrationConstantLoss", "GreenAmpt"],
+    smoothing_omega: float = 1e-6,
+) -> float:
+    return -infiltration_volumetric_rate_derivative(
+        water_content,
+        water_content0,
+        rate,
+        theta_sat,
+        theta_discharge,
+        area,
+        infiltration_method,
+        smoothing_omega=smoothing_omega,
+    )
+
+
+def _drainage_volumetric_rate_derivative(
+    water_content: float,
+    theta_sat: float,
+    theta_fc: float,
+    theta_wp: float,
+    area: float,
+    thickness: float,
+    max_rate: float,
+    fraction_function: Callable,
+    fraction_derivative_function: Callable,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    # recharge and lateral discharge share the same functional form
+    gradient = thickness * array_return(
+        saturation_fraction(
+            water_content,
+            theta_sat,
+            smoothing_omega=smoothing_omega,
+        ),
+        water_content,
+    )
+    gradient_derivative = thickness * array_return(
+        saturation_fraction_derivative(
+            water_content,
+            theta_sat,
+            smoothing_omega=smoothing_omega,
+        ),
+        water_content,
+    )
+    rate = flow_factor(
+        water_content,
+        max_rate,
+        theta_sat,
+        theta_wp,
+    )
+    rate_derivative = flow_factor_derivative(
+        water_content,
+        max_rate,
+        theta_sat,
+        theta_wp,
+    )
+    fraction = array_return(
+        fraction_function(
+            water_content,
+            theta_sat,
+            theta_fc,
+            smoothing_omega=smoothing_omega,
+        ),
+        water_content,
+    )
+    fraction_derivative = array_return(
+        fraction_derivative_function(
+            water_content,
+            theta_sat,
+            theta_fc,
+            smoothing_omega=smoothing_omega,
+        ),
+        water_content,
+    )
+    return -area * (
+        fraction_derivative * rate * gradient
+        + fraction * rate_derivative * gradient
+        + fraction * rate * gradient_derivative
+    )
+
+
+def recharge_volumetric_rate_derivative(
+    water_content: float,
+    theta_sat: float,
+    theta_fc: float,
+    theta_wp: float,
+    area: float,
+    thickness: float,
+    max_vertical_rate: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    return _drainage_volumetric_rate_derivative(
+        water_content,
+        theta_sat,
+        theta_fc,
+        theta_wp,
+        area,
+        thickness,
+        max_vertical_rate,
+        groundwater_recharge_fraction,
+        groundwater_recharge_fraction_derivative,
+        smoothing_omega=smoothing_omega,
+    )
+
+
+def surface_volumetric_rate_derivative(
+    water_content: float,
+    theta_sat: float,
+    theta_discharge: float,
+    area: float,
+    max_vertical_rate: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    fraction_derivative = array_return(
+        surface_discharge_fraction_derivative(
+            water_content,
+            theta_sat,
+            theta_discharge,
+            smoothing_omega=smoothing_omega,
+        ),
+        water_content,
+    )
+    return -area * fraction_derivative * max_vertical_rate
+
+
+def lateral_volumetric_rate_derivative(
+    water_content: float,
+    theta_sat: float,
+    theta_fc: float,
+    theta_wp: float,
+    area: float,
+    thickness: float,
+    max_horizontal_rate: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    return _drainage_volumetric_rate_derivative(
+        water_content,
+        theta_sat,
+        theta_fc,
+        theta_wp,
+        area,
+        thickness,
+        max_horizontal_rate,
+        lateral_discharge_fraction,
+        lateral_discharge_fraction_derivative,
+        smoothing_omega=smoothing_omega,
+    )
+
+
+def volume_change_rate_derivative(
+    water_content: float,
+    water_content0: float,
+    theta_sat: float,
+    area: float,
+    thickness: float,
+    delta_t: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    sat_derivative = array_return(
+        saturation_fraction_derivative(
+            water_content,
+            theta_sat,
+            smoothing_omega=smoothing_omega,
+        ),
+        water_content,
+    )
+    return -area * thickness * theta_sat * sat_derivative / delta_t
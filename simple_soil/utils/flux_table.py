@@ -0,0 +1,273 @@
+import bisect
+from typing import Callable, Tuple, Union
+
+import numpy as np
+
+
+class FluxTable:
+    """
+    Piecewise cubic Hermite tables of a set of curves of water content.
+
+    Each curve is tabulated with its exact value and derivative at the
+    grid nodes, so the interpolant and its derivative are continuous and
+    the derivative of the interpolant is consistent with the
+    interpolated values. The grid starts uniform and intervals are
+    bisected until the interpolation error at the quarter points of
+    every interval is less than the tolerance, which concentrates nodes
+    around the smoothed regions of the flux curves. Water contents
+    outside of the tabulated range are evaluated with the exact
+    function.
+
+    Parameters
+    ----------
+    function : callable
+        Function called as function(theta, cells) that returns the
+        exact values and derivatives of the curves, each with a shape
+        of (number of curves, number of water contents). cells is None
+        for a single set of curves or the cell of each water content.
+    lower : float or numpy.ndarray
+        Lower limit of the table (for each cell).
+    upper : float or numpy.ndarray
+        Upper limit of the table (for each cell).
+    ncells : int (default: None)
+        Number of cells. If not specified, a single set of curves is
+        tabulated.
+    tolerance : float (default 1e-9)
+        Interpolation tolerance relative to the maximum absolute value
+        of each curve.
+    nintervals : int (default 64)
+        Number of intervals in the initial uniform grid.
+    max_refinements : int (default 40)
+        Maximum number of interval bisections.
+    """
+
+    def __init__(
+        self,
+        function: Callable,
+        lower: Union[float, np.ndarray],
+        upper: Union[float, np.ndarray],
+        ncells: int = None,
+        tolerance: float = 1e-9,
+        nintervals: int = 64,
+        max_refinements: int = 40,
+    ) -> None:
+        if tolerance <= 0.0:
+            raise ValueError(
+                f"tolerance ({tolerance}) must be greater than zero"
+            )
+        if nintervals < 1:
+            raise ValueError(
+                f"nintervals ({nintervals}) must be greater than zero"
+            )
+        self.function = function
+        self.ncells = ncells
+        self.tolerance = tolerance
+
+        size = 1 if ncells is None else ncells
+        lower = np.broadcast_to(np.asarray(lower, dtype=float), (size,))
+        upper = np.broadcast_to(np.asarray(upper, dtype=float), (size,))
+        if np.any(upper <= lower):
+            raise ValueError("table upper limits must exceed lower limits")
+        self.lower = np.array(lower)
+        self.upper = np.array(upper)
+
+        fraction = np.linspace(0.0, 1.0, nintervals + 1)
+        theta = (lower[:, None] + (upper - lower)[:, None] * fraction).ravel()
+        cells = np.repeat(np.arange(size), nintervals + 1)
+        values, derivatives = self._evaluate(theta, cells)
+        scale = np.abs(values).reshape(values.shape[0], size, -1).max(axis=2)
+        atol = tolerance * np.where(scale > 0.0, scale, 1.0)
+
+        # intervals that are checked for refinement, by left node
+        active = np.flatnonzero(cells[:-1] == cells[1:])
+        min_width = 1e-12 * (upper - lower)
+        for _ in range(max_refinements):
+            if active.shape[0] == 0:
+                break
+            left = active
+            right = active + 1
+            h = theta[right] - theta[left]
+            fail = np.zeros(left.shape, dtype=bool)
+            for t in (0.25, 0.5, 0.75):
+                x = theta[left] + t * h
+                exact, _ = self._evaluate(x, cells[left])
+                estimate, _ = _hermite(
+                    t,
+                    h,
+                    values[:, left],
+                    values[:, right],
+                    derivatives[:, left],
+                    derivatives[:, right],
+                )
+                fail |= np.any(
+                    np.abs(estimate - exact) > atol[:, cells[left]], axis=0
+                )
+            fail &= h > 2.0 * min_width[cells[left]]
+            left = left[fail]
+            if left.shape[0] == 0:
+                break
+            x = theta[left] + 0.5 * (theta[left + 1] - theta[left])
+            x_values, x_derivatives = self._evaluate(x, cells[left])
+            theta = np.insert(theta, left + 1, x)
+            cells = np.insert(cells, left + 1, cells[left])
+            values = np.insert(values, left + 1, x_values, axis=1)
+            derivatives = np.insert(
+                derivatives, left + 1, x_derivatives, axis=1
+            )
+            # new nodes are at left + 1 + number of earlier insertions
+            new = left + 1 + np.arange(left.shape[0])
+            active = np.concatenate((new - 1, new))
+            active.sort()
+
+        self.theta = theta
+        self.cells = cells
+        self.values = values
+        self.derivatives = derivatives
+        self.ncurves = values.shape[0]
+
+        # search keys are the cell number plus half of the normalized
+        # water content, so the nodes for all cells are in a single
+        # sorted array and the ranges for adjacent cells do not touch
+        self._width = self.upper - self.lower
+        self._keys = self._search_keys(theta, cells)
+        self._theta_list = theta.tolist() if ncells is None else None
+
+    def __len__(self) -> int:
+        return self.theta.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.theta.nbytes
+            + self.cells.nbytes
+            + self.values.nbytes
+            + self.derivatives.nbytes
+            + self._keys.nbytes
+        )
+
+    def _search_keys(
+        self,
+        theta: np.ndarray,
+        cells: np.ndarray,
+    ) -> np.ndarray:
+        return cells + 0.5 * (theta - self.lower[cells]) / self._width[cells]
+
+    def _evaluate(
+        self,
+        theta: np.ndarray,
+        cells: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        values, derivatives = self.function(
+            theta, None if self.ncells is None else cells
+        )
+        return (
+            np.stack(
+                [np.broadcast_to(value, theta.shape) for value in values]
+            ),
+            np.stack(
+                [np.broadcast_to(value, theta.shape) for value in derivatives]
+            ),
+        )
+
+    def __call__(
+        self,
+        theta: Union[float, np.ndarray],
+        cells: np.ndarray = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Interpolate the curves and their derivatives.
+
+        Parameters
+        ----------
+        theta : float or numpy.ndarray
+            Water content(s).
+        cells : numpy.ndarray (default: None)
+            Cell of each water content. If not specified and the table
+            has cells, theta has a value for every cell.
+
+        Returns
+        -------
+        values: numpy.ndarray
+            Interpolated values with a shape of (number of curves,) for
+            a float water content or (number of curves, number of water
+            contents).
+        derivatives: numpy.ndarray
+            Derivatives of the interpolated values.
+        """
+        if self.ncells is None and not isinstance(theta, np.ndarray):
+            return self._evaluate_scalar(theta)
+        theta = np.asarray(theta, dtype=float)
+        if self.ncells is None:
+            cells = np.zeros(theta.shape, dtype=int)
+        elif cells is None:
+            cells = np.arange(self.ncells)
+        lower = self.lower[cells]
+        upper = self.upper[cells]
+        outside = (theta < lower) | (theta > upper)
+        inside = np.clip(theta, lower, upper)
+        keys = self._search_keys(inside, cells)
+        left = np.searchsorted(self._keys, keys, side="right") - 1
+        # the upper limit of a cell is in the last interval of the cell
+        left -= (left == self.theta.shape[0] - 1) | (
+            self.cells[np.minimum(left + 1, self.theta.shape[0] - 1)] != cells
+        )
+
+        h = self.theta[left + 1] - self.theta[left]
+        t = (inside - self.theta[left]) / h
+        values, derivatives = _hermite(
+            t,
+            h,
+            self.values[:, left],
+            self.values[:, left + 1],
+            self.derivatives[:, left],
+            self.derivatives[:, left + 1],
+        )
+        if np.any(outside):
+            exact_values, exact_derivatives = self._evaluate(
+                theta[outside], cells[outside]
+            )
+            values[:, outside] = exact_values
+            derivatives[:, outside] = exact_derivatives
+        return values, derivatives
+
+    def _evaluate_scalar(self, theta: float) -> Tuple[np.ndarray, np.ndarray]:
+        grid = self._theta_list
+        if not grid[0] <= theta <= grid[-1]:
+            values, derivatives = self._evaluate(np.array([theta]), None)
+            return values[:, 0], derivatives[:, 0]
+        left = min(bisect.bisect_right(grid, theta) - 1, len(grid) - 2)
+        h = grid[left + 1] - grid[left]
+        return _hermite(
+            (theta - grid[left]) / h,
+            h,
+            self.values[:, left],
+            self.values[:, left + 1],
+            self.derivatives[:, left],
+            self.derivatives[:, left + 1],
+        )
+
+
+def _hermite(
+    t: Union[float, np.ndarray],
+    h: Union[float, np.ndarray],
+    y0: np.ndarray,
+    y1: np.ndarray,
+    m0: np.ndarray,
+    m1: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # cubic Hermite interpolant and its derivative on [x0, x0 + h]
+    t2 = t * t
+    t3 = t2 * t
+    dy = y1 - y0
+    values = (
+        y0
+        + (3.0 * t2 - 2.0 * t3) * dy
+        + (t3 - 2.0 * t2 + t) * h * m0
+        + (t3 - t2) * h * m1
+    )
+    derivatives = (
+        (6.0 * t - 6.0 * t2) * dy / h
+        + (3.0 * t2 - 4.0 * t + 1.0) * m0
+        + (3.0 * t2 - 2.0 * t) * m1
+    )
+    return values, derivatives
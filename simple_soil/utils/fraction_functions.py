@@ -2,8 +2,14 @@ from typing import Union
 
 import numpy as np
 
-from .array_utils import array_check
-from .smoothing import quadratic_smoother
+from .array_utils import array_check, is_scalar
+from .smoothing import quadratic_smoother, quadratic_smoother_derivative
+
+
+def _scalar_limits(theta0: float, theta1: float) -> bool:
+    return not (
+        isinstance(theta0, np.ndarray) or isinstance(theta1, np.ndarray)
+    )
 
 
 def _relative_fraction(
@@ -11,17 +17,37 @@ def _relative_fraction(
     theta0: float = 0.0,
     theta1: float = 1.0,
 ) -> np.ndarray:
+    if (
+        isinstance(water_content, float) or is_scalar(water_content)
+    ) and _scalar_limits(theta0, theta1):
+        water_content = float(water_content)
+        if water_content > theta1:
+            return 1.0
+        elif water_content < theta0:
+            return 0.0
+        return (water_content - theta0) / (theta1 - theta0)
     water_content = array_check(water_content)
-    fraction = np.where(
-        water_content < theta0,
-        0.0,
-        (water_content - theta0) / (theta1 - theta0),
-    )
-    return np.where(
-        water_content > theta1,
-        1.0,
-        fraction,
+    fraction = (water_content - theta0) / (theta1 - theta0)
+    return np.clip(fraction, 0.0, 1.0, out=fraction)
+
+
+def _smoothed_fraction(
+    water_content: Union[float, np.ndarray],
+    theta0: float,
+    theta1: float,
+    smoothing_omega: float = 1e-6,
+) -> np.ndarray:
+    fraction = _relative_fraction(
+        water_content,
+        theta0=theta0,
+        theta1=theta1,
     )
+    if isinstance(fraction, np.ndarray):
+        # smooth the relative fraction temporary in place
+        return quadratic_smoother(
+            fraction, omega=smoothing_omega, out=fraction
+        )
+    return quadratic_smoother(fraction, omega=smoothing_omega)
 
 
 def saturation_fraction(
@@ -29,13 +55,11 @@ def saturation_fraction(
     theta_sat: float,
     smoothing_omega: float = 1e-6,
 ) -> float:
-    return quadratic_smoother(
-        _relative_fraction(
-            water_content,
-            theta0=0.0,
-            theta1=theta_sat,
-        ),
-        omega=smoothing_omega,
+    return _smoothed_fraction(
+        water_content,
+        0.0,
+        theta_sat,
+        smoothing_omega=smoothing_omega,
     )
 
 
@@ -45,13 +69,11 @@ def groundwater_recharge_fraction(
     theta_fc: float,
     smoothing_omega: float = 1e-6,
 ) -> float:
-    return quadratic_smoother(
-        _relative_fraction(
-            water_content,
-            theta0=theta_fc,
-            theta1=theta_sat,
-        ),
-        omega=smoothing_omega,
+    return _smoothed_fraction(
+        water_content,
+        theta_fc,
+        theta_sat,
+        smoothing_omega=smoothing_omega,
     )
 
 
@@ -61,13 +83,11 @@ def surface_discharge_fraction(
     theta_discharge: float,
     smoothing_omega: float = 1e-6,
 ) -> float:
-    return quadratic_smoother(
-        _relative_fraction(
-            water_content,
-            theta0=theta_discharge,
-            theta1=theta_sat,
-        ),
-        omega=smoothing_omega,
+    return _smoothed_fraction(
+        water_content,
+        theta_discharge,
+        theta_sat,
+        smoothing_omega=smoothing_omega,
     )
 
 
@@ -91,13 +111,11 @@ def lateral_discharge_fraction(
     theta_fc: float,
     smoothing_omega: float = 1e-6,
 ) -> float:
-    return quadratic_smoother(
-        _relative_fraction(
-            water_content,
-            theta0=theta_fc,
-            theta1=theta_sat,
-        ),
-        omega=smoothing_omega,
+    return _smoothed_fraction(
+        water_content,
+        theta_fc,
+        theta_sat,
+        smoothing_omega=smoothing_omega,
     )
 
 
@@ -107,11 +125,131 @@ def pet_fraction(
     theta_wp: float,
     smoothing_omega: float = 1e-6,
 ) -> float:
-    return quadratic_smoother(
+    return _smoothed_fraction(
+        water_content,
+        theta_wp,
+        theta_pet_max,
+        smoothing_omega=smoothing_omega,
+    )
+
+
+def _relative_fraction_derivative(
+    water_content: Union[float, np.ndarray],
+    theta0: float = 0.0,
+    theta1: float = 1.0,
+) -> np.ndarray:
+    if (
+        isinstance(water_content, float) or is_scalar(water_content)
+    ) and _scalar_limits(theta0, theta1):
+        if water_content < theta0 or water_content > theta1:
+            return 0.0
+        return 1.0 / (theta1 - theta0)
+    water_content = array_check(water_content)
+    return np.where(
+        np.logical_or(water_content < theta0, water_content > theta1),
+        0.0,
+        1.0 / (theta1 - theta0),
+    )
+
+
+def _smoothed_fraction_derivative(
+    water_content: Union[float, np.ndarray],
+    theta0: float,
+    theta1: float,
+    smoothing_omega: float = 1e-6,
+) -> np.ndarray:
+    return quadratic_smoother_derivative(
         _relative_fraction(
             water_content,
-            theta0=theta_wp,
-            theta1=theta_pet_max,
+            theta0=theta0,
+            theta1=theta1,
         ),
         omega=smoothing_omega,
+    ) * _relative_fraction_derivative(
+        water_content,
+        theta0=theta0,
+        theta1=theta1,
+    )
+
+
+def saturation_fraction_derivative(
+    water_content: Union[float, np.ndarray],
+    theta_sat: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    return _smoothed_fraction_derivative(
+        water_content,
+        0.0,
+        theta_sat,
+        smoothing_omega=smoothing_omega,
+    )
+
+
+def groundwater_recharge_fraction_derivative(
+    water_content: Union[float, np.ndarray],
+    theta_sat: float,
+    theta_fc: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    return _smoothed_fraction_derivative(
+        water_content,
+        theta_fc,
+        theta_sat,
+        smoothing_omega=smoothing_omega,
+    )
+
+
+def surface_discharge_fraction_derivative(
+    water_content: Union[float, np.ndarray],
+    theta_sat: float,
+    theta_discharge: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    return _smoothed_fraction_derivative(
+        water_content,
+        theta_discharge,
+        theta_sat,
+        smoothing_omega=smoothing_omega,
+    )
+
+
+def surface_infiltration_fraction_derivative(
+    water_content: Union[float, np.ndarray],
+    theta_sat: float,
+    theta_discharge: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    return -surface_discharge_fraction_derivative(
+        water_content,
+        theta_sat,
+        theta_discharge,
+        smoothing_omega=smoothing_omega,
+    )
+
+
+def lateral_discharge_fraction_derivative(
+    water_content: Union[float, np.ndarray],
+    theta_sat: float,
+    theta_fc: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    return _smoothed_fraction_derivative(
+        water_content,
+        theta_fc,
+        theta_sat,
+        smoothing_omega=smoothing_omega,
+    )
+
+
+def pet_fraction_derivative(
+    water_content: Union[float, np.ndarray],
+    theta_pet_max: float,
+    theta_wp: float,
+    smoothing_omega: float = 1e-6,
+) -> float:
+    return _smoothed_fraction_derivative(
+        water_content,
+        theta_wp,
+        theta_pet_max,
+        smoothing_omega=smoothing_omega,
     )
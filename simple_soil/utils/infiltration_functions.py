@@ -1,23 +1,263 @@
+import copy
+import math
+from typing import Dict, Sequence, Tuple, Union
+
 import numpy as np
+import pandas as pd
+
+from .newton_raphson import newton_raphson, newton_raphson_array
+
+GREEN_AMPT_SOLVERS = ("newton", "explicit")
+
+# wetting front suction head - Rawls, Brakensiek, and Miller (1983)
+# values are in inches
+# (https://www.hec.usace.army.mil/confluence/hmsdocs/hmsguides/applying-loss-methods-within-hec-hms/applying-the-green-and-ampt-loss-method}
+GREEN_AMPT_SUCTION_HEAD = {
+    "sand": 1.9,
+    "loamy sand": 2.4,
+    "sandy loam": 4.3,
+    "loam": 3.5,
+    "silt loam": 6.6,
+    "sandy clay loam": 8.6,
+    "clay Loam": 8.2,
+    "silty clay loam": 10.7,
+    "sandy clay": 9.4,
+    "silty clay": 11.5,
+    "clay": 12.5,
+}
+
+# conversion factors from inches to suction head length units
+_SUCTION_HEAD_CONVERSION = {
+    "m": 2.54 / 100.0,
+    "cm": 2.54,
+    "ft": 1.0 / 12.0,
+    "in": 1.0,
+}
+
+# the branch point series is used without refinement below this value
+# of p = sqrt(2 K_sat t / v), where its truncation error is below 1e-14
+_SERIES_LIMIT = 1.0e-2
+# number of Halley iterations applied to the initial estimate
+_HALLEY_ITERATIONS = 3
+
+
+def _branch_point_series(p):
+    return p * (
+        1.0
+        + p * (1.0 / 3.0 + p * (1.0 / 36.0 + p * (-1.0 / 270.0 + p / 4320.0)))
+    )
+
+
+def _scaled_infiltration_scalar(a: float) -> float:
+    if not a > 0.0:
+        return 0.0
+    p = math.sqrt(2.0 * a)
+    if p <= _SERIES_LIMIT:
+        return _branch_point_series(p)
+    if a < 2.0:
+        x = _branch_point_series(p)
+    else:
+        x = a + math.log1p(a)
+    for _ in range(_HALLEY_ITERATIONS):
+        g = x - math.log1p(x) - a
+        dg = x / (1.0 + x)
+        d2g = 1.0 / ((1.0 + x) * (1.0 + x))
+        x -= 2.0 * g * dg / (2.0 * dg * dg - g * d2g)
+    return x
+
+
+def _scaled_infiltration(a: np.ndarray) -> np.ndarray:
+    p = np.sqrt(np.maximum(2.0 * a, 0.0))
+    series = _branch_point_series(p)
+    x = np.where(a < 2.0, series, a + np.log1p(np.maximum(a, 0.0)))
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(_HALLEY_ITERATIONS):
+            g = x - np.log1p(x) - a
+            dg = x / (1.0 + x)
+            d2g = 1.0 / ((1.0 + x) * (1.0 + x))
+            x -= 2.0 * g * dg / (2.0 * dg * dg - g * d2g)
+    return np.where(p <= _SERIES_LIMIT, series, x)
+
 
-from .newton_raphson import newton_raphson
+def green_ampt_cumulative_infiltration(
+    K_t: Union[float, np.ndarray],
+    v: Union[float, np.ndarray],
+) -> Union[float, np.ndarray]:
+    """
+    Explicit solution of the Green-Ampt equation
+
+        F - v ln(1 + F / v) = K_sat t
+
+    for the cumulative infiltration F. The closed form solution is
+    F = -v (1 + W_{-1}(-exp(-1 - K_sat t / v))), where W_{-1} is the
+    lower branch of the Lambert W function. It is evaluated with a
+    series expansion about the branch point (small K_sat t / v) or the
+    asymptotic expansion (large K_sat t / v) refined with a fixed
+    number of Halley iterations, which is accurate to about 1e-14
+    relative error for all K_sat t / v.
+
+    Parameters
+    ----------
+    K_t : float or numpy.ndarray
+        Product of the saturated hydraulic conductivity and the
+        infiltration time (K_sat t).
+    v : float or numpy.ndarray
+        Product of the wetting front suction head and the soil moisture
+        deficit (|psi| delta_theta). F is K_t if v is zero.
+
+    Returns
+    -------
+    F: float or numpy.ndarray
+        Cumulative infiltration.
+    """
+    if isinstance(K_t, np.ndarray) or isinstance(v, np.ndarray):
+        K_t = np.asarray(K_t, dtype=float)
+        v = np.asarray(v, dtype=float)
+        dry = v <= 0.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = _scaled_infiltration(np.where(dry, 0.0, K_t / v))
+        return np.where(dry, K_t, v * x)
+    if v <= 0.0:
+        return K_t
+    return v * _scaled_infiltration_scalar(K_t / v)
+
+
+def green_ampt_soil_codes(soil: Sequence[str]) -> np.ndarray:
+    """
+    Convert soil texture names to categorical codes (the position of
+    each soil texture in GREEN_AMPT_SUCTION_HEAD, or -1 for names that
+    are not valid soil textures).
+    """
+    return pd.Index(list(GREEN_AMPT_SUCTION_HEAD)).get_indexer(
+        np.asarray(soil, dtype=object).ravel()
+    )
+
+
+def green_ampt_suction_head(
+    soil: Union[str, Sequence[str]],
+    length_units: str = "m",
+) -> Union[float, np.ndarray]:
+    """
+    Wetting front suction head for one or more soil textures.
+
+    Soil texture names are converted to categorical codes and the
+    suction heads of every texture are gathered from an array of the
+    suction heads in GREEN_AMPT_SUCTION_HEAD in a single lookup.
+
+    Parameters
+    ----------
+    soil : str or list of str
+        Soil texture name(s).
+    length_units : str (default "m")
+        Length units of the suction head.
+
+    Returns
+    -------
+    psi: float or numpy.ndarray
+        Wetting front suction head for each soil texture.
+    """
+    conversion_factor = _SUCTION_HEAD_CONVERSION[length_units]
+    if isinstance(soil, str):
+        if soil not in GREEN_AMPT_SUCTION_HEAD:
+            raise ValueError(
+                f"Invalid soil type ({soil}). Valid soil types are "
+                + f"'{', '.join(GREEN_AMPT_SUCTION_HEAD)}'"
+            )
+        return GREEN_AMPT_SUCTION_HEAD[soil] * conversion_factor
+
+    codes = green_ampt_soil_codes(soil)
+    if np.any(codes < 0):
+        invalid = np.unique(
+            np.asarray(soil, dtype=object).ravel()[codes < 0].astype(str)
+        )
+        raise ValueError(
+            f"Invalid soil type(s) ({', '.join(invalid)}). Valid soil "
+            + f"types are '{', '.join(GREEN_AMPT_SUCTION_HEAD)}'"
+        )
+    suction_heads = np.fromiter(GREEN_AMPT_SUCTION_HEAD.values(), dtype=float)
+    return suction_heads[codes] * conversion_factor
 
 
 class Infiltration:
+    # attributes that are updated by infiltration
+    state_variables = ()
+
     def __init__(
         self,
         K_sat: float,
     ) -> None:
         self.K_sat = K_sat
         self.infiltration_time = None
+        self.clear_cache()
+
+    def get_state(self) -> Dict[str, object]:
+        """
+        Get a copy of the infiltration time and state variables.
+        """
+        state = {"infiltration_time": self.infiltration_time}
+        for key in self.state_variables:
+            state[key] = copy.copy(getattr(self, key))
+        return state
+
+    def set_state(self, state: Dict[str, object]) -> None:
+        """
+        Restore the infiltration time and state variables returned by
+        get_state.
+        """
+        for key, value in state.items():
+            setattr(self, key, copy.copy(value))
+        self.clear_cache()
 
     def set_infiltration_time(
         self,
         infiltration_time: float,
     ) -> None:
         self.infiltration_time = infiltration_time
+        self.clear_cache()
+
+    def clear_cache(self) -> None:
+        self._cache_key = None
+        self._cache_value = None
+
+    def _is_cached(self, rate, theta0) -> bool:
+        # arrays are compared by identity, the cache is cleared each
+        # time the infiltration time is set at the start of a time step
+        if self._cache_key is None:
+            return False
+        for value, cached in zip((rate, theta0), self._cache_key):
+            if value is cached:
+                continue
+            if isinstance(value, np.ndarray) or isinstance(cached, np.ndarray):
+                return False
+            if value != cached:
+                return False
+        return True
+
+    def infiltration(
+        self,
+        rate: float,
+        theta: float,
+        theta0: float,
+    ) -> float:
+        """
+        Infiltration rate for the time step.
+
+        The infiltration rate only depends on the rate, the water content
+        at the start of the time step (theta0), and the infiltration
+        time, so it is calculated once per time step and reused for
+        repeated residual and derivative evaluations.
+        """
+        if not self._is_cached(rate, theta0):
+            self._cache_value = self._infiltration(rate, theta, theta0)
+            self._cache_key = (rate, theta0)
+        return self._cache_value
 
-    def infiltration(self, rate: float, theta: float) -> float:
+    def _infiltration(
+        self,
+        rate: float,
+        theta: float,
+        theta0: float,
+    ) -> float:
         raise NotImplementedError("do not use base Infiltration class")
 
 
@@ -34,10 +274,22 @@ class InfiltrationConstantLoss(Infiltration):
         theta: float,
         theta0: float,
     ):
+        # not cached, the cache lookup is more expensive than the minimum
+        if isinstance(rate, np.ndarray) or isinstance(self.K_sat, np.ndarray):
+            return np.minimum(rate, self.K_sat)
         return min(rate, self.K_sat)
 
 
 class GreenAmpt(Infiltration):
+    # attributes that are updated by infiltration
+    state_variables = (
+        "F_t",
+        "f_t",
+        "delta_theta",
+        "iterations",
+        "error",
+    )
+
     def __init__(
         self,
         theta_sat: float,
@@ -45,11 +297,21 @@ class GreenAmpt(Infiltration):
         length_units: str,
         soil: str = "sand",
         delta_F: float = 1.0e-4,
+        solver: str = "newton",
     ):
         super().__init__(K_sat)
 
         if soil is None:
             soil = "sand"
+        if solver is None:
+            solver = "newton"
+        solver = solver.lower()
+        if solver not in GREEN_AMPT_SOLVERS:
+            raise ValueError(
+                f"Invalid Green-Ampt solver ({solver}). Valid solvers are "
+                + f"'{', '.join(GREEN_AMPT_SOLVERS)}'"
+            )
+        self.solver = solver
 
         self.theta_sat = theta_sat
         self.length_units = length_units
@@ -67,41 +329,18 @@ class GreenAmpt(Infiltration):
 
         self.iterations = 0
         self.error = 0.0
+        # iterations summed over every solve, which is not restored by
+        # set_state
+        self.total_iterations = 0
 
     def _set_green_ampt_suction_head(self, soil: str) -> None:
-        # wetting front suction head - Rawls, Brakensiek, and Miller (1983)
-        # values are in inches
-        # (https://www.hec.usace.army.mil/confluence/hmsdocs/hmsguides/applying-loss-methods-within-hec-hms/applying-the-green-and-ampt-loss-method}
-        suction_head_dict = {
-            "sand": 1.9,
-            "loamy sand": 2.4,
-            "sandy loam": 4.3,
-            "loam": 3.5,
-            "silt loam": 6.6,
-            "sandy clay loam": 8.6,
-            "clay Loam": 8.2,
-            "silty clay loam": 10.7,
-            "sandy clay": 9.4,
-            "silty clay": 11.5,
-            "clay": 12.5,
-        }
-        if soil not in list(suction_head_dict.keys()):
+        if not isinstance(soil, str):
             raise ValueError(
-                f"Invalid soil type ({soil}). Valid soil types are "
-                + f"'{', '.join(list(suction_head_dict.keys()))}'"
+                f"soil ({soil}) must be a single soil type. Use "
+                + "GreenAmptArray for a soil type for each cell."
             )
-
-        if self.length_units == "m":
-            conversion_factor = 2.54 / 100.0
-        elif self.length_units == "cm":
-            conversion_factor = 2.54
-        elif self.length_units == "ft":
-            conversion_factor = 1.0 / 12.0
-        elif self.length_units == "in":
-            conversion_factor = 1.0
-
         self.soil = soil
-        self.psi = suction_head_dict[soil] * conversion_factor
+        self.psi = green_ampt_suction_head(soil, self.length_units)
 
     def _green_ampt_residual(self, F: float):
         v = abs(self.psi) * self.delta_theta
@@ -116,7 +355,8 @@ class GreenAmpt(Infiltration):
         ) / self.delta_F
 
     def _green_ampt_infiltration(self):
-        v = abs(self.psi) * self.delta_theta
+        # infiltration is at K_sat without a storage deficit
+        v = max(abs(self.psi) * self.delta_theta, 0.0)
         if self.F_t == 0.0:
             f = 0.0
         else:
@@ -124,7 +364,7 @@ class GreenAmpt(Infiltration):
         self.f_t = f
         return f
 
-    def infiltration(
+    def _infiltration(
         self,
         rate: float,
         theta: float,
@@ -133,13 +373,145 @@ class GreenAmpt(Infiltration):
         self.theta = theta
         self.theta0 = theta0
         self.delta_theta = self.theta_sat - self.theta0
-        iterations, F, residual, converged = newton_raphson(
-            self._green_ampt_residual,
-            self._green_ampt_derivative,
-            self.F_t,
-        )
+        if self.solver == "explicit":
+            v = abs(self.psi) * self.delta_theta
+            F = green_ampt_cumulative_infiltration(
+                self.K_sat * self.infiltration_time, v
+            )
+            iterations = 0
+            residual = self._green_ampt_residual(F) if v > 0.0 else 0.0
+        else:
+            iterations, F, residual, converged = newton_raphson(
+                self._green_ampt_residual,
+                self._green_ampt_derivative,
+                self.F_t,
+            )
         self.F_t = F
         self.iterations = iterations
+        self.total_iterations += iterations
         self.error = residual
         self.f_t = self._green_ampt_infiltration()
         return min(self.f_t, rate)
+
+
+class GreenAmptArray(GreenAmpt):
+    """
+    Green-Ampt infiltration for a set of independent cells.
+
+    Cumulative infiltration is stored as arrays and the Green-Ampt
+    equation is solved for every cell in a single vectorized
+    Newton-Raphson iteration using the analytic derivative of the
+    residual (1 - v / (v + F)).
+
+    Parameters are identical to GreenAmpt. theta_sat and K_sat can be
+    scalars or one-dimensional arrays with a value for each cell and
+    soil can be a soil type or a list with a soil type for each cell.
+    """
+
+    def __init__(
+        self,
+        theta_sat: np.ndarray,
+        K_sat: np.ndarray,
+        length_units: str,
+        soil: str = "sand",
+        delta_F: float = 1.0e-4,
+        solver: str = "newton",
+    ):
+        super().__init__(
+            theta_sat,
+            K_sat,
+            length_units,
+            soil=soil,
+            delta_F=delta_F,
+            solver=solver,
+        )
+        theta_sat = np.asarray(theta_sat, dtype=float)
+        K_sat = np.asarray(K_sat, dtype=float)
+        shape = np.broadcast_shapes(
+            theta_sat.shape, K_sat.shape, np.shape(self.psi)
+        )
+        self.theta_sat = np.array(np.broadcast_to(theta_sat, shape))
+        self.K_sat = np.array(np.broadcast_to(K_sat, shape))
+        if isinstance(self.psi, np.ndarray):
+            self.psi = np.array(np.broadcast_to(self.psi, shape))
+
+        self.F_t = np.zeros(shape, dtype=float)
+        self.f_t = np.zeros(shape, dtype=float)
+        self.theta = np.zeros(shape, dtype=float)
+        self.theta0 = np.zeros(shape, dtype=float)
+        self.delta_theta = np.zeros(shape, dtype=float)
+        self.iterations = np.zeros(shape, dtype=int)
+        self.error = np.zeros(shape, dtype=float)
+
+        self._v = np.ones(shape, dtype=float)
+        self._Kt = np.zeros(shape, dtype=float)
+
+    def _set_green_ampt_suction_head(
+        self,
+        soil: Union[str, Sequence[str]],
+    ) -> None:
+        # soil can be a soil type or a soil type for each cell
+        if not isinstance(soil, str):
+            soil = np.asarray(soil, dtype=object)
+        self.soil = soil
+        self.psi = green_ampt_suction_head(soil, self.length_units)
+
+    def _green_ampt_residual_and_derivative(
+        self,
+        F: np.ndarray,
+        index: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        v = self._v[index]
+        residual = F - v * np.log(1.0 + F / v) - self._Kt[index]
+        return residual, 1.0 - v / (v + F)
+
+    def _infiltration(
+        self,
+        rate: np.ndarray,
+        theta: np.ndarray,
+        theta0: np.ndarray,
+    ) -> np.ndarray:
+        self.theta = theta
+        self.theta0 = theta0
+        self.delta_theta = self.theta_sat - theta0
+        v = abs(self.psi) * self.delta_theta
+        Kt = np.array(
+            np.broadcast_to(self.K_sat * self.infiltration_time, v.shape)
+        )
+
+        # cells without storage deficit infiltrate at K_sat (v = 0)
+        dry = v <= 0.0
+        self._v = np.where(dry, 1.0, v)
+        self._Kt = Kt
+
+        if self.solver == "explicit":
+            F = green_ampt_cumulative_infiltration(Kt, v)
+            iterations = np.zeros(F.shape, dtype=int)
+            residual, _ = self._green_ampt_residual_and_derivative(
+                F, slice(None)
+            )
+        else:
+            # F >= K_sat * t, which also avoids a zero derivative at F = 0
+            iterations, F, residual, converged = newton_raphson_array(
+                self._green_ampt_residual_and_derivative,
+                None,
+                np.maximum(self.F_t, Kt),
+                subset=True,
+            )
+        F[dry] = Kt[dry]
+        residual[dry] = 0.0
+        self.F_t = F
+        self.iterations = iterations
+        self.total_iterations += int(iterations.sum())
+        self.error = residual
+        self.f_t = self._green_ampt_infiltration()
+        return np.minimum(self.f_t, rate)
+
+    def _green_ampt_infiltration(self) -> np.ndarray:
+        v = np.maximum(abs(self.psi) * self.delta_theta, 0.0)
+        f = np.zeros(self.F_t.shape, dtype=float)
+        np.divide(v, self.F_t, out=f, where=self.F_t != 0.0)
+        f += 1.0
+        f *= self.K_sat
+        f[self.F_t == 0.0] = 0.0
+        return f
@@ -0,0 +1,171 @@
+from time import perf_counter
+from typing import TYPE_CHECKING, Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .output_buffer import OutputBuffer
+
+if TYPE_CHECKING:
+    from ..base.control_volume import ControlVolume
+
+INSTRUMENTATION_VARIABLES = (
+    "total time",
+    "advance_s",
+    "solve_s",
+    "output_s",
+    "residual_calls",
+    "derivative_calls",
+    "newton_iterations",
+    "infiltration_iterations",
+    "nonconverged",
+)
+
+
+class SolverInstrumentation:
+    """
+    Per-step solver counters and timings for a control volume.
+
+    Instrumentation is enabled with ControlVolume(instrument=True). The
+    control volume then updates through SolverInstrumentation.update,
+    which times the advance, solve, and output phases of each step and
+    counts the residual and derivative evaluations made by the
+    Newton-Raphson solver. Control volumes without instrumentation are
+    not affected. For a ControlVolumeArray, iterations and
+    nonconverged cells are summed over the cells.
+
+    The step values are
+
+    advance_s, solve_s, output_s
+        Wall time of each phase, in seconds.
+    residual_calls, derivative_calls
+        Number of residual and derivative evaluations. Evaluations of
+        the residual and its analytic derivative in a single call are
+        counted as both.
+    newton_iterations
+        Number of Newton-Raphson iterations.
+    infiltration_iterations
+        Number of iterations used to solve the Green-Ampt cumulative
+        infiltration, summed over the solves made during the step
+        (zero for constant loss infiltration).
+    nonconverged
+        Number of cells that did not converge.
+    """
+
+    def __init__(self) -> None:
+        self._steps = OutputBuffer(INSTRUMENTATION_VARIABLES)
+        self._residual_calls = 0
+        self._derivative_calls = 0
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def wrap(
+        self,
+        f: Callable,
+        df: Callable,
+    ) -> Tuple[Callable, Callable]:
+        """
+        Wrap the Newton-Raphson functions with evaluation counters.
+
+        Parameters
+        ----------
+        f : function
+            Residual function (or residual and derivative function if
+            df is None).
+        df : function or None
+            Derivative function.
+
+        Returns
+        -------
+        f, df : function
+            Counting versions of f and df.
+        """
+
+        def counted_f(*args):
+            self._residual_calls += 1
+            if df is None:
+                self._derivative_calls += 1
+            return f(*args)
+
+        if df is None:
+            return counted_f, None
+
+        def counted_df(*args):
+            self._derivative_calls += 1
+            return df(*args)
+
+        return counted_f, counted_df
+
+    def update(
+        self,
+        volume: "ControlVolume",
+        inflow_rate: float,
+        pet_rate: float,
+        delta_t: float,
+    ) -> None:
+        """
+        Update the control volume for a time step and record the step.
+        """
+        self._residual_calls = 0
+        self._derivative_calls = 0
+
+        start = perf_counter()
+        volume.advance(
+            inflow_rate=inflow_rate,
+            pet_rate=pet_rate,
+            delta_t=delta_t,
+        )
+        advance_time = perf_counter()
+        # infiltration iterations made during this step, including every
+        # sub-step of an adaptive step
+        infiltration = volume.infiltration_method
+        infiltration_iterations = getattr(infiltration, "total_iterations", 0)
+        volume.solve()
+        infiltration_iterations = (
+            getattr(infiltration, "total_iterations", 0)
+            - infiltration_iterations
+        )
+        solve_time = perf_counter()
+        volume.output()
+        output_time = perf_counter()
+
+        self._steps.append(
+            [
+                volume.total_time,
+                advance_time - start,
+                solve_time - advance_time,
+                output_time - solve_time,
+                self._residual_calls,
+                self._derivative_calls,
+                np.sum(volume.iterations),
+                infiltration_iterations,
+                np.sum(np.logical_not(volume.converged)),
+            ]
+        )
+
+    def get_dataframe(self) -> pd.DataFrame:
+        """
+        Get the counters and timings of each step, indexed by the total
+        time at the end of the step.
+        """
+        return self._steps.get_dataframe(index="total time").copy()
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Get the total, mean, and maximum of each counter and timing
+        over all of the steps.
+        """
+        df = self.get_dataframe()
+        summary = pd.DataFrame(
+            {
+                "total": df.sum(),
+                "mean": df.mean(),
+                "max": df.max(),
+            }
+        )
+        summary.index.name = f"{len(df)} steps"
+        return summary
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        return self._steps.to_dict()
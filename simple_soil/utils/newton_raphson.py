@@ -1,5 +1,7 @@
 from typing import Callable, Tuple
 
+import numpy as np
+
 
 def newton_raphson(
     f: Callable,
@@ -15,8 +17,9 @@ def newton_raphson(
     ----------
     f : function
         The function whose root needs to be found.
-    df : function
-        The derivative of the function.
+    df : function or None
+        The derivative of the function. If None, f returns a tuple with
+        the function value and the derivative of the function.
     x0 : float
         Initial guess.
     tol: float (default: 1e-6)
@@ -38,12 +41,350 @@ def newton_raphson(
     x = x0
     iteration = 0
 
-    while abs(f(x)) > tol and iteration < max_iter:
+    if df is None:
+        residual, derivative = f(x)
+    else:
+        residual = f(x)
+    while abs(residual) > tol and iteration < max_iter:
+        if df is not None:
+            derivative = df(x)
+        x = x - residual / derivative
+        if df is None:
+            residual, derivative = f(x)
+        else:
+            residual = f(x)
+        iteration += 1
+
+    converged = not abs(residual) > tol
+
+    return iteration, x, residual, converged
+
+
+def newton_raphson_array(
+    f: Callable,
+    df: Callable,
+    x0: np.ndarray,
+    tol: float = 1e-6,
+    max_iter: int = 100,
+    subset: bool = False,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Performs the Newton-Raphson method to find the roots of a set of
+    independent scalar functions.
+
+    Entries that have converged are frozen and only the remaining
+    active entries are updated in subsequent iterations.
+
+    Parameters
+    ----------
+    f : function
+        The vectorized function whose roots need to be found.
+    df : function or None
+        The vectorized derivative of the function. If None, f returns a
+        tuple with the function values and the derivatives of the
+        function.
+    x0 : numpy.ndarray
+        Initial guesses.
+    tol: float (default: 1e-6)
+        Tolerance for convergence.
+    max_iter: int (default 100)
+        Maximum number of iterations.
+    subset: bool (default False)
+        If True, f and df are only evaluated for the active entries and
+        are called as f(x[index], index), where index is an integer
+        array with the positions of the active entries. If False, f and
+        df are evaluated for all entries.
+
+    Returns
+    -------
+    iterations: numpy.ndarray
+        Number of iterations for each entry.
+    x: numpy.ndarray
+        Final estimated values
+    residual: numpy.ndarray
+        Final residuals
+    converged: numpy.ndarray
+        Boolean array indicating if each entry is converged.
+    """
+    x = np.array(x0, dtype=float, ndmin=1)
+    iterations = np.zeros(x.shape, dtype=int)
+
+    index = np.arange(x.shape[0])
+    if df is None:
+        if subset:
+            residual, derivative = f(x, index)
+        else:
+            residual, derivative = f(x)
+        derivative = np.array(derivative, dtype=float, ndmin=1)
+    else:
+        if subset:
+            residual = f(x, index)
+        else:
+            residual = f(x)
+    residual = np.array(residual, dtype=float, ndmin=1)
+    active = np.abs(residual) > tol
+
+    iteration = 0
+    while iteration < max_iter:
+        index = np.flatnonzero(active)
+        if index.shape[0] == 0:
+            break
+        if subset:
+            x_active = x[index]
+            if df is None:
+                x_active -= residual[index] / derivative[index]
+                x[index] = x_active
+                residual_active, derivative[index] = f(x_active, index)
+            else:
+                x_active -= residual[index] / df(x_active, index)
+                x[index] = x_active
+                residual_active = f(x_active, index)
+        else:
+            if df is None:
+                x[index] -= residual[index] / derivative[index]
+                values, derivative = f(x)
+                derivative = np.array(derivative, dtype=float, ndmin=1)
+            else:
+                x[index] -= residual[index] / df(x)[index]
+                values = f(x)
+            residual_active = np.array(values, dtype=float, ndmin=1)[index]
+        residual[index] = residual_active
+        iterations[index] += 1
+        active[index] = np.abs(residual_active) > tol
+        iteration += 1
+
+    converged = ~(np.abs(residual) > tol)
+
+    return iterations, x, residual, converged
+
+
+def newton_bisection(
+    f: Callable,
+    df: Callable,
+    x0: float,
+    lower: float,
+    upper: float,
+    tol: float = 1e-6,
+    max_iter: int = 100,
+    increasing: bool = True,
+) -> Tuple[int, float, float, bool]:
+    """
+    Performs a safeguarded Newton-Raphson method to find the root of a
+    monotone function in a bracket.
+
+    The bracket is narrowed with the sign of every residual. Newton steps
+    that leave the bracket or do not halve the step before last are
+    replaced with bisection steps, so the iterates never leave
+    [lower, upper] and the method always converges.
+
+    Parameters
+    ----------
+    f : function
+        The monotone function whose root needs to be found.
+    df : function or None
+        The derivative of the function. If None, f returns a tuple with
+        the function value and the derivative of the function.
+    x0 : float
+        Initial guess. Values outside of the bracket are moved to the
+        nearest bound.
+    lower : float
+        Lower bound of the root.
+    upper : float
+        Upper bound of the root.
+    tol: float (default: 1e-6)
+        Tolerance for convergence.
+    max_iter: int (default 100)
+        Maximum number of iterations.
+    increasing: bool (default True)
+        True if f is increasing and False if f is decreasing.
+
+    Returns
+    -------
+    iteration: int
+        Number of iterations.
+    x: float
+        Final estimated value
+    residual: float
+        Final residual
+    converged: bool
+        Boolean indicating if solution is converged.
+    """
+    x = min(max(x0, lower), upper)
+    iteration = 0
+
+    if df is None:
+        residual, derivative = f(x)
+    else:
         residual = f(x)
-        x = x - residual / df(x)
+    step = upper - lower
+    previous_step = step
+    while abs(residual) > tol and iteration < max_iter:
+        if (residual < 0.0) == increasing:
+            lower = x
+        else:
+            upper = x
+        if df is not None:
+            derivative = df(x)
+        previous_step, step = step, 0.5 * (upper - lower)
+        x_new = lower + step
+        if derivative != 0.0:
+            x_newton = x - residual / derivative
+            if lower < x_newton < upper and (
+                abs(x_newton - x) <= 0.5 * abs(previous_step)
+            ):
+                x_new = x_newton
+                step = x_newton - x
+        if x_new == x:
+            # the bracket is at the resolution of x
+            break
+        x = x_new
+        if df is None:
+            residual, derivative = f(x)
+        else:
+            residual = f(x)
         iteration += 1
 
-    residual = f(x)
     converged = not abs(residual) > tol
 
     return iteration, x, residual, converged
+
+
+def newton_bisection_array(
+    f: Callable,
+    df: Callable,
+    x0: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    tol: float = 1e-6,
+    max_iter: int = 100,
+    increasing: bool = True,
+    subset: bool = False,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Performs a safeguarded Newton-Raphson method to find the roots of a
+    set of independent monotone scalar functions in brackets.
+
+    The vectorized version of newton_bisection. Entries that have
+    converged are frozen and only the remaining active entries are
+    updated in subsequent iterations.
+
+    Parameters
+    ----------
+    f : function
+        The vectorized monotone function whose roots need to be found.
+    df : function or None
+        The vectorized derivative of the function. If None, f returns a
+        tuple with the function values and the derivatives of the
+        function.
+    x0 : numpy.ndarray
+        Initial guesses.
+    lower : float or numpy.ndarray
+        Lower bounds of the roots.
+    upper : float or numpy.ndarray
+        Upper bounds of the roots.
+    tol: float (default: 1e-6)
+        Tolerance for convergence.
+    max_iter: int (default 100)
+        Maximum number of iterations.
+    increasing: bool (default True)
+        True if f is increasing and False if f is decreasing.
+    subset: bool (default False)
+        If True, f and df are only evaluated for the active entries and
+        are called as f(x[index], index), where index is an integer
+        array with the positions of the active entries. If False, f and
+        df are evaluated for all entries.
+
+    Returns
+    -------
+    iterations: numpy.ndarray
+        Number of iterations for each entry.
+    x: numpy.ndarray
+        Final estimated values
+    residual: numpy.ndarray
+        Final residuals
+    converged: numpy.ndarray
+        Boolean array indicating if each entry is converged.
+    """
+    x = np.array(x0, dtype=float, ndmin=1)
+    lower = np.array(np.broadcast_to(lower, x.shape), dtype=float)
+    upper = np.array(np.broadcast_to(upper, x.shape), dtype=float)
+    np.clip(x, lower, upper, out=x)
+    iterations = np.zeros(x.shape, dtype=int)
+    derivative = np.zeros(x.shape, dtype=float)
+
+    def evaluate(index):
+        x_index = x[index] if subset else x
+        args = (x_index, index) if subset else (x_index,)
+        if df is None:
+            values, derivatives = f(*args)
+        else:
+            values, derivatives = f(*args), None
+        values = np.array(values, dtype=float, ndmin=1)
+        if not subset:
+            values = values[index]
+        if derivatives is not None:
+            derivatives = np.array(derivatives, dtype=float, ndmin=1)
+            derivative[index] = derivatives if subset else derivatives[index]
+        return values
+
+    def evaluate_derivative(index):
+        if subset:
+            values = df(x[index], index)
+        else:
+            values = np.array(df(x), dtype=float, ndmin=1)[index]
+        derivative[index] = values
+
+    index = np.arange(x.shape[0])
+    residual = evaluate(index)
+    step = upper - lower
+    previous_step = step.copy()
+    active = np.abs(residual) > tol
+
+    iteration = 0
+    while iteration < max_iter:
+        index = np.flatnonzero(active)
+        if index.shape[0] == 0:
+            break
+        x_active = x[index]
+        residual_active = residual[index]
+        below = (residual_active < 0.0) == increasing
+        lower[index] = np.where(below, x_active, lower[index])
+        upper[index] = np.where(below, upper[index], x_active)
+        if df is not None:
+            evaluate_derivative(index)
+        derivative_active = derivative[index]
+        lower_active = lower[index]
+        upper_active = upper[index]
+
+        previous_step[index] = step[index]
+        bisection = 0.5 * (upper_active - lower_active)
+        x_new = lower_active + bisection
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_newton = x_active - residual_active / derivative_active
+        newton = (
+            (derivative_active != 0.0)
+            & (lower_active < x_newton)
+            & (x_newton < upper_active)
+            & (
+                np.abs(x_newton - x_active)
+                <= 0.5 * np.abs(previous_step[index])
+            )
+        )
+        x_new = np.where(newton, x_newton, x_new)
+        step[index] = np.where(newton, x_newton - x_active, bisection)
+
+        # entries with a bracket at the resolution of x are frozen
+        moved = x_new != x_active
+        active[index[~moved]] = False
+        index = index[moved]
+        if index.shape[0] == 0:
+            break
+        x[index] = x_new[moved]
+        residual[index] = evaluate(index)
+        iterations[index] += 1
+        active[index] = np.abs(residual[index]) > tol
+        iteration += 1
+
+    converged = ~(np.abs(residual) > tol)
+
+    return iterations, x, residual, converged
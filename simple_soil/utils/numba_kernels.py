@@ -0,0 +1,354 @@
+"""
+Numba kernels for running control volumes with constant loss infiltration.
+
+The kernels are compiled nopython versions of the scalar smoothing,
+fraction, flow factor, volumetric rate, and Newton-Raphson functions
+that evaluate every term in the same order as the NumPy implementation.
+Numba is an optional dependency (pip install simple_soil[fast]); if it is
+not installed HAS_NUMBA is False and the kernels are not compiled.
+"""
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None
+
+__all__ = [
+    "HAS_NUMBA",
+    "KERNEL_OUTPUT_SIZE",
+    "run_kernel",
+]
+
+HAS_NUMBA = numba is not None
+
+# brooks-corey exponent used by flow_factor
+BC_EPSILON = 3.5
+
+# number of values stored for each step and cell by run_kernel, in the
+# order of the ControlVolume output variables after "total time"
+KERNEL_OUTPUT_SIZE = 11
+
+
+def _jit(function):
+    if HAS_NUMBA:
+        return numba.njit(cache=True)(function)
+    return function
+
+
+@_jit
+def _quadratic_smoother(saturation, omega):
+    a_omega = 1.0 / (1.0 - omega)
+    factor = a_omega / (2.0 * omega)
+    if saturation > 1.0:
+        return 1.0
+    elif saturation >= 1.0 - omega and saturation < 1.0:
+        return 1.0 - factor * ((1 - saturation) * (1 - saturation))
+    elif saturation >= omega and saturation < 1.0 - omega:
+        return a_omega * saturation + 0.5 * (1.0 - a_omega)
+    elif saturation > 0.0 and saturation < omega:
+        return factor * (saturation * saturation)
+    elif saturation < 0.0:
+        return 0.0
+    return saturation
+
+
+@_jit
+def _quadratic_smoother_derivative(saturation, omega):
+    a_omega = 1.0 / (1.0 - omega)
+    factor = a_omega / (2.0 * omega)
+    if saturation >= 1.0 - omega and saturation < 1.0:
+        return 2.0 * factor * (1.0 - saturation)
+    elif saturation >= omega and saturation < 1.0 - omega:
+        return a_omega
+    elif saturation > 0.0 and saturation < omega:
+        return 2.0 * factor * saturation
+    return 0.0
+
+
+@_jit
+def _relative_fraction(water_content, theta0, theta1):
+    if water_content > theta1:
+        return 1.0
+    elif water_content < theta0:
+        return 0.0
+    return (water_content - theta0) / (theta1 - theta0)
+
+
+@_jit
+def _smoothed_fraction(water_content, theta0, theta1, omega):
+    return _quadratic_smoother(
+        _relative_fraction(water_content, theta0, theta1), omega
+    )
+
+
+@_jit
+def _smoothed_fraction_derivative(water_content, theta0, theta1, omega):
+    if water_content < theta0 or water_content > theta1:
+        relative_derivative = 0.0
+    else:
+        relative_derivative = 1.0 / (theta1 - theta0)
+    return (
+        _quadratic_smoother_derivative(
+            _relative_fraction(water_content, theta0, theta1), omega
+        )
+        * relative_derivative
+    )
+
+
+@_jit
+def _flow_factor(water_content, flow_rate, theta_sat, theta_wp):
+    relative_content = (water_content - theta_wp) / (theta_sat - theta_wp)
+    relative_content = max(relative_content, 0.0)
+    return flow_rate * relative_content**BC_EPSILON
+
+
+@_jit
+def _flow_factor_derivative(water_content, flow_rate, theta_sat, theta_wp):
+    relative_content = (water_content - theta_wp) / (theta_sat - theta_wp)
+    relative_content = max(relative_content, 0.0)
+    return (
+        flow_rate
+        * BC_EPSILON
+        * relative_content ** (BC_EPSILON - 1.0)
+        / (theta_sat - theta_wp)
+    )
+
+
+@_jit
+def _drainage(
+    water_content,
+    theta_sat,
+    theta_fc,
+    theta_wp,
+    area,
+    thickness,
+    max_rate,
+    omega,
+):
+    # recharge and lateral discharge rates and derivatives
+    saturation = _smoothed_fraction(water_content, 0.0, theta_sat, omega)
+    gradient = thickness * saturation
+    gradient_derivative = thickness * _smoothed_fraction_derivative(
+        water_content, 0.0, theta_sat, omega
+    )
+    rate = _flow_factor(water_content, max_rate, theta_sat, theta_wp)
+    rate_derivative = _flow_factor_derivative(
+        water_content, max_rate, theta_sat, theta_wp
+    )
+    fraction = _smoothed_fraction(water_content, theta_fc, theta_sat, omega)
+    fraction_derivative = _smoothed_fraction_derivative(
+        water_content, theta_fc, theta_sat, omega
+    )
+    value = -area * fraction * rate * gradient
+    derivative = -area * (
+        fraction_derivative * rate * gradient
+        + fraction * rate_derivative * gradient
+        + fraction * rate * gradient_derivative
+    )
+    return value, derivative
+
+
+@_jit
+def _residual(
+    water_content,
+    saturation0,
+    infiltration_rate,
+    pet_rate,
+    delta_t,
+    area,
+    thickness,
+    theta_wp,
+    theta_fc,
+    theta_sat,
+    theta_pet_max,
+    theta_discharge,
+    max_vertical_rate,
+    max_horizontal_rate,
+    omega,
+    components,
+):
+    # fills components (inflow, surface, aet, lateral, recharge, storage
+    # change) and returns the residual and its derivative
+    discharge_fraction = _smoothed_fraction(
+        water_content, theta_discharge, theta_sat, omega
+    )
+    discharge_fraction_derivative = _smoothed_fraction_derivative(
+        water_content, theta_discharge, theta_sat, omega
+    )
+    inflow = area * (1.0 - discharge_fraction) * infiltration_rate
+    inflow_derivative = (
+        area * -discharge_fraction_derivative * infiltration_rate
+    )
+
+    aet = (
+        -area
+        * _smoothed_fraction(water_content, theta_wp, theta_pet_max, omega)
+        * pet_rate
+    )
+    aet_derivative = (
+        -area
+        * _smoothed_fraction_derivative(
+            water_content, theta_wp, theta_pet_max, omega
+        )
+        * pet_rate
+    )
+
+    lateral, lateral_derivative = _drainage(
+        water_content,
+        theta_sat,
+        theta_fc,
+        theta_wp,
+        area,
+        thickness,
+        max_horizontal_rate,
+        omega,
+    )
+    recharge, recharge_derivative = _drainage(
+        water_content,
+        theta_sat,
+        theta_fc,
+        theta_wp,
+        area,
+        thickness,
+        max_vertical_rate,
+        omega,
+    )
+
+    surface = -area * discharge_fraction * max_vertical_rate
+    surface_derivative = (
+        -area * discharge_fraction_derivative * max_vertical_rate
+    )
+
+    saturation = _smoothed_fraction(water_content, 0.0, theta_sat, omega)
+    storage_change = (
+        area * thickness * theta_sat * (saturation0 - saturation) / delta_t
+    )
+    storage_change_derivative = (
+        -area
+        * thickness
+        * theta_sat
+        * _smoothed_fraction_derivative(water_content, 0.0, theta_sat, omega)
+        / delta_t
+    )
+
+    components[0] = inflow
+    components[1] = surface
+    components[2] = aet
+    components[3] = lateral
+    components[4] = recharge
+    components[5] = storage_change
+    residual = inflow + aet + lateral + recharge + surface + storage_change
+    derivative = (
+        inflow_derivative
+        + aet_derivative
+        + lateral_derivative
+        + recharge_derivative
+        + surface_derivative
+        + storage_change_derivative
+    )
+    return residual, derivative
+
+
+@_jit
+def run_kernel(
+    theta,
+    area,
+    thickness,
+    theta_wp,
+    theta_fc,
+    theta_sat,
+    theta_pet_max,
+    theta_discharge,
+    max_vertical_rate,
+    max_horizontal_rate,
+    omega,
+    inflow_rate,
+    pet_rate,
+    delta_t,
+    tol,
+    max_iter,
+    out,
+):
+    """
+    Run control volumes with constant loss infiltration.
+
+    Parameters
+    ----------
+    theta : numpy.ndarray
+        Water content of each cell at the start of the run. Updated in
+        place with the water content at the end of the run.
+    area, thickness, theta_wp, theta_fc, theta_sat, theta_pet_max,
+    theta_discharge, max_vertical_rate, max_horizontal_rate :
+    numpy.ndarray
+        Control volume parameters for each cell.
+    omega : float
+        Smoothing omega.
+    inflow_rate, pet_rate : numpy.ndarray
+        Forcing rates with a shape of (number of steps, number of cells).
+    delta_t : float
+        Length of each time step.
+    tol : float
+        Newton-Raphson tolerance.
+    max_iter : int
+        Maximum number of Newton-Raphson iterations.
+    out : numpy.ndarray
+        Output with a shape of (KERNEL_OUTPUT_SIZE, number of steps,
+        number of cells) for iterations, theta, volume, rejected inflow,
+        inflow, surface, aet, lateral, recharge, storage change, and
+        residual.
+    """
+    nsteps, ncells = inflow_rate.shape
+    components = np.empty(6)
+    for cell in range(ncells):
+        x = theta[cell]
+        for step in range(nsteps):
+            saturation0 = _smoothed_fraction(x, 0.0, theta_sat[cell], omega)
+            rate = inflow_rate[step, cell]
+            if rate == 0.0:
+                infiltration_rate = 0.0
+            else:
+                infiltration_rate = min(rate, max_vertical_rate[cell])
+            args = (
+                saturation0,
+                infiltration_rate,
+                pet_rate[step, cell],
+                delta_t,
+                area[cell],
+                thickness[cell],
+                theta_wp[cell],
+                theta_fc[cell],
+                theta_sat[cell],
+                theta_pet_max[cell],
+                theta_discharge[cell],
+                max_vertical_rate[cell],
+                max_horizontal_rate[cell],
+                omega,
+                components,
+            )
+            residual, derivative = _residual(x, *args)
+            iteration = 0
+            while abs(residual) > tol and iteration < max_iter:
+                x = x - residual / derivative
+                residual, derivative = _residual(x, *args)
+                iteration += 1
+
+            inflow = components[0]
+            out[0, step, cell] = iteration
+            out[1, step, cell] = x
+            out[2, step, cell] = (
+                _smoothed_fraction(x, 0.0, theta_sat[cell], omega)
+                * theta_sat[cell]
+                * thickness[cell]
+                * area[cell]
+            )
+            out[3, step, cell] = area[cell] * rate - inflow
+            out[4, step, cell] = inflow
+            out[5, step, cell] = components[1]
+            out[6, step, cell] = components[2]
+            out[7, step, cell] = components[3]
+            out[8, step, cell] = components[4]
+            out[9, step, cell] = components[5]
+            out[10, step, cell] = residual
+        theta[cell] = x
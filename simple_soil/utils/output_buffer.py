@@ -0,0 +1,302 @@
+from typing import TYPE_CHECKING, Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from ..io.output_writer import OutputWriter
+
+
+# default number of steps in a chunk and maximum number of values for
+# each variable in a chunk of array output
+CHUNK_SIZE = 1024
+CHUNK_VALUES = 1 << 18
+
+
+class OutputBuffer:
+    """
+    Columnar float64 storage for time series output.
+
+    Values for every variable are stored in a single array with a shape
+    of (number of variables, capacity) or (number of variables,
+    capacity, number of cells). Storage is allocated when the first
+    step is appended (or when the buffer is created if nsteps is
+    specified) and grows by whole chunks of chunk_size steps, and by at
+    least half of the current capacity, if more steps are appended than
+    were allocated. If a writer is specified, the buffer holds at most
+    chunk_size steps and is flushed to the writer each time it is full,
+    so the memory used is independent of the number of steps. Pickled
+    buffers only include the steps that have been appended.
+
+    Parameters
+    ----------
+    names : list of str
+        Output variable names.
+    nsteps : int (default: None)
+        Number of steps to preallocate. If not specified, chunk_size
+        steps are allocated.
+    ncells : int (default: None)
+        Number of cells for array output. If not specified, a single
+        value is stored for each variable and step.
+    chunk_size: int (default: None)
+        Number of steps added each time the buffer grows. If not
+        specified, CHUNK_SIZE steps are used, limited to CHUNK_VALUES
+        values for each variable for array output.
+    writer : OutputWriter (default: None)
+        Writer that buffered steps are flushed to.
+    data : numpy.ndarray (default: None)
+        Preallocated storage, for example a view of shared memory, with
+        a shape of (number of variables, number of steps) or (number of
+        variables, number of steps, number of cells) that the steps are
+        stored in. The buffer cannot grow beyond the steps in data and
+        data cannot be used with a writer.
+    """
+
+    __slots__ = (
+        "names",
+        "ncells",
+        "chunk_size",
+        "writer",
+        "nsteps",
+        "_index",
+        "_data",
+        "_preallocated",
+    )
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        nsteps: int = None,
+        ncells: int = None,
+        chunk_size: int = None,
+        writer: "OutputWriter" = None,
+        data: np.ndarray = None,
+    ) -> None:
+        if chunk_size is None:
+            chunk_size = CHUNK_SIZE
+            if ncells is not None:
+                chunk_size = max(1, min(chunk_size, CHUNK_VALUES // ncells))
+        if chunk_size < 1:
+            raise ValueError(
+                f"chunk_size ({chunk_size}) must be greater than zero"
+            )
+        if nsteps is not None and nsteps < 0:
+            raise ValueError(
+                f"nsteps ({nsteps}) must be greater than or equal to zero"
+            )
+        self.names = list(names)
+        self.ncells = ncells
+        self.chunk_size = chunk_size
+        self.writer = writer
+        if writer is not None:
+            nsteps = None
+        self._index = {name: idx for idx, name in enumerate(self.names)}
+        self._preallocated = data is not None
+        if data is None:
+            data = np.empty(
+                self._shape(0 if nsteps is None else nsteps), dtype=float
+            )
+        elif writer is not None:
+            raise ValueError("data cannot be used with a writer")
+        elif data.ndim < 2 or data.shape != self._shape(data.shape[1]):
+            raise ValueError(
+                f"data shape {data.shape} does not match the number of "
+                + f"output variables ({len(self.names)}) and cells "
+                + f"({ncells})"
+            )
+        self._data = data
+        self.nsteps = 0
+
+    def __getstate__(self) -> tuple:
+        if self.writer is not None:
+            raise TypeError(
+                "output buffers with a writer cannot be pickled (close "
+                + "the output and read it with OutputReader)"
+            )
+        # the name index is rebuilt when the buffer is unpickled
+        return (
+            self.names,
+            self.ncells,
+            self.chunk_size,
+            self._data[:, : self.nsteps].copy(),
+        )
+
+    def __setstate__(self, state: tuple) -> None:
+        self.names, self.ncells, self.chunk_size, self._data = state
+        self.writer = None
+        self._index = {name: idx for idx, name in enumerate(self.names)}
+        self._preallocated = False
+        self.nsteps = self._data.shape[1]
+
+    def __len__(self) -> int:
+        return self.nsteps
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def _shape(self, capacity: int) -> tuple:
+        if self.ncells is None:
+            return (len(self.names), capacity)
+        return (len(self.names), capacity, self.ncells)
+
+    @property
+    def capacity(self) -> int:
+        return self._data.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def _grow(self, nsteps: int = 1) -> None:
+        # grow by whole chunks with room for at least nsteps more steps,
+        # and by at least half of the capacity so that repeated growth
+        # copies each step a bounded number of times
+        if self._preallocated:
+            raise ValueError(
+                f"preallocated output storage for {self.capacity} steps "
+                + "is full"
+            )
+        nchunks = -(-(self.nsteps + nsteps - self.capacity) // self.chunk_size)
+        capacity = self.capacity + max(
+            max(nchunks, 1) * self.chunk_size,
+            0 if self.writer is not None else self.capacity // 2,
+        )
+        data = np.empty(self._shape(capacity))
+        data[:, : self.nsteps] = self._data[:, : self.nsteps]
+        self._data = data
+
+    def append(self, values: Sequence) -> None:
+        """
+        Append one step of output.
+
+        Parameters
+        ----------
+        values : list
+            Values for each variable, in the order of names. Values
+            are scalars or, for array output, arrays with a value for
+            each cell.
+        """
+        if self.nsteps == self.capacity:
+            if self.writer is None or self.capacity == 0:
+                self._grow()
+            else:
+                self.flush()
+        if self.ncells is None:
+            self._data[:, self.nsteps] = values
+        else:
+            step = self._data[:, self.nsteps]
+            for idx, value in enumerate(values):
+                step[idx] = value
+        self.nsteps += 1
+
+    def extend(self, values: np.ndarray) -> None:
+        """
+        Append several steps of output.
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+            Values with a shape of (number of variables, number of
+            steps) or, for array output, (number of variables, number
+            of steps, number of cells).
+        """
+        values = np.asarray(values, dtype=float)
+        nsteps = values.shape[1]
+        if self.writer is None:
+            if self.nsteps + nsteps > self.capacity:
+                self._grow(nsteps)
+        elif self.capacity == 0 and nsteps > 0:
+            self._grow()
+        start = 0
+        while start < nsteps:
+            if self.nsteps == self.capacity:
+                self.flush()
+            count = min(nsteps - start, self.capacity - self.nsteps)
+            self._data[:, self.nsteps : self.nsteps + count] = values[
+                :, start : start + count
+            ]
+            self.nsteps += count
+            start += count
+
+    def clear(self) -> None:
+        self.nsteps = 0
+
+    def flush(self) -> None:
+        """
+        Write the buffered steps to the writer and clear the buffer.
+        """
+        if self.writer is None:
+            raise ValueError("output buffer does not have a writer")
+        self.writer.write(self._data[:, : self.nsteps])
+        self.clear()
+
+    def close(self) -> None:
+        """
+        Flush the buffered steps and close the writer.
+        """
+        if self.writer is not None and not self.writer.closed:
+            self.flush()
+            self.writer.close()
+
+    def _check_in_memory(self) -> None:
+        if self.writer is not None:
+            raise ValueError(
+                f"output is written to '{self.writer.path}' and is not "
+                + "held in memory. Read it with OutputReader."
+            )
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Get a read-only view of the values of a variable.
+        """
+        self._check_in_memory()
+        if name not in self._index:
+            raise ValueError(
+                f"Invalid output variable ({name}). Valid output "
+                + f"variables are '{', '.join(self.names)}'."
+            )
+        view = self._data[self._index[name], : self.nsteps]
+        view.flags.writeable = False
+        return view
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        return {name: self.column(name) for name in self.names}
+
+    def get_dataframe(self, index: str = None) -> pd.DataFrame:
+        """
+        Get the output as a DataFrame without copying the data.
+
+        The DataFrame shares memory with the buffer. It is only
+        available for output without cells.
+
+        Parameters
+        ----------
+        index : str (default: None)
+            Variable to use as the DataFrame index.
+        """
+        self._check_in_memory()
+        if self.ncells is not None:
+            raise ValueError("get_dataframe is not available for array output")
+        data = self._data[:, : self.nsteps]
+        names = self.names
+        df_index = None
+        if index is not None:
+            df_index = pd.Index(
+                self.column(index),
+                name=index,
+                copy=False,
+            )
+            idx = self._index[index]
+            if idx == 0:
+                data = data[1:]
+                names = names[1:]
+            else:
+                keep = [i for i in range(len(names)) if i != idx]
+                data = data[keep]
+                names = [names[i] for i in keep]
+        return pd.DataFrame(
+            data.T,
+            index=df_index,
+            columns=names,
+            copy=False,
+        )
@@ -1,9 +1,15 @@
+from typing import Tuple
+
 import numpy as np
 
-from .array_utils import array_check
+from .array_utils import array_check, is_scalar
 
 
-def quadratic_smoother(saturation: float, omega: float = None) -> float:
+def quadratic_smoother(
+    saturation: float,
+    omega: float = None,
+    out: np.ndarray = None,
+) -> float:
     if omega is None:
         omega = 1e-6
     else:
@@ -11,50 +17,139 @@ def quadratic_smoother(saturation: float, omega: float = None) -> float:
             raise ValueError(f"omega ({omega}) must be >= 0.")
         elif omega > 1.0:
             raise ValueError(f"omega ({omega}) must be <= 1.")
+    if isinstance(saturation, float) or is_scalar(saturation):
+        return _quadratic_smoother_scalar(float(saturation), omega)
     saturation = array_check(saturation)
 
     a_omega = 1.0 / (1.0 - omega)
     factor = a_omega / (2.0 * omega)
-    # saturation < 0
-    smoothed_saturation = np.where(saturation < 0.0, 0.0, saturation)
+    lower, middle, upper = _quadratic_regions(saturation, omega)
+
+    # each region is only evaluated for its own elements so out can be
+    # the saturation array
+    # saturation < 0 and saturation > 1
+    out = np.clip(saturation, 0.0, 1.0, out=out)
     # saturation < omega
-    smoothed_saturation = np.where(
-        np.logical_and(saturation > 0.0, saturation < omega),
-        factor * saturation**2.0,
-        smoothed_saturation,
-    )
+    np.multiply(saturation, saturation, out=out, where=lower)
+    np.multiply(out, factor, out=out, where=lower)
     # omega <= saturation < 1 - omega
-    smoothed_saturation = np.where(
-        np.logical_and(saturation >= omega, saturation < 1.0 - omega),
-        a_omega * saturation + 0.5 * (1.0 - a_omega),
-        smoothed_saturation,
-    )
+    np.multiply(saturation, a_omega, out=out, where=middle)
+    np.add(out, 0.5 * (1.0 - a_omega), out=out, where=middle)
     # 1 - omega <= saturation < 1
-    smoothed_saturation = np.where(
-        np.logical_and(saturation >= 1.0 - omega, saturation < 1.0),
-        1.0 - factor * (1 - saturation) ** 2.0,
-        smoothed_saturation,
-    )
-    # saturation > 1.
-    smoothed_saturation = np.where(saturation > 1.0, 1.0, smoothed_saturation)
+    np.subtract(1.0, saturation, out=out, where=upper)
+    np.multiply(out, out, out=out, where=upper)
+    np.multiply(out, factor, out=out, where=upper)
+    np.subtract(1.0, out, out=out, where=upper)
 
-    return smoothed_saturation
+    return out
 
 
-def pet_smoother(saturation: float) -> float:
+def pet_smoother(saturation: float, out: np.ndarray = None) -> float:
+    if isinstance(saturation, float) or is_scalar(saturation):
+        return _pet_smoother_scalar(float(saturation))
     saturation = array_check(saturation)
-    # saturation < 0
-    smoothed_saturation = np.where(saturation < 0.0, 0.0, saturation)
     # 0 <= saturation < 1
-    smoothed_saturation = np.where(
-        np.logical_and(saturation >= 0, saturation < 1.0),
-        -2.0 * saturation**3.0 + 3.0 * saturation**2.0,
-        smoothed_saturation,
+    middle = (saturation >= 0.0) & (saturation < 1.0)
+    middle_saturation = saturation[middle]
+    # saturation < 0 and saturation > 1
+    out = np.clip(saturation, 0.0, 1.0, out=out)
+    out[middle] = (
+        (-2.0 * middle_saturation + 3.0)
+        * middle_saturation
+        * middle_saturation
     )
-    # saturation > 1
-    smoothed_saturation = np.where(
-        saturation > 1.0,
-        1.0,
-        smoothed_saturation,
-    )
-    return smoothed_saturation
+    return out
+
+
+def quadratic_smoother_derivative(
+    saturation: float,
+    omega: float = None,
+    out: np.ndarray = None,
+) -> float:
+    if omega is None:
+        omega = 1e-6
+    else:
+        if omega <= 0.0:
+            raise ValueError(f"omega ({omega}) must be >= 0.")
+        elif omega > 1.0:
+            raise ValueError(f"omega ({omega}) must be <= 1.")
+    if isinstance(saturation, float) or is_scalar(saturation):
+        return _quadratic_smoother_derivative_scalar(float(saturation), omega)
+    saturation = array_check(saturation)
+
+    a_omega = 1.0 / (1.0 - omega)
+    factor = a_omega / (2.0 * omega)
+    lower, middle, upper = _quadratic_regions(saturation, omega)
+
+    if out is None:
+        out = np.empty(saturation.shape, dtype=float)
+    # saturation < omega
+    np.multiply(saturation, 2.0 * factor, out=out, where=lower)
+    # omega <= saturation < 1 - omega
+    np.copyto(out, a_omega, where=middle)
+    # 1 - omega <= saturation < 1
+    np.subtract(1.0, saturation, out=out, where=upper)
+    np.multiply(out, 2.0 * factor, out=out, where=upper)
+    # saturation <= 0 and saturation >= 1
+    np.copyto(out, 0.0, where=~(lower | middle | upper))
+
+    return out
+
+
+def _quadratic_regions(
+    saturation: np.ndarray,
+    omega: float,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # the upper region takes precedence if the lower and upper regions
+    # overlap (omega > 0.5), in which case the middle region is empty
+    lower = (saturation > 0.0) & (saturation < min(omega, 1.0 - omega))
+    middle = (saturation >= omega) & (saturation < 1.0 - omega)
+    upper = (saturation >= 1.0 - omega) & (saturation < 1.0)
+    return lower, middle, upper
+
+
+# scalar implementations - the regions are evaluated in the reverse order
+# of the array implementations so overlapping regions (omega > 0.5) give
+# identical results, and squares are explicit products because numpy
+# evaluates x**2.0 as x * x
+
+
+def _quadratic_smoother_scalar(saturation: float, omega: float) -> float:
+    a_omega = 1.0 / (1.0 - omega)
+    factor = a_omega / (2.0 * omega)
+    if saturation > 1.0:
+        return 1.0
+    elif saturation >= 1.0 - omega and saturation < 1.0:
+        return 1.0 - factor * ((1 - saturation) * (1 - saturation))
+    elif saturation >= omega and saturation < 1.0 - omega:
+        return a_omega * saturation + 0.5 * (1.0 - a_omega)
+    elif saturation > 0.0 and saturation < omega:
+        return factor * (saturation * saturation)
+    elif saturation < 0.0:
+        return 0.0
+    return saturation
+
+
+def _quadratic_smoother_derivative_scalar(
+    saturation: float,
+    omega: float,
+) -> float:
+    a_omega = 1.0 / (1.0 - omega)
+    factor = a_omega / (2.0 * omega)
+    if saturation >= 1.0 - omega and saturation < 1.0:
+        return 2.0 * factor * (1.0 - saturation)
+    elif saturation >= omega and saturation < 1.0 - omega:
+        return a_omega
+    elif saturation > 0.0 and saturation < omega:
+        return 2.0 * factor * saturation
+    return 0.0
+
+
+def _pet_smoother_scalar(saturation: float) -> float:
+    if saturation > 1.0:
+        return 1.0
+    elif saturation >= 0 and saturation < 1.0:
+        return (-2.0 * saturation + 3.0) * saturation * saturation
+    elif saturation < 0.0:
+        return 0.0
+    return saturation